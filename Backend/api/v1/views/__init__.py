@@ -14,3 +14,6 @@ from .custom_exercises import *
 from .records import *
 from .workout_sessions import *
 from .roles import *
+from .jobs import *
+from .media import *
+from .stats import *
@@ -5,15 +5,13 @@
 from . import views_bp
 from models.base import db
 from models.custom_exercise import CustomExercise
-from models.user import User
 from flask import request, jsonify, abort, url_for
-from google_api import ManageDrive
-import os
-from flask_jwt_extended import jwt_required, get_jwt_identity
+from flask_jwt_extended import jwt_required
 from decorators import roles_required, user_exists
-
-
-drive = ManageDrive()
+from pagination import paginated_response
+from media_jobs import media_jobs, job_accepted
+from services import unit_of_work, custom_exercises as custom_exercises_service
+from services.users import get_accessible_user
 
 
 @views_bp.route("/custom_exercises", methods=["GET"], strict_slashes=False)
@@ -21,15 +19,8 @@ drive = ManageDrive()
 def get_all_custom_exercises():
     """Retrieve all the custom exercises from the database"""
     query = db.select(CustomExercise)
-    custom_exercises = db.session.execute(query).scalars().all()
-
-    if not custom_exercises:
-        return jsonify([]), 200
-    # Return the custom_exercises as a list json object
-    return (
-        jsonify([custom_exercise.to_dict() for custom_exercise in custom_exercises]),
-        200,
-    )
+    # Return a page of custom_exercises as a list json object
+    return paginated_response(query, CustomExercise.id), 200
 
 
 @views_bp.route(
@@ -39,25 +30,7 @@ def get_all_custom_exercises():
 @user_exists
 def get_custom_exercise_by_title(title):
     """Retrieve a single custom_exercise from the database"""
-    custom_exercise = db.session.query(CustomExercise).filter_by(title=title).first()
-
-    if custom_exercise is None:
-        return abort(404, description="Custom Exercise not found")
-
-    # Check the log in user credentials
-    log_in_user_email = get_jwt_identity()
-    log_in_user = db.session.query(User).filter_by(email=log_in_user_email).first()
-    roles = [role.name for role in log_in_user.roles]
-    # print(plan.user.email)
-    # print(log_in_user_email)
-    if (
-        custom_exercise.user.email != log_in_user_email
-        and "Admin" not in roles
-        and "Developer" not in roles
-    ):
-        return abort(
-            403, description="Forbidden: User does not have access to this resource"
-        )
+    custom_exercise = custom_exercises_service.get_custom_exercise_by_title(title)
 
     # Return the custom_exercise as a json object
     return jsonify(custom_exercise.to_dict()), 200
@@ -71,31 +44,10 @@ def get_all_custom_exercise_categories():
 
     # get the use_id from the query parameters
     user_id = request.args.get("user_id", None)
-    if user_id:
-        user = db.session.get(User, user_id)
-        if user is None:
-            return abort(404, description="User not found")
-        custom_exercises = user.custom_exercises
-    else:
-        abort(400, description="Bad Request: Missing user_id")
-
-    # Check the log in user credentials
-    log_in_user_email = get_jwt_identity()
-    log_in_user = db.session.query(User).filter_by(email=log_in_user_email).first()
-    roles = [role.name for role in log_in_user.roles]
-    # print(plan.user.email)
-    # print(log_in_user_email)
-    if (
-        user.email != log_in_user_email
-        and "Admin" not in roles
-        and "Developer" not in roles
-    ):
-        return abort(
-            403, description="Forbidden: User does not have access to this resource"
-        )
+    if not user_id:
+        return abort(400, description="Bad Request: Missing user_id")
+    get_accessible_user(user_id)
 
-    if not custom_exercises:
-        return jsonify([]), 200
     categories = (
         db.session.query(CustomExercise.category)
         .filter(CustomExercise.user_id == user_id)
@@ -120,31 +72,10 @@ def get_all_custom_exercise_muscle_groups():
 
     # get the use_id from the query parameters
     user_id = request.args.get("user_id", None)
-    if user_id:
-        user = db.session.get(User, user_id)
-        if user is None:
-            return abort(404, description="User not found")
-        custom_exercises = user.custom_exercises
-    else:
-        abort(400, description="Bad Request: Missing user_id")
-
-    # Check the log in user credentials
-    log_in_user_email = get_jwt_identity()
-    log_in_user = db.session.query(User).filter_by(email=log_in_user_email).first()
-    roles = [role.name for role in log_in_user.roles]
-    # print(plan.user.email)
-    # print(log_in_user_email)
-    if (
-        user.email != log_in_user_email
-        and "Admin" not in roles
-        and "Developer" not in roles
-    ):
-        return abort(
-            403, description="Forbidden: User does not have access to this resource"
-        )
+    if not user_id:
+        return abort(400, description="Bad Request: Missing user_id")
+    get_accessible_user(user_id)
 
-    if not custom_exercises:
-        return jsonify([]), 200
     muscle_groups = (
         db.session.query(CustomExercise.muscle_group)
         .filter(CustomExercise.user_id == user_id)
@@ -167,44 +98,16 @@ def get_all_custom_exercises_by_muscle_group(muscle_group):
 
     # get the use_id from the query parameters
     user_id = request.args.get("user_id", None)
-    if user_id:
-        user = db.session.get(User, user_id)
-        if user is None:
-            return abort(404, description="User not found")
-        custom_exercises = user.custom_exercises
-    else:
-        abort(400, description="Bad Request: Missing user_id")
-
-    # Check the log in user credentials
-    log_in_user_email = get_jwt_identity()
-    log_in_user = db.session.query(User).filter_by(email=log_in_user_email).first()
-    roles = [role.name for role in log_in_user.roles]
-    # print(plan.user.email)
-    # print(log_in_user_email)
-    if (
-        user.email != log_in_user_email
-        and "Admin" not in roles
-        and "Developer" not in roles
-    ):
-        return abort(
-            403, description="Forbidden: User does not have access to this resource"
-        )
+    if not user_id:
+        return abort(400, description="Bad Request: Missing user_id")
+    get_accessible_user(user_id)
 
-    if not custom_exercises:
-        return jsonify([]), 200
-    custom_exercises = (
-        db.session.query(CustomExercise)
-        .filter(
-            CustomExercise.user_id == user_id,
-            CustomExercise.muscle_group == muscle_group,
-        )
-        .all()
+    query = db.select(CustomExercise).where(
+        CustomExercise.user_id == user_id,
+        CustomExercise.muscle_group == muscle_group,
     )
 
-    return (
-        jsonify([custom_exercise.to_dict() for custom_exercise in custom_exercises]),
-        200,
-    )
+    return paginated_response(query, CustomExercise.id), 200
 
 
 @views_bp.route(
@@ -228,33 +131,11 @@ def get_one_custom_exercise(custom_exercise_id):
 @user_exists
 def get_user_custom_exercises(user_id):
     """Retrieve all the custom exercises from a specific user"""
-    user = db.session.get(User, user_id)
-
-    if user is None:
-        return abort(404, description="User not found")
-
-    # Check the log in user credentials
-    log_in_user_email = get_jwt_identity()
-    log_in_user = db.session.query(User).filter_by(email=log_in_user_email).first()
-    roles = [role.name for role in log_in_user.roles]
-    # print(plan.user.email)
-    # print(log_in_user_email)
-    if (
-        user.email != log_in_user_email
-        and "Admin" not in roles
-        and "Developer" not in roles
-    ):
-        return abort(
-            403, description="Forbidden: User does not have access to this resource"
-        )
+    get_accessible_user(user_id)
 
-    # Return the custom_exercises as a list json object
-    return (
-        jsonify(
-            [custom_exercise.to_dict() for custom_exercise in user.custom_exercises]
-        ),
-        200,
-    )
+    # Return a page of the user's custom_exercises as a list json object
+    query = db.select(CustomExercise).where(CustomExercise.user_id == user_id)
+    return paginated_response(query, CustomExercise.id), 200
 
 
 @views_bp.route(
@@ -267,36 +148,9 @@ def get_user_custom_exercises(user_id):
 def get_user_custom_exercise(user_id, custom_exercise_id):
     """Retrieve a single custom_exercise from a specific user"""
 
-    user = db.session.get(User, user_id)
-    if user is None:
-        return abort(404, description="User not found")
-
-    # Check the log in user credentials
-    log_in_user_email = get_jwt_identity()
-    log_in_user = db.session.query(User).filter_by(email=log_in_user_email).first()
-    roles = [role.name for role in log_in_user.roles]
-    # print(plan.user.email)
-    # print(log_in_user_email)
-    if (
-        user.email != log_in_user_email
-        and "Admin" not in roles
-        and "Developer" not in roles
-    ):
-        return abort(
-            403, description="Forbidden: User does not have access to this resource"
-        )
-
-    custom_exercise = next(
-        (
-            custom_exercise
-            for custom_exercise in user.custom_exercises
-            if custom_exercise.id == custom_exercise_id
-        ),
-        None,
+    custom_exercise = custom_exercises_service.get_user_custom_exercise(
+        user_id, custom_exercise_id
     )
-
-    if custom_exercise is None:
-        return abort(404, description="Custom Exercise not found")
     # Return the custom_exercise as a json object
     return jsonify(custom_exercise.to_dict()), 200
 
@@ -308,52 +162,18 @@ def get_user_custom_exercise(user_id, custom_exercise_id):
 @user_exists
 def create_exercise_fot_user(user_id):
     """Create a new exercise for a specific user"""
-
-    user = db.session.get(User, user_id)
-    if user is None:
-        return abort(404, description="User not found")
-
-    # Check the log in user credentials
-    log_in_user_email = get_jwt_identity()
-    log_in_user = db.session.query(User).filter_by(email=log_in_user_email).first()
-    roles = [role.name for role in log_in_user.roles]
-    # print(plan.user.email)
-    # print(log_in_user_email)
-    if (
-        user.email != log_in_user_email
-        and "Admin" not in roles
-        and "Developer" not in roles
-    ):
-        return abort(
-            403, description="Forbidden: User does not have access to this resource"
-        )
+    get_accessible_user(user_id)
 
     data = request.get_json()
     # Check if the request is a json object
     if not data:
         return abort(400, description="Bad Request: Not a JSON")
 
-    # Check if the required fields are in the json object
-    if "title" not in data:
-        return abort(400, description="Bad Request: Missing title")
-    if "category" not in data:
-        return abort(400, description="Bad Request: Missing category")
-    if "muscle_group" not in data:
-        return abort(400, description="Bad Request: Missing muscle_group")
-
-    # Check if the exercise already exists
-    query = db.select(CustomExercise).where(
-        CustomExercise.title == data["title"], CustomExercise.user_id == user_id
-    )
-    custom_exercise = db.session.execute(query).scalar()
-
-    if custom_exercise:
-        return abort(409, description="Conflict: Custom Exercise already exists")
-
-    # Create the new exercise
-    new_custom_exercise = CustomExercise(**data, user_id=user_id)
-    db.session.add(new_custom_exercise)
-    db.session.commit()
+    # Create the new exercise, its title must be free
+    with unit_of_work():
+        new_custom_exercise = custom_exercises_service.create_custom_exercise(
+            user_id, data
+        )
     # Return the new exercise as a json object
     return jsonify(new_custom_exercise.to_dict()), 201
 
@@ -368,59 +188,18 @@ def create_exercise_fot_user(user_id):
 def update_custom_exercise(user_id, custom_exercise_id):
     """Update an existing exercise"""
 
-    # Check if the user exists
-    user = db.session.get(User, user_id)
-    if user is None:
-        return abort(404, description="User not found")
-
-    # Check the log in user credentials
-    log_in_user_email = get_jwt_identity()
-    log_in_user = db.session.query(User).filter_by(email=log_in_user_email).first()
-    roles = [role.name for role in log_in_user.roles]
-    # print(plan.user.email)
-    # print(log_in_user_email)
-    if (
-        user.email != log_in_user_email
-        and "Admin" not in roles
-        and "Developer" not in roles
-    ):
-        return abort(
-            403, description="Forbidden: User does not have access to this resource"
-        )
-
-    # Check if the exercise exists
-    custom_exercise = next(
-        (
-            custom_exercise
-            for custom_exercise in user.custom_exercises
-            if custom_exercise.id == custom_exercise_id
-        ),
-        None,
+    custom_exercise = custom_exercises_service.get_user_custom_exercise(
+        user_id, custom_exercise_id
     )
 
-    if custom_exercise is None:
-        return abort(404, description="Custom Exercise not found")
-
     data = request.get_json()
     # Check if the request is a json object
     if not data:
         return abort(400, description="Bad Request: Not a JSON")
 
-    allowed_keys = [
-        "title",
-        "description",
-        "category",
-        "muscle_group",
-        "equipment",
-        "media_file_url",
-    ]
-
     # Update the exercise
-    for key, value in data.items():
-        if key not in allowed_keys:
-            return abort(400, description=f"Bad Request: Invalid Key {key}")
-        setattr(custom_exercise, key, value)
-    db.session.commit()
+    with unit_of_work():
+        custom_exercises_service.update_custom_exercise(custom_exercise, data)
     # Return the updated exercise as a json object
     return jsonify(custom_exercise.to_dict()), 200
 
@@ -435,60 +214,19 @@ def update_custom_exercise(user_id, custom_exercise_id):
 def delete_custom_exercise(user_id, custom_exercise_id):
     """Delete the custom_exercise from the database"""
 
-    # Check if the user exists
-    user = db.session.get(User, user_id)
-    if user is None:
-        return abort(404, description="User not found")
-
-    # Check the log in user credentials
-    log_in_user_email = get_jwt_identity()
-    log_in_user = db.session.query(User).filter_by(email=log_in_user_email).first()
-    roles = [role.name for role in log_in_user.roles]
-    # print(plan.user.email)
-    # print(log_in_user_email)
-    if (
-        user.email != log_in_user_email
-        and "Admin" not in roles
-        and "Developer" not in roles
-    ):
-        return abort(
-            403, description="Forbidden: User does not have access to this resource"
-        )
-
-    # Check if the custom_exercise exists
-    custom_exercise = next(
-        (
-            custom_exercise
-            for custom_exercise in user.custom_exercises
-            if custom_exercise.id == custom_exercise_id
-        ),
-        None,
+    custom_exercise = custom_exercises_service.get_user_custom_exercise(
+        user_id, custom_exercise_id
     )
 
-    if custom_exercise is None:
-        return abort(404, description="Custom Exercise not found")
-
-    # Delete the user's exercise folder in Google Drive
-    if custom_exercise.media_file_url:
-        try:
-            result, message = drive.delete_file(
-                webContentLink=custom_exercise.media_file_url
-            )
-            print(result, message)
-            if not result:
-                # if google drive return false, the file is not in drive
-                custom_exercise.media_file_url = None
-        except Exception as e:
-            return abort(500, description=f"Internal Server Error: {e}")
-
-    db.session.delete(custom_exercise)
-    db.session.commit()
+    # Delete the exercise and its media file in the media storage
+    with unit_of_work():
+        custom_exercises_service.delete_custom_exercise(custom_exercise)
 
     # Return a success message
     return jsonify({"message": "Custom Exercise deleted successfully"}), 200
 
 
-# -----Manage uploading, updating and deleting exercises images and videos in google drive----------------------
+# -----Manage uploading, updating and deleting exercises images and videos in the media storage---------------------
 
 
 @views_bp.route(
@@ -500,45 +238,24 @@ def delete_custom_exercise(user_id, custom_exercise_id):
 @user_exists
 def get_custom_exercise_media_file(user_id, custom_exercise_id):
     """Retrieve the media file stored as a url for the exercise"""
-    user = db.session.get(User, user_id)
-
-    if user is None:
-        return abort(404, description="User not found")
-
-    # Check the log in user credentials
-    log_in_user_email = get_jwt_identity()
-    log_in_user = db.session.query(User).filter_by(email=log_in_user_email).first()
-    roles = [role.name for role in log_in_user.roles]
-    # print(plan.user.email)
-    # print(log_in_user_email)
-    if (
-        user.email != log_in_user_email
-        and "Admin" not in roles
-        and "Developer" not in roles
-    ):
-        return abort(
-            403, description="Forbidden: User does not have access to this resource"
-        )
-
-    # Check if the custom_exercise exists
-    custom_exercise = next(
-        (
-            custom_exercise
-            for custom_exercise in user.custom_exercises
-            if custom_exercise.id == custom_exercise_id
-        ),
-        None,
+    custom_exercise = custom_exercises_service.get_user_custom_exercise(
+        user_id, custom_exercise_id
     )
 
-    if custom_exercise is None:
-        return abort(404, description="Custom Exercise not found")
-
     # Check if the exercise has a media file
     if custom_exercise.media_file_url is None:
         return abort(404, description="Media file not found")
 
     # Return the media file url as a json object
-    return jsonify({"media_file_url": custom_exercise.media_file_url}), 200
+    return (
+        jsonify(
+            {
+                "media_file_url": custom_exercise.media_file_url,
+                "media_variants": custom_exercise.media_variants,
+            }
+        ),
+        200,
+    )
 
 
 @views_bp.route(
@@ -549,48 +266,19 @@ def get_custom_exercise_media_file(user_id, custom_exercise_id):
 @jwt_required()
 @user_exists
 def upload_media(user_id, custom_exercise_id):
-    """Upload the media for the custom_exercise to Google Drive"""
-
-    # Check if the user exists
-    user = db.session.get(User, user_id)
-    if user is None:
-        return abort(404, description="User not found")
-
-    # Check the log in user credentials
-    log_in_user_email = get_jwt_identity()
-    log_in_user = db.session.query(User).filter_by(email=log_in_user_email).first()
-    roles = [role.name for role in log_in_user.roles]
-    # print(plan.user.email)
-    # print(log_in_user_email)
-    if (
-        user.email != log_in_user_email
-        and "Admin" not in roles
-        and "Developer" not in roles
-    ):
-        return abort(
-            403, description="Forbidden: User does not have access to this resource"
-        )
+    """Upload the media for the custom_exercise to the media storage"""
 
-    # Check if the custom_exercise exists
-    custom_exercise = next(
-        (
-            custom_exercise
-            for custom_exercise in user.custom_exercises
-            if custom_exercise.id == custom_exercise_id
-        ),
-        None,
+    custom_exercise = custom_exercises_service.get_user_custom_exercise(
+        user_id, custom_exercise_id
     )
 
-    if custom_exercise is None:
-        return abort(404, description="Custom Exercise not found")
-
     # access the query parameters
     media_file_url = request.args.get("media_file_url", None)
 
     # if url is provided, save it directly to the database
     if media_file_url:
-        custom_exercise.media_file_url = media_file_url
-        db.session.commit()
+        with unit_of_work():
+            custom_exercises_service.set_media_file_url(custom_exercise, media_file_url)
         return (
             jsonify(
                 {
@@ -600,7 +288,7 @@ def upload_media(user_id, custom_exercise_id):
             201,
         )
 
-    # Upload the media to Google Drive if payload exists
+    # Upload the media to the media storage if payload exists
     media_file = request.files.get("media_file", None)
     if not media_file:
         return abort(400, description="Bad Request: Missing media file")
@@ -608,67 +296,16 @@ def upload_media(user_id, custom_exercise_id):
     if media_file.filename == "":
         return abort(400, description="Bad Request: Media file is not selected")
 
-    # save path to the media file locally
-
-    directory_path = f"tmp/fitjourney/user_{user_id}/exercises"
+    # Upload the media to the media storage in the background
     media_file_name = f"file_{custom_exercise_id}_" + media_file.filename
-    print(media_file_name)
-    file_path = f"{directory_path}/{media_file_name}"
-    # Ensure the directory exists
-    os.makedirs(directory_path, exist_ok=True)
-    # Save the file to the temp folder
-    media_file.save(file_path)
-
-    # Upload the file to Google Drive
-    root_folder = drive.root_folder_id
-    users = drive.users_folder_id
-
-    # Create a folder for the current user if it doesn't exist
-    user_folder = drive.find_folder_id(f"user_{user_id}", users)
-    if not user_folder:
-        user_folder = drive.create_folder(f"user_{user_id}", users)
-
-    # Create folder for exercises if it doesn't exist
-    exercises_folder = drive.find_folder_id("exercises", user_folder)
-    if not exercises_folder:
-        exercises_folder = drive.create_folder("exercises", user_folder)
-
-    file_id, file_url = drive.find_file_id(media_file_name, exercises_folder)
-    if file_id:
-        os.remove(file_path)
-        return abort(
-            400,
-            description=f"Bad Request: File already exists {file_url.split('&')[0]}",
-        )
-
-    file_id, supported_file_type, web_content_link = drive.upload_file(
-        file_path, exercises_folder
-    )
-    os.remove(file_path)
-
-    if not supported_file_type:
-        return abort(400, description="Bad Request: Unsupported file type")
-
-    if web_content_link:
-        web_content_link = web_content_link.split("&")[0]
-    else:
-        return abort(
-            500,
-            description="Internal Server Error: An error occurred while uploading the file",
-        )
-
-    # Update the media_file_url in the database
-    custom_exercise.media_file_url = web_content_link
-    db.session.commit()
-    # Return the custom_exercise as a json object
-    return (
-        jsonify(
-            {
-                "message": f"The exercise media has been created successfully {web_content_link}"
-            }
-        ),
-        201,
+    job = media_jobs.submit(
+        "custom_exercise",
+        custom_exercise_id,
+        user_id,
+        media_file,
+        media_file_name,
     )
+    return job_accepted(job, "The exercise media upload has been queued")
 
 
 @views_bp.route(
@@ -680,58 +317,20 @@ def upload_media(user_id, custom_exercise_id):
 @user_exists
 def update_media(user_id, custom_exercise_id):
     """Update the media for the custom_exercise"""
-    # Check if the user exists
-    user = db.session.get(User, user_id)
-    if user is None:
-        return abort(404, description="User not found")
-
-    # Check the log in user credentials
-    log_in_user_email = get_jwt_identity()
-    log_in_user = db.session.query(User).filter_by(email=log_in_user_email).first()
-    roles = [role.name for role in log_in_user.roles]
-    # print(plan.user.email)
-    # print(log_in_user_email)
-    if (
-        user.email != log_in_user_email
-        and "Admin" not in roles
-        and "Developer" not in roles
-    ):
-        return abort(
-            403, description="Forbidden: User does not have access to this resource"
-        )
-
-    # Check if the custom_exercise exists
-    custom_exercise = next(
-        (
-            custom_exercise
-            for custom_exercise in user.custom_exercises
-            if custom_exercise.id == custom_exercise_id
-        ),
-        None,
+    custom_exercise = custom_exercises_service.get_user_custom_exercise(
+        user_id, custom_exercise_id
     )
 
-    if custom_exercise is None:
-        return abort(404, description="Custom Exercise not found")
-
     # access the query parameters
     media_file_url = request.args.get("media_file_url", None)
 
     # if url is provided, save them directly to the database
     if media_file_url:
-        # Delete the old media file
-        old_media_file_url = custom_exercise.media_file_url
-        if old_media_file_url:
-            try:
-                result, message = drive.delete_file(webContentLink=old_media_file_url)
-                print(result, message)
-                if not result:
-                    # if google drive return false, the file is not in drive
-                    custom_exercise.media_file_url = None
-
-            except Exception as e:
-                return abort(500, description=f"Internal Server Error: {e}")
-        custom_exercise.media_file_url = media_file_url
-        db.session.commit()
+        # The old media file is deleted
+        with unit_of_work():
+            custom_exercises_service.set_media_file_url(
+                custom_exercise, media_file_url, replace=True
+            )
         return (
             jsonify(
                 {
@@ -749,72 +348,17 @@ def update_media(user_id, custom_exercise_id):
     if media_file.filename == "":
         return abort(400, description="Bad Request: Media file is not selected")
 
-    # save path to the media file locally
-
-    directory_path = f"tmp/fitjourney/user_{user_id}/exercises"
+    # Upload the media to the media storage in the background
     media_file_name = f"file_{custom_exercise_id}_" + media_file.filename
-    print(media_file_name)
-    file_path = f"{directory_path}/{media_file_name}"
-    # Ensure the directory exists
-    os.makedirs(directory_path, exist_ok=True)
-    # Save the file to the temp folder
-    media_file.save(file_path)
-
-    # Create folder for exercises if it doesn't exist
-    user_folder = drive.find_folder_id(f"user_{user_id}", drive.users_folder_id)
-    if not user_folder:
-        user_folder = drive.create_folder(f"user_{user_id}", drive.users_folder_id)
-    exercises_folder = drive.find_folder_id("exercises", user_folder)
-    if not exercises_folder:
-        exercises_folder = drive.create_folder("exercises", user_folder)
-
-    file_id, file_url = drive.find_file_id(media_file_name, exercises_folder)
-    if file_id:
-        os.remove(file_path)
-        return abort(
-            400,
-            description=f"Bad Request: File already exists {file_url.split('&')[0]}",
-        )
-
-    file_id, supported_file_type, web_content_link = drive.upload_file(
-        file_path, exercises_folder
-    )
-    os.remove(file_path)
-
-    if not supported_file_type:
-        return abort(400, description="Bad Request: Unsupported file type")
-
-    if web_content_link:
-        web_content_link = web_content_link.split("&")[0]
-    else:
-        return abort(
-            500,
-            description="Internal Server Error: An error occurred while uploading the file",
-        )
-
-    # Delete the old media file
-    old_media_file_url = custom_exercise.media_file_url
-    if old_media_file_url:
-        try:
-            result, message = drive.delete_file(webContentLink=old_media_file_url)
-            print(result, message)
-            # if google drive return false, the file is not in drive
-            custom_exercise.media_file_url = None
-
-        except Exception as e:
-            return abort(500, description=f"Internal Server Error: {e}")
-
-    # Update the media_file_url in the database
-    custom_exercise.media_file_url = web_content_link
-    db.session.commit()
-    return (
-        jsonify(
-            {
-                "message": f"The exercise media has been updated successfully {web_content_link}"
-            }
-        ),
-        200,
+    job = media_jobs.submit(
+        "custom_exercise",
+        custom_exercise_id,
+        user_id,
+        media_file,
+        media_file_name,
+        replace_media=True,
     )
+    return job_accepted(job, "The exercise media update has been queued")
 
 
 @views_bp.route(
@@ -827,55 +371,17 @@ def update_media(user_id, custom_exercise_id):
 def delete_media(user_id, custom_exercise_id):
     """Delete the media file for the exercise"""
 
-    user = db.session.get(User, user_id)
-
-    if user is None:
-        return abort(404, description="User not found")
-
-    # Check the log in user credentials
-    log_in_user_email = get_jwt_identity()
-    log_in_user = db.session.query(User).filter_by(email=log_in_user_email).first()
-    roles = [role.name for role in log_in_user.roles]
-    # print(plan.user.email)
-    # print(log_in_user_email)
-    if (
-        user.email != log_in_user_email
-        and "Admin" not in roles
-        and "Developer" not in roles
-    ):
-        return abort(
-            403, description="Forbidden: User does not have access to this resource"
-        )
-
-    # Check if the custom_exercise exists
-    custom_exercise = next(
-        (
-            custom_exercise
-            for custom_exercise in user.custom_exercises
-            if custom_exercise.id == custom_exercise_id
-        ),
-        None,
+    custom_exercise = custom_exercises_service.get_user_custom_exercise(
+        user_id, custom_exercise_id
     )
 
-    if custom_exercise is None:
-        return abort(404, description="Custom Exercise not found")
-
     # Check if the exercise has a media file
     if custom_exercise.media_file_url is None:
         return abort(404, description="Media file not found")
 
-    media_file_url = custom_exercise.media_file_url
-    try:
-        result, message = drive.delete_file(webContentLink=media_file_url)
-        print(result, message)
-        if result is True:
-            custom_exercise.media_file_url = None
-            db.session.commit()
-            return jsonify({"message": message}), 200
-
-        # if google drive return false, the file is not in drive
-        custom_exercise.media_file_url = None
-        db.session.commit()
-        return jsonify({"message": "media file deleted successfully"}), 200
-    except Exception as e:
-        return abort(500, description=f"Internal Server Error: {e}")
+    with unit_of_work():
+        result, message = custom_exercises_service.delete_media_file(custom_exercise)
+    if result is True:
+        return jsonify({"message": message}), 200
+    # if the storage returns false, the file is not stored
+    return jsonify({"message": "media file deleted successfully"}), 200
@@ -0,0 +1,29 @@
+#!/usr/bin/env python3
+""" API endpoints for the background media uploads """
+
+
+from . import views_bp
+from flask import jsonify, abort
+from flask_jwt_extended import jwt_required
+from decorators import user_exists, has_access
+from media_jobs import media_jobs, job_to_dict
+
+
+@views_bp.route("/media_jobs/<string:job_id>", methods=["GET"], strict_slashes=False)
+@jwt_required()
+@user_exists
+def get_media_job(job_id):
+    """Retrieve the status of a media upload"""
+    job = media_jobs.get(job_id)
+
+    if job is None:
+        return abort(404, description="Media job not found")
+
+    # Check the log in user credentials
+    if not has_access(job["user_id"]):
+        return abort(
+            403, description="Forbidden: User does not have access to this resource"
+        )
+
+    # Return the job as a json object
+    return jsonify(job_to_dict(job)), 200
@@ -0,0 +1,36 @@
+#!/usr/bin/env python3
+""" API endpoint serving the media files of the local storage """
+
+
+from . import views_bp
+from flask import abort, current_app, send_file
+from storage import get_storage, LocalStorage
+
+
+@views_bp.route(
+    "/media/<string:digest>/<path:key>", methods=["GET"], strict_slashes=False
+)
+def get_media(digest, key):
+    """
+    Serve a media file. The ETag is the digest of its content, so the
+    conditional and range requests are answered without reading the file
+    """
+    storage = get_storage()
+    if not isinstance(storage, LocalStorage):
+        return abort(404, description="Media file not found")
+
+    path, media_type = storage.lookup(digest, key)
+    if path is None:
+        return abort(404, description="Media file not found")
+
+    response = send_file(
+        path,
+        mimetype=media_type,
+        download_name=key.rsplit("/", 1)[-1],
+        conditional=True,
+        etag=digest,
+        max_age=current_app.config.get("MEDIA_MAX_AGE", 31536000),
+    )
+    # The url changes with the content
+    response.cache_control.immutable = True
+    return response
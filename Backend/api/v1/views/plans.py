@@ -2,12 +2,16 @@
 """ API endpoints for the plans """
 
 from . import views_bp
-from models.base import db
+from models.base import db, ExerciseSummaryMixin
 from models.plan import Plan
-from models.user import User
+from models.day import Day
+from models.workout_session import WorkoutSession
 from flask import request, jsonify, abort
-from flask_jwt_extended import jwt_required, get_jwt_identity
+from flask_jwt_extended import jwt_required
 from decorators import roles_required, user_exists
+from pagination import paginated_response
+from services import unit_of_work, plans as plans_service
+from services.users import get_accessible_user
 
 
 @views_bp.route("/plans", methods=["GET"], strict_slashes=False)
@@ -15,12 +19,8 @@ from decorators import roles_required, user_exists
 def get_all_plans():
     """Retrieve all the plans from the database"""
     query = db.select(Plan)
-    plans = db.session.execute(query).scalars().all()
-
-    if not plans:
-        return jsonify([]), 200
-    # Return the plans as a json object
-    return jsonify([plan.to_dict() for plan in plans])
+    # Return a page of plans as a json object
+    return paginated_response(query, Plan.id), 200
 
 
 @views_bp.route("/plans/<int:plan_id>", methods=["GET"], strict_slashes=False)
@@ -40,30 +40,11 @@ def get_one_plan(plan_id):
 @user_exists
 def get_all_plans_for_user(user_id):
     """Retrieve all the plans for a specific user"""
-    user = db.session.get(User, user_id)
-
-    if not user:
-        return abort(404, description="User not found")
-
-    log_in_user_email = get_jwt_identity()
-    log_in_user = db.session.query(User).filter_by(email=log_in_user_email).first()
-    roles = [role.name for role in log_in_user.roles]
-    if (
-        user.email != log_in_user_email
-        and "Admin" not in roles
-        and "Developer" not in roles
-    ):
-        return abort(
-            403, description="Forbidden: User does not have access to this resource"
-        )
+    get_accessible_user(user_id)
 
-    # Aceess the plans attribute of the user object
-    plans = user.plans
-    if not plans:
-        return jsonify([]), 200
-
-    # Return the plans as a json object
-    return jsonify([plan.to_dict() for plan in plans])
+    # Return a page of the user's plans as a json object
+    query = db.select(Plan).where(Plan.user_id == user_id)
+    return paginated_response(query, Plan.id), 200
 
 
 @views_bp.route(
@@ -73,84 +54,127 @@ def get_all_plans_for_user(user_id):
 @user_exists
 def get_one_plan_for_user(user_id, plan_id):
     """Retrieve a single plan for a specific user"""
-    user = db.session.get(User, user_id)
-
-    if not user:
-        return abort(404, description="User not found")
-
-    # Access the plans attribute of the user object
-    # This generator expression will return the plan object if the plan_id matches
-
-    log_in_user_email = get_jwt_identity()
-    log_in_user = db.session.query(User).filter_by(email=log_in_user_email).first()
-    roles = [role.name for role in log_in_user.roles]
-    if (
-        user.email != log_in_user_email
-        and "Admin" not in roles
-        and "Developer" not in roles
-    ):
-        return abort(
-            403, description="Forbidden: User does not have access to this resource"
-        )
-
-    plan = next((plan for plan in user.plans if plan.id == plan_id), None)
-    if not plan:
-        return abort(404, description="Plan not found")
+    # Look up the plan by its id within the user's plans
+    plan = plans_service.get_user_plan(user_id, plan_id)
 
     # Return the plan as a json object
     return jsonify(plan.to_dict()), 200
 
 
-@views_bp.route("/users/<int:user_id>/plans", methods=["POST"], strict_slashes=False)
+# The levels of the tree of a plan below each level
+TREE_CHILDREN = {
+    Plan: {"days": Day},
+    Day: {"workout_sessions": WorkoutSession},
+    WorkoutSession: {
+        "exercise": ExerciseSummaryMixin,
+        "custom_exercise": ExerciseSummaryMixin,
+    },
+}
+
+
+def parse_fields(fields):
+    """
+    Turn a comma separated list of dotted field paths into a nested dict,
+    e.g. "goal,days.title" -> {"goal": {}, "days": {"title": {}}}. Raise a
+    ValueError for a field the tree of a plan does not have
+    """
+    spec = {}
+    for path in fields.split(","):
+        node = spec
+        for name in path.strip().split("."):
+            if name:
+                node = node.setdefault(name, {})
+    check_fields(spec, Plan)
+    return spec
+
+
+def check_fields(spec, model, prefix=""):
+    """Raise a ValueError for the first field of the spec not in the level"""
+    children = TREE_CHILDREN.get(model, {})
+    if model is ExerciseSummaryMixin:
+        names = model.summary_fields
+    else:
+        names = model.serializer().names
+    for name, child in spec.items():
+        if name in children:
+            check_fields(child, children[name], f"{prefix}{name}.")
+        elif name not in names:
+            raise ValueError(f"Invalid field {prefix}{name}")
+        elif child:
+            raise ValueError(f"Invalid field {prefix}{name}.{next(iter(child))}")
+
+
+def tree_depth(spec):
+    """The depth of the plan tree needed by the fields"""
+    if not spec:
+        return 3
+    if "days" not in spec:
+        return 0
+    if not spec["days"]:
+        return 3
+    if "workout_sessions" not in spec["days"]:
+        return 1
+    sessions = spec["days"]["workout_sessions"]
+    if not sessions or "exercise" in sessions or "custom_exercise" in sessions:
+        return 3
+    return 2
+
+
+def project(value, spec):
+    """Keep the fields of the spec, and the ids, of a tree of dicts"""
+    if not spec:
+        return value
+    if isinstance(value, list):
+        return [project(item, spec) for item in value]
+    if isinstance(value, dict):
+        projected = {"id": value["id"]} if "id" in value else {}
+        for name, child in spec.items():
+            if name in value:
+                projected[name] = project(value[name], child)
+        return projected
+    return value
+
+
+@views_bp.route(
+    "/users/<int:user_id>/plans/<int:plan_id>/tree",
+    methods=["GET"],
+    strict_slashes=False,
+)
 @jwt_required()
 @user_exists
-def create_plan_for_user(user_id):
-    """Create a new plan for a specific user"""
+def get_plan_tree_for_user(user_id, plan_id):
+    """
+    Retrieve a plan of a user with its days, their workout sessions and a
+    summary of their exercises, optionally only some fields of the tree
+    """
+    try:
+        spec = parse_fields(request.args.get("fields", ""))
+    except ValueError as e:
+        return abort(400, description=f"Bad Request: {e}")
 
-    # Retrieve the user object
-    user = db.session.get(User, user_id)
+    # Load the levels of the tree the fields need
+    depth = tree_depth(spec)
+    plan = plans_service.get_user_plan(user_id, plan_id, depth)
 
-    if not user:
-        return abort(404, description="User not found")
+    # Return the tree of the plan as a json object
+    return jsonify(project(plan.to_tree(depth), spec)), 200
 
-    log_in_user_email = get_jwt_identity()
-    log_in_user = db.session.query(User).filter_by(email=log_in_user_email).first()
-    roles = [role.name for role in log_in_user.roles]
-    if (
-        user.email != log_in_user_email
-        and "Admin" not in roles
-        and "Developer" not in roles
-    ):
-        return abort(
-            403, description="Forbidden: User does not have access to this resource"
-        )
+
+@views_bp.route("/users/<int:user_id>/plans", methods=["POST"], strict_slashes=False)
+@jwt_required()
+@user_exists
+def create_plan_for_user(user_id):
+    """Create a new plan for a specific user"""
+    get_accessible_user(user_id)
 
     data = request.get_json()
 
     if not data:
         return abort(400, description="Bad Request: Not a JSON")
 
-    # Check if the required fields are in the json object
-    if "goal" not in data:
-        return abort(400, description="Bad Request: Missing goal")
-    if "current_weight" not in data:
-        return abort(400, description="Bad Request: Missing current_weight")
-    if "target_weight" not in data:
-        return abort(400, description="Bad Request: Missing target_weight")
-    if "duration" not in data:
-        return abort(400, description="Bad Request: Missing duration")
-    if "days_in_week" not in data:
-        return abort(400, description="Bad Request: Missing days_in_week")
-
-    # Create a new plan
-    new_plan = Plan(**data, user_id=user_id)
-
-    # Save the plan to the database
-    db.session.add(new_plan)
-    db.session.commit()
-
-    # Add the plan to the user's plans
-    user.plans.append(new_plan)
+    # Create a new plan and save it to the database
+    with unit_of_work():
+        new_plan = plans_service.create_plan(user_id, data)
 
     return jsonify(new_plan.to_dict()), 201
 
@@ -162,47 +186,17 @@ def create_plan_for_user(user_id):
 @user_exists
 def update_plan_for_user(user_id, plan_id):
     """Update a plan for a specific user"""
-
-    # Retrieve the user object
-    user = db.session.get(User, user_id)
-
-    if not user:
-        return abort(404, description="User not found")
-
-    log_in_user_email = get_jwt_identity()
-    log_in_user = db.session.query(User).filter_by(email=log_in_user_email).first()
-    roles = [role.name for role in log_in_user.roles]
-    if (
-        user.email != log_in_user_email
-        and "Admin" not in roles
-        and "Developer" not in roles
-    ):
-        return abort(
-            403, description="Forbidden: User does not have access to this resource"
-        )
-
-    # Access the plans attribute of the user object
-    # This generator expression will return the plan object if the plan_id matches
-    plan = next((plan for plan in user.plans if plan.id == plan_id), None)
-
-    if not plan:
-        return abort(404, description="Plan not found")
+    # Look up the plan by its id within the user's plans
+    plan = plans_service.get_user_plan(user_id, plan_id)
 
     data = request.get_json()
 
     if not data:
         return abort(400, description="Bad Request: Not a JSON")
 
-    allowed_keys = ["goal", "current_weight", "target_weight", "duration"]
-
-    # Update the plan with the new data
-    for key, value in data.items():
-        if key not in allowed_keys:
-            return abort(400, description=f"Bad Request: Invalid key {key}")
-        setattr(plan, key, value)
-
-    # Save the plan to the database
-    db.session.commit()
+    # Update the plan with the new data and save it to the database
+    with unit_of_work():
+        plans_service.update_plan(plan, data)
 
     return jsonify(plan.to_dict()), 200
 
@@ -214,34 +208,35 @@ def update_plan_for_user(user_id, plan_id):
 @user_exists
 def remove_plan_for_user(user_id, plan_id):
     """Remove a plan for a specific user"""
-
-    # Retrieve the user object
-    user = db.session.get(User, user_id)
-
-    if not user:
-        return abort(404, description="User not found")
-
-    log_in_user_email = get_jwt_identity()
-    log_in_user = db.session.query(User).filter_by(email=log_in_user_email).first()
-    roles = [role.name for role in log_in_user.roles]
-    if (
-        user.email != log_in_user_email
-        and "Admin" not in roles
-        and "Developer" not in roles
-    ):
-        return abort(
-            403, description="Forbidden: User does not have access to this resource"
-        )
-
-    # Access the plans attribute of the user object
-    # This generator expression will return the plan object if the plan_id matches
-    plan = next((plan for plan in user.plans if plan.id == plan_id), None)
-
-    if not plan:
-        return abort(404, description="Plan not found")
+    # Look up the plan by its id within the user's plans
+    plan = plans_service.get_user_plan(user_id, plan_id)
 
     # Remove the plan from the database
-    db.session.delete(plan)
-    db.session.commit()
+    with unit_of_work():
+        plans_service.delete_plan(plan)
 
     return jsonify({"message": "Plan deleted successfully"}), 200
+
+
+@views_bp.route(
+    "/users/<int:user_id>/plans/<int:plan_id>/clone",
+    methods=["POST"],
+    strict_slashes=False,
+)
+@jwt_required()
+@user_exists
+def clone_plan_for_user(user_id, plan_id):
+    """
+    Copy a plan of a user with its days and workout sessions, optionally
+    with another goal, in a single transaction
+    """
+    # Load the days and the workout sessions of the plan in two queries
+    plan = plans_service.get_user_plan(user_id, plan_id, depth=2)
+
+    data = request.get_json(silent=True) or {}
+
+    with unit_of_work():
+        new_plan = plans_service.clone_plan(plan, goal=data.get("goal"))
+
+    # Return the tree of the new plan as a json object
+    return jsonify(new_plan.to_tree(2)), 201
@@ -5,12 +5,16 @@
 from . import views_bp
 from models.base import db
 from models.record import Record
-from models.user import User
-from models.exercise import Exercise
-from models.custom_exercise import CustomExercise
-from flask import request, jsonify, abort, url_for
-from flask_jwt_extended import jwt_required, get_jwt_identity
+from flask import request, jsonify, abort, url_for, current_app, Response
+from flask import stream_with_context
+from datetime import datetime, timedelta
+from flask_jwt_extended import jwt_required
 from decorators import roles_required, user_exists
+from pagination import paginated_response, get_fields
+from json_provider import stream_json_array
+from progress import BUCKETS, daily_rows, weekly_rows, progress, stream_json
+from services import unit_of_work, records as records_service
+from services.users import get_accessible_user
 
 
 @views_bp.route("/records", methods=["GET"], strict_slashes=False)
@@ -18,12 +22,25 @@ from decorators import roles_required, user_exists
 def get_records():
     """Get all the records"""
     query = db.select(Record)
-    records = db.session.execute(query).scalars().all()
+    # Return a page of records as a json object
+    return paginated_response(query, Record.id), 200
 
-    if not records:
-        return jsonify([]), 200
-    # Return the records as a json object
-    return jsonify([record.to_dict() for record in records]), 200
+
+def export_records(query):
+    """Stream the records of a query as a json array, with the fields asked"""
+    try:
+        serialize = Record.serializer(get_fields())
+    except ValueError as e:
+        return abort(400, description=f"Bad Request: {e}")
+    batch_size = current_app.config.get("EXPORT_BATCH_SIZE", 1000)
+    return stream_json_array(query.order_by(Record.id), serialize, batch_size)
+
+
+@views_bp.route("/records/export", methods=["GET"], strict_slashes=False)
+@roles_required("Admin", "Developer")
+def export_all_records():
+    """Export all the records in a single json array"""
+    return export_records(db.select(Record)), 200
 
 
 @views_bp.route("/records/<int:record_id>", methods=["GET"], strict_slashes=False)
@@ -43,26 +60,24 @@ def get_one_record(record_id):
 @user_exists
 def get_user_records(user_id):
     """Get all the records from a specific user"""
+    get_accessible_user(user_id)
 
-    user = db.session.get(User, user_id)
-    if user is None:
-        return abort(404, description="User not found")
+    # Return a page of the user's records as a json object
+    query = db.select(Record).where(Record.user_id == user_id)
+    return paginated_response(query, Record.id), 200
 
-    # Check the log in user credentials
-    log_in_user_email = get_jwt_identity()
-    log_in_user = db.session.query(User).filter_by(email=log_in_user_email).first()
-    roles = [role.name for role in log_in_user.roles]
-    if (
-        user.email != log_in_user_email
-        and "Admin" not in roles
-        and "Developer" not in roles
-    ):
-        return abort(
-            403, description="Forbidden: User does not have access to this resource"
-        )
 
-    # Return the records as a json object
-    return jsonify([record.to_dict() for record in user.records]), 200
+@views_bp.route(
+    "/users/<int:user_id>/records/export", methods=["GET"], strict_slashes=False
+)
+@jwt_required()
+@user_exists
+def export_user_records(user_id):
+    """Export all the records of a specific user in a single json array"""
+    get_accessible_user(user_id)
+
+    query = db.select(Record).where(Record.user_id == user_id)
+    return export_records(query), 200
 
 
 @views_bp.route(
@@ -74,29 +89,8 @@ def get_user_records(user_id):
 @user_exists
 def get_one_record_from_user(user_id, record_id):
     """Get a single record from a specific user"""
+    record = records_service.get_user_record(user_id, record_id)
 
-    user = db.session.get(User, user_id)
-    if user is None:
-        return abort(404, description="User not found")
-
-    # Check the log in user credentials
-    log_in_user_email = get_jwt_identity()
-    log_in_user = db.session.query(User).filter_by(email=log_in_user_email).first()
-    roles = [role.name for role in log_in_user.roles]
-    if (
-        user.email != log_in_user_email
-        and "Admin" not in roles
-        and "Developer" not in roles
-    ):
-        return abort(
-            403, description="Forbidden: User does not have access to this resource"
-        )
-
-    # Check if the record exists
-    record = next((record for record in user.records if record.id == record_id), None)
-
-    if record is None:
-        return abort(404, description="Record not found")
     # Return the record as a json object
     return jsonify(record.to_dict()), 200
 
@@ -106,133 +100,76 @@ def get_one_record_from_user(user_id, record_id):
 @user_exists
 def create_record_for_user(user_id):
     """Create a new record for a specific user"""
-
-    # Check if the user exists
-    user = db.session.get(User, user_id)
-    if user is None:
-        return abort(404, description="User not found")
-
-    # Check the log in user credentials
-    log_in_user_email = get_jwt_identity()
-    log_in_user = db.session.query(User).filter_by(email=log_in_user_email).first()
-    roles = [role.name for role in log_in_user.roles]
-    if (
-        user.email != log_in_user_email
-        and "Admin" not in roles
-        and "Developer" not in roles
-    ):
-        return abort(
-            403, description="Forbidden: User does not have access to this resource"
-        )
+    get_accessible_user(user_id)
 
     # Check if the request is a json object
     data = request.get_json()
     if not data:
         return abort(400, description="Bad Request: Not a JSON")
 
-    # Check if the required fields are in the json object
-    if "difficulty" not in data:
-        return abort(400, description="Bad Request: Missing difficulty")
-    if "sets" not in data:
-        return abort(400, description="Bad Request: Missing sets")
-    if "reps" not in data:
-        return abort(400, description="Bad Request: Missing reps")
-    if "rest" not in data:
-        return abort(400, description="Bad Request: Missing rest")
-    if "user_weight" not in data:
-        return abort(400, description="Bad Request: Missing user_weight")
-    if "location" not in data:
-        return abort(400, description="Bad Request: Missing location")
-
-    # If the json object has exercise_id, check if the exercise exists
-    if "exercise_id" in data:
-        exercise = db.session.get(Exercise, data["exercise_id"])
-        if exercise is None:
-            return abort(404, description="Exercise not found")
-
-    # If the json object has custom_exercise_id, check if the exercise exists
-    if "custom_exercise_id" in data:
-        custom_exercise = db.session.get(CustomExercise, data["custom_exercise_id"])
-        if custom_exercise is None:
-            return abort(404, description=" Custom exercise not found")
-
-    # Create the new record
-    new_record = Record(**data, user_id=user_id)
-
-    # Save the record to the database
-    db.session.add(new_record)
-    db.session.commit()
-    user.records.append(new_record)
+    # Save the record and add it to the totals of its week
+    with unit_of_work():
+        new_record = records_service.create_record(user_id, data)
 
     # Return the record as a json object
     return jsonify(new_record.to_dict()), 201
 
 
 @views_bp.route(
-    "users/<int:user_id>/records/<int:record_id>", methods=["PUT"], strict_slashes=False
+    "/users/<int:user_id>/records/batch", methods=["POST"], strict_slashes=False
 )
 @jwt_required()
 @user_exists
-def update_record(user_id, record_id):
-    """Update an existing record"""
-
-    # Check if the user exists
-    user = db.session.get(User, user_id)
-    if user is None:
-        return abort(404, description="User not found")
-
-    # Check the log in user credentials
-    log_in_user_email = get_jwt_identity()
-    log_in_user = db.session.query(User).filter_by(email=log_in_user_email).first()
-    roles = [role.name for role in log_in_user.roles]
-    if (
-        user.email != log_in_user_email
-        and "Admin" not in roles
-        and "Developer" not in roles
-    ):
+def create_records_batch_for_user(user_id):
+    """
+    Create the records of a whole workout session for a specific user in
+    one transaction. Every record is validated on its own, the response
+    holds the result of each record in the order of the request
+    """
+
+    get_accessible_user(user_id)
+
+    # Check if the request is a json list
+    data = request.get_json(silent=True)
+    if not isinstance(data, list) or not data:
+        return abort(400, description="Bad Request: Not a JSON list")
+    max_size = current_app.config.get("RECORDS_BATCH_MAX_SIZE", 100)
+    if len(data) > max_size:
         return abort(
-            403, description="Forbidden: User does not have access to this resource"
+            400, description=f"Bad Request: More than {max_size} records in the batch"
         )
 
-    # Check if the record exists
-    record = next((record for record in user.records if record.id == record_id), None)
-    if record is None:
-        return abort(404, description="Record not found")
+    # Save the valid records in a single transaction
+    with unit_of_work():
+        results, created = records_service.create_records(user_id, data)
+
+    # 201 when every record was created, 207 when only some of them were
+    if not created:
+        status = 400
+    elif created < len(data):
+        status = 207
+    else:
+        status = 201
+    return jsonify(results), status
+
+
+@views_bp.route(
+    "users/<int:user_id>/records/<int:record_id>", methods=["PUT"], strict_slashes=False
+)
+@jwt_required()
+@user_exists
+def update_record(user_id, record_id):
+    """Update an existing record"""
+    record = records_service.get_user_record(user_id, record_id)
 
     # Check if the request is a json object
     data = request.get_json()
     if not data:
         return abort(400, description="Bad Request: Not a JSON")
 
-    allowed_keys = [
-        "exercise_id",
-        "custom_exercise_id",
-        "difficulty",
-        "sets",
-        "reps",
-        "rest",
-        "weight_lifted",
-        "user_weight",
-        "location",
-        "notes",
-    ]
-    # Update the record
-    for key, value in data.items():
-        if key not in allowed_keys:
-            return abort(400, description=f"Bad Request: Invalid key {key}")
-        if key == "exercise_id":
-            exercise = db.session.get(Exercise, value)
-            if exercise is None:
-                return abort(404, description="Exercise not found")
-        if key == "custom_exercise_id":
-            custom_exercise = db.session.get(CustomExercise, value)
-            if custom_exercise is None:
-                return abort(404, description="Custom Exercise not found")
-
-        setattr(record, key, value)
-
-    # Save the record to the database
-    db.session.commit()
+    # Save the record and recompute the totals of its week
+    with unit_of_work():
+        records_service.update_record(record, data)
 
     # Return the record as a json object
     return jsonify(record.to_dict()), 200
@@ -247,32 +184,80 @@ def update_record(user_id, record_id):
 @user_exists
 def remove_record(user_id, record_id):
     """Delete a record from the database of a specific user"""
+    record = records_service.get_user_record(user_id, record_id)
 
-    # Check if the user exists
-    user = db.session.get(User, user_id)
-    if user is None:
-        return abort(404, description="User not found")
+    # Remove the record from the database and from the totals of its week
+    with unit_of_work():
+        records_service.delete_record(record)
 
-    # Check the log in user credentials
-    log_in_user_email = get_jwt_identity()
-    log_in_user = db.session.query(User).filter_by(email=log_in_user_email).first()
-    roles = [role.name for role in log_in_user.roles]
-    if (
-        user.email != log_in_user_email
-        and "Admin" not in roles
-        and "Developer" not in roles
-    ):
-        return abort(
-            403, description="Forbidden: User does not have access to this resource"
-        )
+    return jsonify({"message": "Record deleted successfully"}), 200
 
-    # Check if the record exists
-    record = next((record for record in user.records if record.id == record_id), None)
-    if not record:
-        return abort(404, description="Record not found")
 
-    # Remove the record from the database
-    db.session.delete(record)
-    db.session.commit()
+@views_bp.route("/users/<int:user_id>/progress", methods=["GET"], strict_slashes=False)
+@jwt_required()
+@user_exists
+def get_user_progress(user_id):
+    """
+    Get the progress of a user by day, week or month: volume, estimated one
+    repetition max, personal records and body weight, for all the records
+    or the records of one exercise
+    """
+
+    get_accessible_user(user_id)
+
+    exercise_id = request.args.get("exercise_id", None, type=int)
+    custom_exercise_id = request.args.get("custom_exercise_id", None, type=int)
+    if exercise_id and custom_exercise_id:
+        return abort(
+            400,
+            description="Bad Request: Use either exercise_id or custom_exercise_id",
+        )
 
-    return jsonify({"message": "Record deleted successfully"}), 200
+    bucket = request.args.get("bucket", "week")
+    if bucket not in BUCKETS:
+        return abort(
+            400, description=f"Bad Request: bucket must be one of {', '.join(BUCKETS)}"
+        )
+    window = request.args.get("window", 4, type=int)
+    if window < 1:
+        return abort(400, description="Bad Request: window must be a positive integer")
+
+    # The dates are inclusive
+    dates = {}
+    for key in ("from", "to"):
+        value = request.args.get(key, None)
+        try:
+            dates[key] = datetime.strptime(value, "%Y-%m-%d") if value else None
+        except ValueError:
+            return abort(
+                400, description=f"Bad Request: {key} must be a date as YYYY-MM-DD"
+            )
+    end = dates["to"] + timedelta(days=1) if dates["to"] else None
+
+    # Whole weeks are read from the weekly totals instead of the records
+    if (
+        bucket == "week"
+        and (dates["from"] is None or dates["from"].weekday() == 0)
+        and (end is None or end.weekday() == 0)
+    ):
+        rows = weekly_rows
+    else:
+        rows = daily_rows
+    days, columns = rows(user_id, dates["from"], end, exercise_id, custom_exercise_id)
+    buckets, summary = progress(days, columns, bucket, window)
+
+    header = {
+        "user_id": user_id,
+        "exercise_id": exercise_id,
+        "custom_exercise_id": custom_exercise_id,
+        "bucket": bucket,
+        "window": window,
+        "from": request.args.get("from", None),
+        "to": request.args.get("to", None),
+    }
+    # Stream the buckets of long histories
+    batch_size = current_app.config.get("EXPORT_BATCH_SIZE", 1000)
+    return Response(
+        stream_with_context(stream_json(header, buckets, summary, batch_size)),
+        mimetype=current_app.json.mimetype,
+    )
@@ -8,10 +8,10 @@ from . import views_bp
 from flask import request, jsonify, abort
 from models.base import db
 from models.role import Role
-from models.user import User
-from flask_jwt_extended import jwt_required
-from decorators import roles_required
-from flask_jwt_extended import jwt_required
+from models.user import User, user_roles
+from decorators import roles_required, forget_roles_version
+from pagination import paginated_response
+from services import ConflictError, unit_of_work, roles as roles_service
 
 
 # Endpoint to get all roles
@@ -20,11 +20,7 @@ from flask_jwt_extended import jwt_required
 def get_roles():
     """Get all the roles"""
     query = db.select(Role)
-    roles = db.session.execute(query).scalars().all()
-
-    if not roles:
-        return jsonify([]), 200
-    return jsonify([role.to_dict() for role in roles]), 200
+    return paginated_response(query, Role.id), 200
 
 
 # Endpoint to get a single role by its ID
@@ -47,8 +43,8 @@ def get_users_by_role(role_id):
     if not role:
         return jsonify({"message": "Role not found"}), 404
 
-    users = [user.to_dict() for user in role.users]
-    return jsonify(users), 200
+    query = db.select(User).join(user_roles).where(user_roles.c.role_id == role_id)
+    return paginated_response(query, User.id), 200
 
 
 # Endpoint to create a new role
@@ -59,15 +55,10 @@ def add_role():
     if not data or "role_name" not in data:
         return abort(400, description="Bad Request: Missing role name")
 
-    role_name = data["role_name"]
-    # Check if the role already exists
-    existing_role = Role.find_role_by_name(role_name)
-    if existing_role:
+    with unit_of_work():
+        new_role, created = roles_service.get_or_create_role(data["role_name"])
+    if not created:
         return jsonify({"message": "Role already exists"}), 409
-
-    new_role = Role(name=role_name)
-    db.session.add(new_role)
-    db.session.commit()
     return jsonify(new_role.to_dict()), 201
 
 
@@ -83,12 +74,13 @@ def update_role(role_id):
     if not role:
         return jsonify({"message": "Role not found"}), 404
 
-    # Check if the role already exists
-    existing_role = Role.find_role_by_name(data["role_name"])
-    if existing_role:
-        return jsonify({"message": "Role already exists"}), 409
-    role.name = data["role_name"]
-    db.session.commit()
+    try:
+        with unit_of_work():
+            users = roles_service.rename_role(role, data["role_name"])
+    except ConflictError as error:
+        return jsonify({"message": error.description}), 409
+    for user in users:
+        forget_roles_version(user.id)
     return jsonify(role.to_dict()), 200
 
 
@@ -100,6 +92,8 @@ def delete_role(role_id):
     if not role:
         return jsonify({"message": "Role not found"}), 404
 
-    db.session.delete(role)
-    db.session.commit()
+    with unit_of_work():
+        users = roles_service.delete_role(role)
+    for user in users:
+        forget_roles_version(user.id)
     return jsonify({"message": "Role deleted successfully"}), 200
@@ -0,0 +1,16 @@
+#!/usr/bin/env python3
+""" API endpoints for the internal stats of the server """
+
+
+from . import views_bp
+from flask import jsonify
+from models.base import db
+from decorators import roles_required
+from db_pool import pool_status
+
+
+@views_bp.route("/stats/db_pool", methods=["GET"], strict_slashes=False)
+@roles_required("Admin", "Developer")
+def get_db_pool_stats():
+    """Retrieve the state of the database pool of the server process"""
+    return jsonify(pool_status(db.engine)), 200
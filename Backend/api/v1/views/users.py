@@ -6,14 +6,14 @@ from . import views_bp
 from models.base import db
 from models.user import User, user_roles
 from models.plan import Plan
-from models.role import Role
 from models.custom_exercise import CustomExercise
 from models.record import Record
 from flask import request, jsonify, abort, url_for
-from google_api import ManageDrive
-import os
-from flask_jwt_extended import jwt_required, get_jwt_identity
-from decorators import roles_required, user_exists
+from flask_jwt_extended import jwt_required
+from decorators import roles_required, user_exists, forget_roles_version
+from pagination import paginated_response
+from media_jobs import media_jobs, job_accepted
+from services import unit_of_work, users as users_service
 
 import logging
 
@@ -34,8 +34,7 @@ def log_sql_statements(conn, cursor, statement, parameters, context, executemany
 # Attach the logging function to the SQLAlchemy engine
 event.listen(Engine, "before_cursor_execute", log_sql_statements)
 
-
-drive = ManageDrive()
+FORBIDDEN = "Forbidden: You do not have permission to view this user"
 
 
 @views_bp.route("/users", methods=["GET"], strict_slashes=False)
@@ -43,12 +42,8 @@ drive = ManageDrive()
 def get_all_users():
     """Retrieve all the users from the database"""
     query = db.select(User)
-    users = db.session.execute(query).scalars().all()
-
-    if not users:
-        return jsonify([]), 200
-    # Return the users as a json object
-    return jsonify([user.to_dict() for user in users]), 200
+    # Return a page of users as a json object
+    return paginated_response(query, User.id), 200
 
 
 @views_bp.route("/users/<int:user_id>", methods=["GET"], strict_slashes=False)
@@ -56,20 +51,7 @@ def get_all_users():
 @user_exists
 def get_one_user(user_id):
     """Retrieve a single user from the database"""
-    user = db.session.get(User, user_id)
-
-    if user is None:
-        return abort(404, description="User not found"), 200
-
-    # Check the log in user credentials
-    log_in_user_email = get_jwt_identity()
-    log_in_user = db.session.query(User).filter_by(email=log_in_user_email).first()
-    roles = [role.name for role in log_in_user.roles]
-    # Check if the log in user is the same as the user being retrieved
-    if log_in_user.id != user_id and "Admin" not in roles and "Developer" not in roles:
-        return abort(
-            403, description="Forbidden: You do not have permission to view this user"
-        )
+    user = users_service.get_accessible_user(user_id, FORBIDDEN)
 
     # Return the user as a json object
     return jsonify(user.to_dict()), 200
@@ -84,31 +66,9 @@ def create_user():
     if not data:
         return abort(400, description="Bad Request: Not a JSON")
 
-    # Check if the required fields are in the json object
-    if "first_name" not in data:
-        return abort(400, description="Bad Request: Missing first_name")
-    if "last_name" not in data:
-        return abort(400, description="Bad Request: Missing last_name")
-    if "email" not in data:
-        return abort(400, description="Bad Request: Missing email")
-    if "password" not in data:
-        return abort(400, description="Bad Request: Missing password")
-
-    # Check if the email is already in use
-    query = db.select(User).where(User.email == data["email"])
-    user = db.session.execute(query).scalar()
-
-    if user:
-        return abort(409, description="Conflict: Email already in use")
-
-    # Create a new user
-    print(type(data["password"]))
-    new_user = User(**data)
-    # new_user.password = data["password"]  # Hash the password
-
-    # Save the user to the database
-    db.session.add(new_user)
-    db.session.commit()
+    # Create a new user and save it to the database
+    with unit_of_work():
+        new_user = users_service.create_user(data)
 
     # Return the user as a json object
     return jsonify(new_user.to_dict()), 201
@@ -120,45 +80,16 @@ def create_user():
 def update_user(user_id):
     """Update a user object"""
 
-    user = db.session.get(User, user_id)
-
-    if user is None:
-        return abort(404, description="User not found")
-
-    # Check the log in user credentials
-    log_in_user_email = get_jwt_identity()
-    log_in_user = db.session.query(User).filter_by(email=log_in_user_email).first()
-    roles = [role.name for role in log_in_user.roles]
-    # Check if the log in user is the same as the user being retrieved
-    if log_in_user.id != user_id and "Admin" not in roles and "Developer" not in roles:
-        return abort(
-            403, description="Forbidden: You do not have permission to view this user"
-        )
+    user = users_service.get_accessible_user(user_id, FORBIDDEN)
 
     # Check if the request is a json object
     data = request.get_json()
     if not data:
         return abort(400, description="Bad Request: Not a JSON")
 
-    allowed_keys = ["first_name", "last_name", "old_password", "new_password"]
-    # Update the user object
-    for key, value in data.items():
-
-        if key not in allowed_keys:
-            return abort(400, description=f"Bad Request: Invalid key {key}")
-        # Verify old password when changing password
-        if key == "new_password":
-            old_password = data.get("old_password")
-            if not old_password:
-                return abort(400, description="Bad Request: Missing old password")
-            if not user.check_password(old_password):
-                return abort(400, description="Bad Request: Incorrect old password")
-            key = "password"
-            value = data["new_password"]
-        setattr(user, key, value)
-
-    # Save the updated user back to the database
-    db.session.commit()
+    # Update the user and save it back to the database
+    with unit_of_work():
+        users_service.update_user(user, data)
 
     return jsonify(user.to_dict()), 200
 
@@ -169,34 +100,13 @@ def update_user(user_id):
 def remove_user(user_id):
     """Remove a user object"""
 
-    user = db.session.get(User, user_id)
-
-    if user is None:
-        return abort(404, description="User not found")
-
-    # Check the log in user credentials
-    log_in_user_email = get_jwt_identity()
-    log_in_user = db.session.query(User).filter_by(email=log_in_user_email).first()
-    roles = [role.name for role in log_in_user.roles]
-    # Check if the log in user is the same as the user being retrieved
-    if log_in_user.id != user_id and "Admin" not in roles and "Developer" not in roles:
-        return abort(
-            403, description="Forbidden: You do not have permission to view this user"
-        )
-
-    # Delete the user's folder from drive
-    user_folder = drive.find_folder_id("user_" + str(user_id), drive.users_folder_id)
-    if user_folder:
-        try:
-            result, message = drive.delete_folder(folder_id=user_folder)
-            if not result:
-                return abort(500, description=f"Internal Server Error: {message}")
-        except Exception as e:
-            return abort(500, description=f"Internal Server Error: {e}")
-
-    # Remove the user from the database
-    db.session.delete(user)
-    db.session.commit()
+    user = users_service.get_accessible_user(user_id, FORBIDDEN)
+
+    # Remove the user and its media folder
+    with unit_of_work():
+        users_service.delete_user(user)
+    # The tokens of the user are revoked
+    forget_roles_version(user_id)
     return jsonify({"message": "User deleted successfully"}), 200
 
 
@@ -207,11 +117,7 @@ def remove_user(user_id):
 @views_bp.route("/users/<int:user_id>/roles", methods=["GET"], strict_slashes=False)
 @roles_required("Developer", "Admin")
 def get_user_roles(user_id):
-    user = db.session.get(User, user_id)
-
-    print(f"User found: {user}")  # Debugging print
-    if user is None:
-        return abort(404, description="User not found")
+    user = users_service.get_user(user_id)
 
     user_roles = [role.to_dict() for role in user.roles]
     return jsonify(user_roles), 200
@@ -223,30 +129,15 @@ def get_user_roles(user_id):
 )
 @roles_required("Admin")
 def assign_role(user_id, role_name):
-    # user = db.session.get(User, user_id)
-    user = db.session.query(User).filter_by(id=user_id).first()
-
-    if not user:
-        return abort(404, description="User not found")
-
-    # Check if the role already exists
-    role = db.session.query(Role).filter_by(name=role_name).first()
-
-    if not role:
-        return abort(404, description="Role not found")
-
-    db.session.refresh(user)  # Reload the user object
+    user = users_service.get_user(user_id)
+    role = users_service.get_role(role_name)
 
     # Check if the user already has the role
-    if role not in user.roles:
-        user.roles.append(role)
-        db.session.commit()
-        print(f"Role '{role_name}' assigned to user {user_id}")  # Debug print
-        print(
-            f"User {user_id} roles after assignment: {[role.name for role in user.roles]}"
-        )
+    with unit_of_work():
+        assigned = users_service.assign_role(user, role)
+    if assigned:
+        forget_roles_version(user.id)
         return jsonify({"message": "Role assigned successfully"}), 201
-    print(f"User {user_id} already has role '{role_name}'")  # Debugging print
     return jsonify({"message": "User already has this role"}), 200
 
 
@@ -259,17 +150,13 @@ def remove_role(user_id, role_name):
     """
     Remove a role from a user
     """
-    user = db.session.get(User, user_id)
-    if not user:
-        return abort(404, description="User not found")
-
-    role = Role.find_role_by_name(role_name)
-    if not role:
-        return abort(404, description="Role not found")
+    user = users_service.get_user(user_id)
+    role = users_service.get_role(role_name)
 
-    if role in user.roles:
-        user.roles.remove(role)
-        db.session.commit()
+    with unit_of_work():
+        removed = users_service.remove_role(user, role)
+    if removed:
+        forget_roles_version(user.id)
         return jsonify({"message": "Role removed successfully"}), 200
 
     return jsonify({"message": "User does not have this role"}), 200
@@ -284,19 +171,15 @@ def update_user_role(user_id, role_name):
     """
     Update a user's role
     """
-    user = db.session.get(User, user_id)
-    if not user:
-        return abort(404, description="User not found")
-
-    role = Role.find_role_by_name(role_name)
-    if not role:
-        return abort(404, description="Role not found")
+    user = users_service.get_user(user_id)
+    role = users_service.get_role(role_name)
 
-    if role in user.roles:
+    with unit_of_work():
+        assigned = users_service.assign_role(user, role)
+    if not assigned:
         return jsonify({"message": "User already has this role"}), 200
 
-    user.roles.append(role)
-    db.session.commit()
+    forget_roles_version(user.id)
     return jsonify({"message": "Role updated successfully"}), 200
 
 
@@ -310,27 +193,22 @@ def update_user_role(user_id, role_name):
 @user_exists
 def get_profile_picture(user_id):
     """Retrieve the profile picture for the user"""
-    user = db.session.get(User, user_id)
-
-    if user is None:
-        return abort(404, description="User not found")
-
-    # Check the log in user credentials
-    log_in_user_email = get_jwt_identity()
-    log_in_user = db.session.query(User).filter_by(email=log_in_user_email).first()
-    roles = [role.name for role in log_in_user.roles]
-    # Check if the log in user is the same as the user being retrieved
-    if log_in_user.id != user_id and "Admin" not in roles and "Developer" not in roles:
-        return abort(
-            403, description="Forbidden: You do not have permission to view this user"
-        )
+    user = users_service.get_accessible_user(user_id, FORBIDDEN)
 
     # Check if the user has a profile picture
     if user.profile_picture is None:
         return abort(404, description="Profile picture not found")
 
     # Return the profile picture as a json object
-    return jsonify({"file_url": user.profile_picture}), 200
+    return (
+        jsonify(
+            {
+                "file_url": user.profile_picture,
+                "variants": user.profile_picture_variants,
+            }
+        ),
+        200,
+    )
 
 
 @views_bp.route(
@@ -342,20 +220,7 @@ def get_profile_picture(user_id):
 @user_exists
 def upload_profile_picture(user_id):
     """Upload a profile picture for the user"""
-    user = db.session.get(User, user_id)
-
-    if user is None:
-        return abort(404, description="User not found")
-
-    # Check the log in user credentials
-    log_in_user_email = get_jwt_identity()
-    log_in_user = db.session.query(User).filter_by(email=log_in_user_email).first()
-    roles = [role.name for role in log_in_user.roles]
-    # Check if the log in user is the same as the user being retrieved
-    if log_in_user.id != user_id and "Admin" not in roles and "Developer" not in roles:
-        return abort(
-            403, description="Forbidden: You do not have permission to view this user"
-        )
+    users_service.get_accessible_user(user_id, FORBIDDEN)
 
     # Check if the request has a file
     if "file" not in request.files:
@@ -365,67 +230,11 @@ def upload_profile_picture(user_id):
     if profile_picture.filename == "":
         return abort(400, description="Bad Request: No selected file")
 
-    # Create user directory and subdirectory for profile pictures in Drive
-
-    # Get the root folder
-    root_folder = drive.root_folder_id
-    users = drive.users_folder_id
-
-    current_user_folder_name = f"user_{user_id}"
-    # Create a folder for the current user if it doesn't exist
-    user_folder = drive.find_folder_id(current_user_folder_name, users)
-    if not user_folder:
-        user_folder = drive.create_folder(current_user_folder_name, users)
-
-    # print(user_folder)
-
-    # Create a folder for the profile pictures if it doesn't exist
-    profile_pic_folder = drive.find_folder_id("profilepic", user_folder)
-    if not profile_pic_folder:
-        profile_pic_folder = drive.create_folder("profilepic", user_folder)
-
-    # print(profile_pic_folder)
-
-    # Construct the file path
-    directory_path = f"tmp/fitjourney/user_{user_id}/profilepic"
-    file_path = f"{directory_path}/{profile_picture.filename}"
-    # Ensure the directory exists
-    os.makedirs(directory_path, exist_ok=True)
-
-    # Save the file to the temp folder
-    profile_picture.save(file_path)
-
-    file_id, file_url = drive.find_file_id(profile_picture.filename, profile_pic_folder)
-    if file_id:
-        return abort(
-            400,
-            description=f"Bad Request: File already exists {file_url.split('&')[0]}",
-        )
-
-    # Upload the file to drive
-    file_id, web_view_link, web_content_link = drive.upload_file(
-        file_path, profile_pic_folder
-    )
-
-    web_content_link = web_content_link.split("&")[0]
-
-    # print(f"File ID: {file_id}")
-    # print(f"Web View Link: {web_view_link}")
-    # print(f"Web Content Link: {web_content_link}")
-
-    # Update the user profile picture URL in the database
-    user.profile_picture = web_content_link
-    db.session.commit()
-    # Remove the file from the temp folder
-    os.remove(file_path)
-
-    # Return the file url as a json object
-    return (
-        jsonify(
-            {"message": "File uploaded successfully", "file_url": web_content_link}
-        ),
-        201,
+    # Upload the profile picture to the media storage in the background
+    job = media_jobs.submit(
+        "profile_picture", user_id, user_id, profile_picture, profile_picture.filename
     )
+    return job_accepted(job, "The profile picture upload has been queued")
 
 
 @views_bp.route(
@@ -435,19 +244,7 @@ def upload_profile_picture(user_id):
 @user_exists
 def update_profile_picture(user_id):
     """Update the profile picture for the user"""
-    user = db.session.get(User, user_id)
-    if user is None:
-        return abort(404, description="User not found")
-
-    # Check the log in user credentials
-    log_in_user_email = get_jwt_identity()
-    log_in_user = db.session.query(User).filter_by(email=log_in_user_email).first()
-    roles = [role.name for role in log_in_user.roles]
-    # Check if the log in user is the same as the user being retrieved
-    if log_in_user.id != user_id and "Admin" not in roles and "Developer" not in roles:
-        return abort(
-            403, description="Forbidden: You do not have permission to view this user"
-        )
+    users_service.get_accessible_user(user_id, FORBIDDEN)
 
     if "file" not in request.files:
         return abort(400, description="Bad Request: No file part")
@@ -456,73 +253,17 @@ def update_profile_picture(user_id):
     if profile_picture.filename == "":
         return abort(400, description="Bad Request: No selected file")
 
-    old_profile_picture_url = user.profile_picture
-
-    # Save the new profile picture to a temporary location
-    directory_path = f"tmp/fitjourney/user_{user_id}/profilepic"
-    file_path = f"{directory_path}/{profile_picture.filename}"
-    os.makedirs(directory_path, exist_ok=True)
-    profile_picture.save(file_path)
-
-    # Upload the new profile picture to Google Drive
-    try:
-        profile_pic_folder = drive.find_folder_id(
-            "profilepic",
-            drive.find_folder_id("user_" + str(user_id), drive.users_folder_id),
-        )
-        if not profile_pic_folder:
-            return abort(
-                404,
-                description="Profile picture folder not found, please upload a new profile picture",
-            )
-        file_id, web_view_link, web_content_link = drive.upload_file(
-            file_path, profile_pic_folder
-        )
-        if not file_id:
-            os.remove(file_path)
-            return abort(
-                500,
-                description=f"Failed to upload new profile picture, The old profile_picture_url: {old_profile_picture_url}",
-            )
-
-        # Update the user's profile picture URL in the database
-        web_content_link = web_content_link.split("&")[0]
-        user.profile_picture = web_content_link
-        db.session.commit()
-    except Exception as e:
-        return abort(
-            500,
-            description=f"Internal Server Error: {e}, The Old profile_picture_url: {old_profile_picture_url}",
-        )
-
-    # Delete the old profile picture if it exists
-    print(old_profile_picture_url)
-    if old_profile_picture_url:
-        try:
-            result, message = drive.delete_file(webContentLink=old_profile_picture_url)
-            print(result, message)
-            if not result:
-                return abort(
-                    500,
-                    description=f"Failed to delete old profile picture: {message}, The New profile_picture_url: {web_content_link}",
-                )
-        except Exception as e:
-            return abort(
-                500,
-                description=f"Internal Server Error: {e}, The New profile_picture_url: {web_content_link}",
-            )
-
-        # Remove the file from the temp folder
-        os.remove(file_path)
-        return (
-            jsonify(
-                {
-                    "message": "Profile picture updated successfully",
-                    "new_profile_picture_url": web_content_link,
-                }
-            ),
-            200,
-        )
+    # Upload the new profile picture to the media storage in the background,
+    # the old one is deleted once the upload is done
+    job = media_jobs.submit(
+        "profile_picture",
+        user_id,
+        user_id,
+        profile_picture,
+        profile_picture.filename,
+        replace_media=True,
+    )
+    return job_accepted(job, "The profile picture update has been queued")
 
 
 @views_bp.route(
@@ -535,33 +276,8 @@ def update_profile_picture(user_id):
 def delete_profile_picture(user_id):
     """Delete the profile picture for the user"""
 
-    user = db.session.get(User, user_id)
-    if user is None:
-        return abort(404, description="User not found")
-
-    # Check the log in user credentials
-    log_in_user_email = get_jwt_identity()
-    log_in_user = db.session.query(User).filter_by(email=log_in_user_email).first()
-    roles = [role.name for role in log_in_user.roles]
-    # Check if the log in user is the same as the user being retrieved
-    if log_in_user.id != user_id and "Admin" not in roles and "Developer" not in roles:
-        return abort(
-            403, description="Forbidden: You do not have permission to view this user"
-        )
-
-    profile_picture_url = user.profile_picture
-    if not profile_picture_url:
-        return abort(404, description="Profile picture not found")
-
-    try:
-        result, message = drive.delete_file(webContentLink=profile_picture_url)
-
-        if result is True:
-            # update the user profile picture to None
-            user.profile_picture = None
-            db.session.commit()
-            return jsonify({"message": message}), 200
+    user = users_service.get_accessible_user(user_id, FORBIDDEN)
 
-        return abort(500, description=f"Internal Server Error: {message}")
-    except Exception as e:
-        return abort(500, description=f"Internal Server Error: {e}")
+    with unit_of_work():
+        message = users_service.delete_profile_picture(user)
+    return jsonify({"message": message}), 200
@@ -31,7 +31,14 @@ from flask_migrate import Migrate
 from api.v1.views import views_bp
 from flask_jwt_extended import JWTManager
 from auth import auth_bp
+from decorators import is_token_revoked
 from errors import errors_bp
+from exercise_import import exercises_cli
+from record_aggregates import records_cli
+from media_jobs import media_jobs
+from uploads import UploadRequest
+from json_provider import FastJSONProvider
+import db_pool
 
 from models.user import User
 from models.role import Role
@@ -41,14 +48,21 @@ from models.record import Record
 from models.exercise import Exercise
 from models.day import Day
 from models.workout_session import WorkoutSession
+from models.cache_version import CacheVersion
+from models.record_aggregate import RecordAggregate
 
 
 app = Flask(__name__)
+# Stream the uploaded files to the staging directory of the media jobs
+app.request_class = UploadRequest
+# Encode the json responses with orjson
+app.json = FastJSONProvider(app)
 
 # Get the configuration from config.py
 app.config.from_object(Config)
 
-# initialize and connect the app to sqlalchemy
+# initialize and connect the app to sqlalchemy, with a metered pool
+db_pool.init_app(app)
 db.init_app(app)
 migrate = Migrate(app, db)
 
@@ -102,6 +116,8 @@ with app.app_context():
 # initialize the app to use JWT
 jwt = JWTManager(app)
 jwt.init_app(app)
+# Reject access tokens issued before the user's roles changed
+jwt.token_in_blocklist_loader(is_token_revoked)
 
 # Register the blueprints
 app.register_blueprint(views_bp)
@@ -109,6 +125,13 @@ app.register_blueprint(errors_bp)
 app.register_blueprint(auth_bp)
 app.register_blueprint(app.config['SWAGGERUI_BLUEPRINT'])
 
+# Start the workers of the background media uploads
+media_jobs.init_app(app)
+
+# Register the command line commands
+app.cli.add_command(exercises_cli)
+app.cli.add_command(records_cli)
+
 
 if __name__ == "__main__":
     app.run(host="localhost", port="5000", debug=True)
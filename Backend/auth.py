@@ -12,15 +12,26 @@ from flask_jwt_extended import (
     get_jwt_identity,
     get_jwt,
 )
+from models.base import db
 from models.user import User
 from models.role import Role
-from decorators import roles_required
-import requests
+from decorators import roles_required, forget_roles_version
+from rate_limit import login_rate_limit
+from services import users as users_service, roles as roles_service
+from services import ConflictError, ServiceError
 
 
 auth_bp = Blueprint("auth_pb", __name__, url_prefix="/auth")
 
 
+def create_tokens(user):
+    """Create the access and refresh tokens carrying the user's id and roles"""
+    claims = user.token_claims()
+    access_token = create_access_token(identity=user.email, additional_claims=claims)
+    refresh_token = create_refresh_token(identity=user.email, additional_claims=claims)
+    return access_token, refresh_token
+
+
 def validate_signup_data(data):
     """Helper function to validate signup data"""
     required_fields = ["first_name", "last_name", "email", "password"]
@@ -34,19 +45,26 @@ def signup_user():
     if not data or not validate_signup_data(data):
         return jsonify({"message": "Missing fields in request"}), 400
 
-    response = requests.post("http://localhost:5000/api/v1/users", json=data)
-    if response.status_code == 201:
+    try:
+        new_user = users_service.create_user(data)
+    except ConflictError:
+        return jsonify({"message": "User already exists"}), 409
+    except ServiceError as error:
         return (
             jsonify(
-                {"message": "User created successfully", "new_user": response.json()}
+                {
+                    "error": "Something went wrong",
+                    "details": {"error": error.description},
+                }
             ),
-            201,
+            error.status,
         )
-    if response.status_code == 409:
-        return jsonify({"message": "User already exists"}), 409
+    db.session.commit()
     return (
-        jsonify({"error": "Something went wrong", "details": response.json()}),
-        response.status_code,
+        jsonify(
+            {"message": "User created successfully", "new_user": new_user.to_dict()}
+        ),
+        201,
     )
 
 
@@ -56,6 +74,7 @@ def validate_login_data(data):
 
 
 @auth_bp.route("/login", methods=["POST"], strict_slashes=False)
+@login_rate_limit
 def log_in():
     """Log in the user"""
     data = request.get_json()
@@ -68,9 +87,11 @@ def log_in():
 
     if not user.check_password(data["password"]):
         return jsonify({"message": "Unauthorized, Invalid password"}), 401
+    # Upgrade the hash when BCRYPT_ROUNDS changed
+    if user.rehash_password(data["password"]):
+        db.session.commit()
 
-    access_token = create_access_token(identity=user.email)
-    refresh_token = create_refresh_token(identity=user.email)
+    access_token, refresh_token = create_tokens(user)
     return (
         jsonify(
             {
@@ -85,6 +106,7 @@ def log_in():
 
 
 @auth_bp.route("/admin/login", methods=["POST"], strict_slashes=False)
+@login_rate_limit
 def admin_login():
     """Log in the admin user"""
     data = request.get_json()
@@ -97,12 +119,14 @@ def admin_login():
 
     if not user.check_password(data["password"]):
         return jsonify({"message": "Unauthorized, Invalid password"}), 401
+    # Upgrade the hash when BCRYPT_ROUNDS changed
+    if user.rehash_password(data["password"]):
+        db.session.commit()
 
     if not user.is_admin():
         return jsonify({"message": "Unauthorized, Insufficient permissions"}), 403
 
-    access_token = create_access_token(identity=user.email)
-    refresh_token = create_refresh_token(identity=user.email)
+    access_token, refresh_token = create_tokens(user)
     return (
         jsonify(
             {
@@ -124,54 +148,20 @@ def admin_login():
 @roles_required("Admin")
 def create_users_roles(user_id, role_name):
     """Create a new role if it does not exist and assign it to a user"""
-
-    # Obtain the JWT token from the current request
-    current_token = request.headers.get("Authorization", None).split(" ")[1]
-    headers = {
-        "Authorization": f"Bearer {current_token}",
-        "Content-Type": "application/json",
-    }
-
-    user_response = requests.get(
-        f"http://localhost:5000/api/v1/users/{user_id}", headers=headers
-    )
-    if user_response.status_code == 404:
+    user = db.session.get(User, user_id)
+    if not user:
         return jsonify({"message": "User not found"}), 404
 
-    role_response = requests.post(
-        "http://localhost:5000/api/v1/roles",
-        json={"role_name": role_name},
-        headers=headers,
-    )
-    if role_response.status_code in [201, 409]:
-        assign_role_response = requests.post(
-            f"http://localhost:5000/api/v1/users/{user_id}/roles/{role_name}",
-            headers=headers,
-        )
-        if assign_role_response.status_code == 201:
-            return (
-                jsonify(
-                    {"message": f"Role {role_name} assigned successfully to this user"}
-                ),
-                201,
-            )
-        return (
-            jsonify(
-                {
-                    "error": f"Something went wrong when assigning role {role_name} to user",
-                    "details": assign_role_response.json(),
-                }
-            ),
-            assign_role_response.status_code,
-        )
+    # The role and the assignment are committed together
+    role, _ = roles_service.get_or_create_role(role_name)
+    if not users_service.assign_role(user, role):
+        db.session.commit()
+        return jsonify({"message": f"User already has role {role_name}"}), 200
+    db.session.commit()
+    forget_roles_version(user.id)
     return (
-        jsonify(
-            {
-                "error": f"Something went wrong when creating a role {role_name}",
-                "details": role_response.json(),
-            }
-        ),
-        role_response.status_code,
+        jsonify({"message": f"Role {role_name} assigned successfully to this user"}),
+        201,
     )
 
 
@@ -180,5 +170,12 @@ def create_users_roles(user_id, role_name):
 def refresh():
     """Refresh the access token"""
     current_user = get_jwt_identity()
-    new_access_token = create_access_token(identity=current_user)
+    user = User.find_user_by_email(current_user, with_roles=True)
+    if not user:
+        return jsonify({"message": "User does not exist"}), 404
+
+    # Issue fresh claims, the roles may have changed since the last log in
+    new_access_token = create_access_token(
+        identity=current_user, additional_claims=user.token_claims()
+    )
     return jsonify(access_token=new_access_token), 200
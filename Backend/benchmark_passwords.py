@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+    Concurrency benchmark of the password checks. A storm of logins checks
+    passwords from many threads while another thread serves a small request
+    in a loop, with the checks done in the request threads and then in
+    pools of 1 to one worker per core. Run it from the Backend directory:
+    ./benchmark_passwords.py [login threads] [seconds] [bcrypt rounds]
+    """
+
+
+import os
+import sys
+import threading
+import time
+import bcrypt
+from passwords import PasswordPool
+
+
+def other_request():
+    """A small request of another endpoint, a few milliseconds of Python"""
+    return sum(index * index for index in range(50000))
+
+
+def storm(pool, threads, seconds, password, password_hashed):
+    """
+    Check passwords from threads during seconds, return the number of
+    logins per second and the latencies of the other requests
+    """
+    stop = time.perf_counter() + seconds
+    logins = [0] * threads
+
+    def login(index):
+        while time.perf_counter() < stop:
+            assert pool.run(bcrypt.checkpw, password, password_hashed)
+            logins[index] += 1
+
+    workers = [threading.Thread(target=login, args=(i,)) for i in range(threads)]
+    for worker in workers:
+        worker.start()
+    latencies = []
+    while time.perf_counter() < stop:
+        started_at = time.perf_counter()
+        other_request()
+        latencies.append((time.perf_counter() - started_at) * 1000)
+    for worker in workers:
+        worker.join()
+    return sum(logins) / seconds, sorted(latencies)
+
+
+def percentile(values, fraction):
+    return values[min(int(len(values) * fraction), len(values) - 1)] if values else 0
+
+
+def main(threads=16, seconds=5.0, rounds=12):
+    cores = os.cpu_count() or 1
+    password = b"password"
+    password_hashed = bcrypt.hashpw(password, bcrypt.gensalt(rounds))
+    started_at = time.perf_counter()
+    other_request()
+    idle = (time.perf_counter() - started_at) * 1000
+
+    print(f"{cores} cores, {threads} login threads, {rounds} rounds")
+    print(f"other request alone: {idle:.1f}ms")
+    print(
+        f"{'workers':<10}{'logins/s':>10}{'per core':>10}{'other p50':>12}{'p95':>10}"
+    )
+    for workers in sorted({0, 1, max(cores // 2, 1), cores}):
+        pool = PasswordPool(workers, max_pending=threads, timeout=60)
+        # Start the threads of the pool before measuring
+        pool.run(bcrypt.checkpw, password, password_hashed)
+        rate, latencies = storm(pool, threads, seconds, password, password_hashed)
+        used = min(workers or threads, cores)
+        print(
+            f"{workers or 'inline':<10}{rate:>10.1f}{rate / used:>10.1f}"
+            f"{percentile(latencies, 0.5):>10.1f}ms"
+            f"{percentile(latencies, 0.95):>8.1f}ms"
+        )
+        if pool.executor is not None:
+            pool.executor.shutdown()
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    main(
+        int(args[0]) if len(args) > 0 else 16,
+        float(args[1]) if len(args) > 1 else 5.0,
+        int(args[2]) if len(args) > 2 else 12,
+    )
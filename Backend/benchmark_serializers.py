@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+    Microbenchmark of the compiled serializers of the models against the
+    former to_dict, which inspected the mapper of every object and then
+    renamed the private columns, over objects loaded from an in-memory
+    SQLite database. Run it from the Backend directory:
+    ./benchmark_serializers.py [number of objects]
+    """
+
+
+import json
+import sys
+from datetime import datetime
+from timeit import repeat
+import bcrypt
+from sqlalchemy import create_engine, select
+from sqlalchemy.inspection import inspect
+from sqlalchemy.orm import Session
+from models.base import db
+from models.user import User
+from models.role import Role
+from models.plan import Plan
+from models.day import Day
+from models.workout_session import WorkoutSession
+from models.exercise import Exercise
+from models.custom_exercise import CustomExercise
+from models.record import Record
+
+
+MODELS = (Record, WorkoutSession, Plan, Day, User, Role, Exercise, CustomExercise)
+
+
+def inspect_to_dict(obj):
+    """The former to_dict: the columns of the mapper, then the renames"""
+    time_format = type(obj).json_time_format
+    new_dict = {c.key: getattr(obj, c.key) for c in inspect(obj).mapper.column_attrs}
+    for key, value in new_dict.items():
+        if isinstance(value, datetime):
+            new_dict[key] = value.strftime(time_format)
+    for key, name in type(obj).json_names.items():
+        new_dict[name] = new_dict[key]
+        del new_dict[key]
+    for key in type(obj).json_exclude:
+        del new_dict[key]
+    return new_dict
+
+
+def rows(model, count):
+    """The rows of a table of the benchmark"""
+    created_at = datetime(2024, 1, 1, 8, 30)
+    if model is User:
+        # The password is hashed once for all the users
+        password = bcrypt.hashpw(b"password", bcrypt.gensalt()).decode("utf-8")
+        return [
+            {
+                "first_name": "Jane",
+                "last_name": "Doe",
+                "email": f"jane{index}@example.com",
+                "password_hashed": password,
+                "created_at": created_at,
+                "roles_version": 1,
+            }
+            for index in range(count)
+        ]
+    if model is Role:
+        return [{"name": f"Role {index}"} for index in range(count)]
+    if model is Plan:
+        return [
+            {
+                "user_id": 1,
+                "goal": "Lose weight",
+                "_current_weight": 80.5,
+                "_target_weight": 75.0,
+                "_duration": 8,
+                "_days_in_week": 4,
+                "created_at": created_at,
+            }
+        ] * count
+    if model is Day:
+        return [{"plan_id": 1, "title": "Day 1", "_session_duration": 60}] * count
+    if model is WorkoutSession:
+        return [
+            {
+                "day_id": 1,
+                "exercise_id": 1,
+                "_sets": 4,
+                "_reps": 8,
+                "_rest": 90.0,
+                "_weight_lifted": 60.0,
+            }
+        ] * count
+    if model is Record:
+        return [
+            {
+                "user_id": 1,
+                "exercise_id": 1,
+                "_difficulty": 3,
+                "_sets": 4,
+                "_reps": 8,
+                "_rest": 90.0,
+                "_weight_lifted": 62.5,
+                "_user_weight": 80.0,
+                "location": "gym",
+                "notes": "felt good",
+                "date": created_at,
+            }
+        ] * count
+    return [
+        {
+            "title": "Bench press",
+            "category": "Strength",
+            "muscle_group": "Chest",
+            "user_id": 1,
+            "media_variants": {"thumb": "https://example.com/thumb.webp"},
+        }
+    ] * count
+
+
+def best(function, number=5):
+    """The best time of a function in milliseconds"""
+    return min(repeat(function, number=number, repeat=5)) / number * 1000
+
+
+def main(count=1000):
+    engine = create_engine("sqlite://")
+    db.metadata.create_all(engine)
+    with Session(engine) as session:
+        for model in MODELS:
+            columns = {attr.key for attr in inspect(model).column_attrs}
+            session.execute(
+                db.insert(model),
+                [
+                    {key: value for key, value in row.items() if key in columns}
+                    for row in rows(model, count)
+                ],
+            )
+        session.commit()
+
+        print(f"{'model':<16}{'inspect':>12}{'compiled':>12}{'speedup':>10}")
+        for model in MODELS:
+            objects = session.scalars(select(model)).all()
+            # The output must not change, including the order of the keys
+            for obj in objects:
+                assert json.dumps(inspect_to_dict(obj)) == json.dumps(obj.to_dict())
+            serialize = model.serializer()
+            before = best(lambda: [inspect_to_dict(obj) for obj in objects])
+            after = best(lambda: [serialize(obj) for obj in objects])
+            print(
+                f"{model.__name__:<16}{before:>10.2f}ms"
+                f"{after:>10.2f}ms{before / after:>9.1f}x"
+            )
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000)
@@ -8,6 +8,7 @@
 from os import getenv
 import subprocess
 from datetime import timedelta
+from flask import current_app, has_app_context
 from flask_swagger_ui import get_swaggerui_blueprint
 
 
@@ -31,6 +32,22 @@ class Config:
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     SQLALCHEMY_ECHO = False
 
+    # Pool of the connections to MySQL of each server process
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        "pool_size": int(getenv("DB_POOL_SIZE", 10)),
+        # Connections opened beyond pool_size under a burst, closed after use
+        "max_overflow": int(getenv("DB_MAX_OVERFLOW", 10)),
+        # Seconds a request waits for a connection before a 503 error
+        "pool_timeout": float(getenv("DB_POOL_TIMEOUT", 10)),
+        # Seconds before a connection is replaced, below the wait_timeout of MySQL
+        "pool_recycle": int(getenv("DB_POOL_RECYCLE", 1800)),
+        # Check the connections before using them, a stale one is replaced
+        "pool_pre_ping": getenv("DB_POOL_PRE_PING", "true").lower() == "true",
+    }
+    # e.g. READ COMMITTED, the default of the database when not set
+    if getenv("DB_ISOLATION_LEVEL"):
+        SQLALCHEMY_ENGINE_OPTIONS["isolation_level"] = getenv("DB_ISOLATION_LEVEL")
+
     # engine = create_engine(SQLALCHEMY_DATABASE_URI)
     # session_factory = sessionmaker(bind=engine)
     # Session = scoped_session(session_factory)
@@ -39,6 +56,85 @@ class Config:
     SECRET_KEY = getenv("SECRET_KEY")
     JWT_ACCESS_TOKEN_EXPIRES = timedelta(days=1)
     JWT_REFRESH_TOKEN_EXPIRES = timedelta(days=30)
+    # Seconds a worker trusts its cached copy of a user's roles version. The
+    # worker handling a role change forgets its copy at once, the other workers
+    # keep accepting the tokens of the former roles for up to this many seconds
+    JWT_ROLES_VERSION_TTL = int(getenv("JWT_ROLES_VERSION_TTL", 30))
+    # Users whose roles version a worker keeps, the least recently used dropped
+    JWT_ROLES_VERSION_CACHE_SIZE = int(getenv("JWT_ROLES_VERSION_CACHE_SIZE", 10000))
+
+    # Pagination configuration
+    PAGINATION_DEFAULT_LIMIT = int(getenv("PAGINATION_DEFAULT_LIMIT", 20))
+    PAGINATION_MAX_LIMIT = int(getenv("PAGINATION_MAX_LIMIT", 100))
+    # Seconds a cached total of a list endpoint is reused
+    PAGINATION_COUNT_TTL = int(getenv("PAGINATION_COUNT_TTL", 60))
+    # Totals cached by a worker, the least recently used dropped
+    PAGINATION_COUNT_CACHE_SIZE = int(getenv("PAGINATION_COUNT_CACHE_SIZE", 1000))
+    # Rows read from the database at a time by the streamed exports
+    EXPORT_BATCH_SIZE = int(getenv("EXPORT_BATCH_SIZE", 1000))
+
+    # Cost of the bcrypt password hashes (2^rounds iterations)
+    BCRYPT_ROUNDS = int(getenv("BCRYPT_ROUNDS", 12))
+    # Threads hashing and checking the passwords, 0 to do it in the request
+    PASSWORD_HASH_WORKERS = int(getenv("PASSWORD_HASH_WORKERS", 2))
+    # Password hashes and checks running or waiting at once in a server process
+    PASSWORD_HASH_MAX_PENDING = int(getenv("PASSWORD_HASH_MAX_PENDING", 16))
+    # Seconds a password check waits for a place before a 503 response
+    PASSWORD_HASH_TIMEOUT = float(getenv("PASSWORD_HASH_TIMEOUT", 5))
+
+    # Login attempts per client ip and per email in RATE_LIMIT_PERIOD seconds,
+    # refused with a 429 error before the database is read, 0 for no limit
+    RATE_LIMIT_ENABLED = getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+    RATE_LIMIT_PERIOD = float(getenv("RATE_LIMIT_PERIOD", 60))
+    LOGIN_RATE_LIMIT_PER_IP = int(getenv("LOGIN_RATE_LIMIT_PER_IP", 20))
+    LOGIN_RATE_LIMIT_PER_EMAIL = int(getenv("LOGIN_RATE_LIMIT_PER_EMAIL", 5))
+    # Store of the rate limits: memory, or sqlite to share them between the
+    # workers of a host
+    RATE_LIMIT_STORAGE = getenv("RATE_LIMIT_STORAGE", "memory")
+    RATE_LIMIT_DATABASE = getenv(
+        "RATE_LIMIT_DATABASE", "tmp/fitjourney/rate_limits.sqlite3"
+    )
+
+    # Seconds between two checks of the shared version of the exercises catalog
+    EXERCISE_CATALOG_CHECK_INTERVAL = float(
+        getenv("EXERCISE_CATALOG_CHECK_INTERVAL", 5)
+    )
+    # Users whose custom exercises search index a worker keeps, the least
+    # recently used dropped
+    CUSTOM_EXERCISE_INDEX_CACHE_SIZE = int(
+        getenv("CUSTOM_EXERCISE_INDEX_CACHE_SIZE", 1000)
+    )
+
+    # Number of rows inserted per transaction by the exercises bulk import
+    EXERCISE_IMPORT_BATCH_SIZE = int(getenv("EXERCISE_IMPORT_BATCH_SIZE", 500))
+
+    # Maximum number of records created by one batch request
+    RECORDS_BATCH_MAX_SIZE = int(getenv("RECORDS_BATCH_MAX_SIZE", 100))
+
+    # Background media uploads
+    MEDIA_JOBS_DATABASE = getenv(
+        "MEDIA_JOBS_DATABASE", "tmp/fitjourney/media_jobs.sqlite3"
+    )
+    MEDIA_STAGING_DIR = getenv("MEDIA_STAGING_DIR", "tmp/fitjourney/staging")
+    MEDIA_UPLOAD_WORKERS = int(getenv("MEDIA_UPLOAD_WORKERS", 2))
+    MEDIA_JOB_STALE_SECONDS = int(getenv("MEDIA_JOB_STALE_SECONDS", 3600))
+    # Largest uploaded file in bytes, checked while the file is received
+    MEDIA_MAX_SIZE = int(getenv("MEDIA_MAX_SIZE", 200 * 1024 * 1024))
+    # Drive client created on the first media request: google or memory
+    DRIVE_BACKEND = getenv("DRIVE_BACKEND", "google")
+    # Local cache of the ids of the Drive folders and files
+    DRIVE_ID_CACHE = getenv("DRIVE_ID_CACHE", "tmp/fitjourney/drive_ids.sqlite3")
+    # Seconds a folder or a file that was not found is remembered as missing
+    DRIVE_NEGATIVE_CACHE_TTL = int(getenv("DRIVE_NEGATIVE_CACHE_TTL", 300))
+    # Size of the chunks of the resumable uploads, a multiple of 256 KB
+    DRIVE_UPLOAD_CHUNK_SIZE = int(getenv("DRIVE_UPLOAD_CHUNK_SIZE", 8 * 1024 * 1024))
+    # Storage of the media files: drive, or local for the content-addressed
+    # store in MEDIA_STORAGE_DIR served by /api/v1/media
+    MEDIA_STORAGE = getenv("MEDIA_STORAGE", "drive")
+    MEDIA_STORAGE_DIR = getenv("MEDIA_STORAGE_DIR", "tmp/fitjourney/media")
+    # Origin of the media urls, e.g. a CDN in front of the app
+    MEDIA_BASE_URL = getenv("MEDIA_BASE_URL", "")
+    MEDIA_MAX_AGE = int(getenv("MEDIA_MAX_AGE", 31536000))
 
     # Swagger configuration
     SWAGGER_URL = "/api/docs"
@@ -47,3 +143,10 @@ class Config:
     SWAGGERUI_BLUEPRINT = get_swaggerui_blueprint(
         SWAGGER_URL, API_URL, config=SWAGGER_CONFIG
     )
+
+
+def setting(name):
+    """Read a setting from the app config, or from Config outside of the app"""
+    if has_app_context():
+        return current_app.config.get(name, getattr(Config, name))
+    return getattr(Config, name)
@@ -0,0 +1,10 @@
+"""
+    Configuration of the tests: the modules of the Backend import each
+    other from the Backend directory, e.g. `from models.base import db`
+    """
+
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+    The pool of database connections of a server process. The pool is a
+    QueuePool configured by the SQLALCHEMY_ENGINE_OPTIONS of config.py
+    which also measures how long the requests wait for a connection, so
+    the size of the pool can be tuned from the stats endpoint
+    """
+
+
+import os
+from collections import deque
+from threading import Lock
+from time import perf_counter
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError
+from sqlalchemy.pool import QueuePool
+
+
+class PoolStats:
+    """Counters of the pool of a process, since the process started"""
+
+    def __init__(self, samples=1000):
+        self.lock = Lock()
+        # Seconds of the last checkouts, for the percentiles
+        self.waits = deque(maxlen=samples)
+        self.checkouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.timeouts = 0
+        self.connects = 0
+        self.invalidations = 0
+
+    def add_checkout(self, seconds, timed_out=False):
+        with self.lock:
+            self.checkouts += 1
+            self.wait_total += seconds
+            self.wait_max = max(self.wait_max, seconds)
+            self.waits.append(seconds)
+            if timed_out:
+                self.timeouts += 1
+
+    def add_connect(self):
+        with self.lock:
+            self.connects += 1
+
+    def add_invalidation(self):
+        with self.lock:
+            self.invalidations += 1
+
+    def to_dict(self):
+        with self.lock:
+            waits = sorted(self.waits)
+            checkouts = self.checkouts
+            new_dict = {
+                "checkouts": checkouts,
+                "timeouts": self.timeouts,
+                "connects": self.connects,
+                "invalidations": self.invalidations,
+                "wait_ms": {
+                    "avg": self.wait_total / checkouts * 1000 if checkouts else 0.0,
+                    "max": self.wait_max * 1000,
+                },
+            }
+        for name, fraction in (("p50", 0.5), ("p95", 0.95), ("p99", 0.99)):
+            index = min(int(len(waits) * fraction), len(waits) - 1)
+            new_dict["wait_ms"][name] = waits[index] * 1000 if waits else 0.0
+        for name, value in new_dict["wait_ms"].items():
+            new_dict["wait_ms"][name] = round(value, 3)
+        return new_dict
+
+
+pool_stats = PoolStats()
+
+
+class MeteredQueuePool(QueuePool):
+    """A QueuePool recording the time taken by each checkout in pool_stats"""
+
+    def connect(self):
+        started_at = perf_counter()
+        try:
+            connection = super().connect()
+        except TimeoutError:
+            pool_stats.add_checkout(perf_counter() - started_at, timed_out=True)
+            raise
+        pool_stats.add_checkout(perf_counter() - started_at)
+        return connection
+
+
+@event.listens_for(MeteredQueuePool, "connect")
+def on_connect(dbapi_connection, connection_record):
+    pool_stats.add_connect()
+
+
+@event.listens_for(MeteredQueuePool, "invalidate")
+def on_invalidate(dbapi_connection, connection_record, exception):
+    # e.g. a connection closed by MySQL after its wait_timeout
+    pool_stats.add_invalidation()
+
+
+def init_app(app):
+    """Use the metered pool for the engine of the app, before db.init_app"""
+    # A copy, the options of the config class are shared by the apps
+    options = dict(app.config.get("SQLALCHEMY_ENGINE_OPTIONS") or {})
+    if "pool_size" in options or "max_overflow" in options:
+        options.setdefault("poolclass", MeteredQueuePool)
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = options
+
+
+def pool_status(engine):
+    """The state of the pool of an engine and the stats of its checkouts"""
+    pool = engine.pool
+    status = {"pid": os.getpid(), "pool": type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        status.update(
+            {
+                "size": pool.size(),
+                "checked_out": pool.checkedout(),
+                "checked_in": pool.checkedin(),
+                "overflow": max(pool.overflow(), 0),
+                "max_overflow": pool._max_overflow,
+                "timeout": pool.timeout(),
+                "recycle": pool._recycle,
+                "pre_ping": pool._pre_ping,
+            }
+        )
+    status.update(pool_stats.to_dict())
+    return status
@@ -1,9 +1,98 @@
+from collections import OrderedDict
 from functools import wraps
-from flask import jsonify, request, abort
-from flask_jwt_extended import jwt_required, get_jwt_identity
+from threading import Lock
+from time import monotonic
+from flask import jsonify, request, abort, g, current_app
+from flask_jwt_extended import jwt_required, get_jwt_identity, get_jwt
 from models.user import User
 
 
+# Cache of the users roles versions: user_id -> (roles_version, fetched_at),
+# the least recently used users are dropped beyond JWT_ROLES_VERSION_CACHE_SIZE
+_roles_versions = OrderedDict()
+_roles_versions_lock = Lock()
+
+
+def current_roles_version(user_id):
+    """
+    Return the roles version of a user, refreshed from the database
+    at most once every JWT_ROLES_VERSION_TTL seconds
+    """
+    ttl = current_app.config.get("JWT_ROLES_VERSION_TTL", 30)
+    size = current_app.config.get("JWT_ROLES_VERSION_CACHE_SIZE", 10000)
+    now = monotonic()
+    with _roles_versions_lock:
+        cached = _roles_versions.get(user_id)
+        if cached and now - cached[1] < ttl:
+            _roles_versions.move_to_end(user_id)
+            return cached[0]
+
+    roles_version = User.get_roles_version(user_id)
+    with _roles_versions_lock:
+        _roles_versions[user_id] = (roles_version, now)
+        _roles_versions.move_to_end(user_id)
+        while len(_roles_versions) > size:
+            _roles_versions.popitem(last=False)
+    return roles_version
+
+
+def forget_roles_version(user_id):
+    """
+    Drop the cached roles version of a user after its roles changed. Only
+    the cache of this process is cleared, the other workers see the change
+    within JWT_ROLES_VERSION_TTL seconds
+    """
+    with _roles_versions_lock:
+        _roles_versions.pop(user_id, None)
+
+
+def is_token_revoked(jwt_header, jwt_payload):
+    """
+    Reject access tokens whose role claims are older than the user's roles,
+    and the ones of deleted users, whose roles version is None.
+    Refresh tokens are accepted, the refresh endpoint issues fresh claims
+    """
+    if jwt_payload.get("type") == "refresh" or "rv" not in jwt_payload:
+        return False
+    roles_version = current_roles_version(jwt_payload["uid"])
+    return roles_version is None or roles_version != jwt_payload["rv"]
+
+
+def get_current_user():
+    """
+    Return the logged-in user with its roles eager-loaded.
+    The user is resolved once per request and stored on flask.g
+    """
+    if "current_user" not in g:
+        g.current_user = User.find_user_by_email(get_jwt_identity(), with_roles=True)
+    return g.current_user
+
+
+def get_current_identity():
+    """
+    Return the id and the role names of the logged-in user, read from the
+    token claims when present, otherwise from the database
+    """
+    claims = get_jwt()
+    if "uid" in claims and "roles" in claims:
+        return claims["uid"], claims["roles"]
+
+    log_in_user = get_current_user()
+    if log_in_user is None:
+        return None, []
+    return log_in_user.id, [role.name for role in log_in_user.roles]
+
+
+def has_access(owner_id, roles=("Admin", "Developer")):
+    """
+    Check if the logged-in user owns the resource or has one of the roles
+    """
+    user_id, user_roles = get_current_identity()
+    if user_id is None:
+        return False
+    return user_id == owner_id or any(role in roles for role in user_roles)
+
+
 def roles_required(*roles):
     def decorator(f):
         @wraps(f)
@@ -13,13 +102,12 @@ def roles_required(*roles):
             if not auth_header:
                 return jsonify({"message": "Authorization header is missing."}), 401
 
-            current_user_email = get_jwt_identity()
-            user = User.find_user_by_email(current_user_email)
+            user_id, user_roles = get_current_identity()
 
-            if not user:
+            if user_id is None:
                 return jsonify({"msg": "Invalid authentication credentials."}), 401
 
-            if not any(role.name in roles for role in user.roles):
+            if not any(role in roles for role in user_roles):
                 return (
                     jsonify(
                         {
@@ -42,9 +130,8 @@ def user_exists(f):
         """
         Check if the logged-in user exists in the system
         """
-        current_user_email = get_jwt_identity()
-        user = User.find_user_by_email(current_user_email)
-        if not user:
+        user_id, _ = get_current_identity()
+        if user_id is None:
             return abort(
                 403, description="Forbidden: User does not have access to this resource"
             )
@@ -4,6 +4,8 @@
     """
 
 from flask import Blueprint, jsonify
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from services import ServiceError
 
 
 errors_bp = Blueprint("errors_bp", __name__)
@@ -36,6 +38,52 @@ def conflict(error):
     return jsonify({"error": message}), 409
 
 
+@errors_bp.app_errorhandler(413)
+def request_entity_too_large(error):
+    message = "Request Entity Too Large"
+
+    if error.description:
+        message = error.description
+    return jsonify({"error": message}), 413
+
+
+@errors_bp.app_errorhandler(429)
+def too_many_requests(error):
+    message = "Too Many Requests"
+
+    if error.description:
+        message = error.description
+    response = jsonify({"error": message})
+    if getattr(error, "retry_after", None):
+        response.headers["Retry-After"] = str(error.retry_after)
+    return response, 429
+
+
+@errors_bp.app_errorhandler(503)
+def service_unavailable(error):
+    message = "Service Unavailable"
+
+    if error.description:
+        message = error.description
+    response = jsonify({"error": message})
+    response.headers["Retry-After"] = "1"
+    return response, 503
+
+
+@errors_bp.app_errorhandler(ServiceError)
+def service_error(error):
+    # e.g. the NotFoundError of a service, answered like an abort(404)
+    return jsonify({"error": error.description}), error.status
+
+
+@errors_bp.app_errorhandler(PoolTimeoutError)
+def database_busy(error):
+    # All the connections of the pool stayed busy for DB_POOL_TIMEOUT seconds
+    response = jsonify({"error": "Service Unavailable: The database is busy"})
+    response.headers["Retry-After"] = "1"
+    return response, 503
+
+
 @errors_bp.app_errorhandler(500)
 def internal_server_error(error):
     message = "Internal Server Error"
@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+    In-process read-through cache of the predefined exercises catalog.
+    The catalog is only written by Admins and Developers, so every worker
+    keeps a serialized copy of it and reloads it when the shared version
+    stored in the cache_versions table changes. The search indexes of the
+    custom exercises of the users are cached the same way
+    """
+
+
+from collections import OrderedDict
+from threading import Lock
+from time import monotonic
+from flask import current_app
+from sqlalchemy import event
+from models.base import db
+from models.exercise import Exercise
+from models.custom_exercise import CustomExercise
+from models.cache_version import CacheVersion
+from exercise_search import SearchIndex
+
+
+def to_json(value):
+    """Serialize a value to the same compact, sorted and UTF-8 json as jsonify"""
+    return current_app.json.dumps(value, separators=(",", ":"))
+
+
+def fold(value):
+    """
+    The key of a title, a category or a muscle group in the lookup indexes,
+    they match whatever their case like with the collation of MySQL
+    """
+    return value.casefold() if isinstance(value, str) else value
+
+
+def json_response(body, status=200):
+    """Return an already serialized json body as a response"""
+    return current_app.response_class(body, status=status, mimetype="application/json")
+
+
+class CatalogSnapshot:
+    """A read-only copy of the exercises table with its lookup indexes"""
+
+    def __init__(self, version, exercises):
+        self.version = version
+        self.ids = []
+        self.by_id = {}
+        self.json_by_id = {}
+        self.by_title = {}
+        self.by_muscle_group = {}
+        self.by_category = {}
+        # Folded key -> first spelling of a muscle group or a category
+        muscle_groups = {}
+        categories = {}
+
+        # The exercises are ordered by id, so every list of ids is sorted
+        for exercise in exercises:
+            data = exercise.to_dict()
+            self.ids.append(exercise.id)
+            self.by_id[exercise.id] = data
+            self.json_by_id[exercise.id] = to_json(data)
+            self.by_title.setdefault(fold(exercise.title), exercise.id)
+            muscle_group = fold(exercise.muscle_group)
+            muscle_groups.setdefault(muscle_group, exercise.muscle_group)
+            self.by_muscle_group.setdefault(muscle_group, []).append(exercise.id)
+            category = fold(exercise.category)
+            categories.setdefault(category, exercise.category)
+            self.by_category.setdefault(category, []).append(exercise.id)
+
+        # "Chest" and "chest" are listed once
+        self.categories_json = to_json([categories[key] for key in sorted(categories)])
+        self.muscle_groups_json = to_json(
+            [muscle_groups[key] for key in sorted(muscle_groups)]
+        )
+        self._search_index = None
+
+    @property
+    def search_index(self):
+        """The full-text index of the catalog, built on the first search"""
+        if self._search_index is None:
+            self._search_index = SearchIndex(self.by_id.items())
+        return self._search_index
+
+    def json_list(self, ids):
+        """Return the serialized json list of the exercises of the given ids"""
+        return "[" + ",".join(self.json_by_id[id] for id in ids) + "]"
+
+
+class ExerciseCatalog:
+    """Versioned in-process cache of the exercises table"""
+
+    name = "exercises"
+
+    def __init__(self):
+        self._snapshot = None
+        self._checked_at = 0.0
+        self._lock = Lock()
+
+    def _is_fresh(self):
+        interval = current_app.config.get("EXERCISE_CATALOG_CHECK_INTERVAL", 5)
+        return self._snapshot is not None and monotonic() - self._checked_at < interval
+
+    def get(self):
+        """
+        Return the current snapshot of the catalog. The shared version is
+        checked at most once every EXERCISE_CATALOG_CHECK_INTERVAL seconds
+        and the table is only reloaded when the version changed
+        """
+        if self._is_fresh():
+            return self._snapshot
+
+        with self._lock:
+            if self._is_fresh():
+                return self._snapshot
+
+            version = CacheVersion.get_version(self.name)
+            if self._snapshot is None or self._snapshot.version != version:
+                query = db.select(Exercise).order_by(Exercise.id)
+                exercises = db.session.execute(query).scalars().all()
+                self._snapshot = CatalogSnapshot(version, exercises)
+            self._checked_at = monotonic()
+            return self._snapshot
+
+    def bump(self):
+        """
+        Increment the shared version of the catalog in the current transaction,
+        this worker drops its copy as soon as the transaction is committed
+        and the other workers on their next version check
+        """
+        CacheVersion.bump(self.name)
+        event.listen(
+            db.session(), "after_commit", lambda session: self.invalidate(), once=True
+        )
+
+    def invalidate(self):
+        """Drop the local copy of the catalog"""
+        with self._lock:
+            self._snapshot = None
+
+
+exercise_catalog = ExerciseCatalog()
+
+
+class CustomExerciseIndexes:
+    """
+    Versioned in-process cache of the search indexes of the custom exercises
+    of the users, one version per user. The least recently used indexes are
+    dropped beyond CUSTOM_EXERCISE_INDEX_CACHE_SIZE
+    """
+
+    def __init__(self):
+        # user_id -> (version, checked_at, SearchIndex)
+        self._indexes = OrderedDict()
+        self._lock = Lock()
+
+    @staticmethod
+    def name(user_id):
+        """The name of the version of the custom exercises of a user"""
+        return f"custom_exercises:{user_id}"
+
+    def get(self, user_id):
+        """
+        Return the search index of the custom exercises of a user. Like the
+        catalog, the version is checked at most once every
+        EXERCISE_CATALOG_CHECK_INTERVAL seconds
+        """
+        interval = current_app.config.get("EXERCISE_CATALOG_CHECK_INTERVAL", 5)
+        size = current_app.config.get("CUSTOM_EXERCISE_INDEX_CACHE_SIZE", 1000)
+        now = monotonic()
+        with self._lock:
+            cached = self._indexes.get(user_id)
+            if cached and now - cached[1] < interval:
+                self._indexes.move_to_end(user_id)
+                return cached[2]
+
+        version = CacheVersion.get_version(self.name(user_id))
+        if cached and cached[0] == version:
+            index = cached[2]
+        else:
+            query = db.select(CustomExercise).where(CustomExercise.user_id == user_id)
+            index = SearchIndex(
+                (custom_exercise.id, custom_exercise.to_dict())
+                for custom_exercise in db.session.execute(query).scalars()
+            )
+        with self._lock:
+            self._indexes[user_id] = (version, now, index)
+            self._indexes.move_to_end(user_id)
+            while len(self._indexes) > size:
+                self._indexes.popitem(last=False)
+        return index
+
+    def bump(self, user_id):
+        """
+        Increment the version of the custom exercises of a user in the
+        current transaction, like ExerciseCatalog.bump
+        """
+        CacheVersion.bump(self.name(user_id))
+        event.listen(
+            db.session(),
+            "after_commit",
+            lambda session: self.invalidate(user_id),
+            once=True,
+        )
+
+    def invalidate(self, user_id):
+        """Drop the local copy of the index of a user"""
+        with self._lock:
+            self._indexes.pop(user_id, None)
+
+
+custom_exercise_indexes = CustomExerciseIndexes()
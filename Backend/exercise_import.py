@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+    Bulk import of predefined exercises from a CSV file, shared by the
+    `flask exercises import` command and the POST /exercises/bulk endpoint
+    """
+
+
+import csv
+from itertools import islice
+from time import perf_counter
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy.exc import SQLAlchemyError
+from models.base import db
+from models.exercise import Exercise
+from exercise_catalog import exercise_catalog
+
+
+# CSV header -> exercise column, the headers of newExercisesDataset.csv included
+HEADERS = {
+    "title": "title",
+    "description": "description",
+    "category": "category",
+    "muscle_group": "muscle_group",
+    "muscleGroup": "muscle_group",
+    "equipment": "equipment",
+}
+COLUMNS = ("title", "description", "category", "muscle_group", "equipment")
+REQUIRED_COLUMNS = ("title", "category", "muscle_group")
+
+
+class ImportReport:
+    """The outcome of an import: counters, per-row errors and throughput"""
+
+    def __init__(self):
+        self.inserted = 0
+        self.duplicates = 0
+        self.errors = []
+        self.started_at = perf_counter()
+        self.seconds = 0.0
+
+    def add_error(self, row, error):
+        self.errors.append({"row": row, "error": error})
+
+    def finish(self):
+        self.seconds = perf_counter() - self.started_at
+        return self
+
+    def to_dict(self):
+        rows = self.inserted + self.duplicates + len(self.errors)
+        return {
+            "rows": rows,
+            "inserted": self.inserted,
+            "duplicates": self.duplicates,
+            "errors": self.errors,
+            "seconds": round(self.seconds, 3),
+            "rows_per_second": round(rows / self.seconds) if self.seconds else rows,
+        }
+
+
+def parse_row(row):
+    """Map a CSV row to the exercise columns, return (values, error)"""
+    values = dict.fromkeys(COLUMNS)
+    for header, column in HEADERS.items():
+        value = (row.get(header) or "").strip()
+        if value:
+            values[column] = value
+
+    for column in REQUIRED_COLUMNS:
+        if values[column] is None:
+            return None, f"Missing {column}"
+    for column, value in values.items():
+        length = Exercise.__table__.c[column].type.length
+        if value is not None and len(value) > length:
+            return None, f"{column} is longer than {length} characters"
+    return values, None
+
+
+def import_exercises(lines, batch_size=None):
+    """
+    Import the exercises of a CSV stream. The rows are read and inserted
+    in batches of batch_size, each batch with a single executemany in its
+    own transaction. The titles already in the table or earlier in the
+    file are skipped, they are checked against one preloaded set
+    """
+    if not batch_size:
+        batch_size = current_app.config.get("EXERCISE_IMPORT_BATCH_SIZE", 500)
+    report = ImportReport()
+
+    reader = csv.DictReader(lines)
+    try:
+        headers = [HEADERS.get(header) for header in reader.fieldnames or []]
+    except (csv.Error, UnicodeDecodeError) as e:
+        report.add_error(0, f"Invalid CSV: {e}")
+        return report.finish()
+    for column in REQUIRED_COLUMNS:
+        if column not in headers:
+            report.add_error(0, f"Missing {column} column")
+    if report.errors:
+        return report.finish()
+
+    # Titles are compared like the case-insensitive collation of MySQL
+    query = db.select(Exercise.title)
+    titles = {title.lower() for title in db.session.execute(query).scalars()}
+
+    row_number = 0
+    while True:
+        try:
+            chunk = list(islice(reader, batch_size))
+        except (csv.Error, UnicodeDecodeError) as e:
+            report.add_error(row_number + 1, f"Invalid CSV: {e}")
+            break
+        if not chunk:
+            break
+
+        batch = []
+        batch_titles = set()
+        for row in chunk:
+            row_number += 1
+            values, error = parse_row(row)
+            if error:
+                report.add_error(row_number, error)
+                continue
+            title = values["title"].lower()
+            if title in titles or title in batch_titles:
+                report.duplicates += 1
+                continue
+            batch_titles.add(title)
+            batch.append(values)
+
+        if not batch:
+            continue
+        try:
+            # render_nulls keeps a single statement for the rows with empty columns
+            insert = db.insert(Exercise).execution_options(render_nulls=True)
+            db.session.execute(insert, batch)
+            exercise_catalog.bump()
+            db.session.commit()
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            first_row = row_number - len(chunk) + 1
+            report.add_error(
+                first_row, f"Rows {first_row} to {row_number} were not inserted: {e}"
+            )
+            continue
+        titles |= batch_titles
+        report.inserted += len(batch)
+
+    return report.finish()
+
+
+exercises_cli = AppGroup("exercises", help="Manage the predefined exercises.")
+
+
+@exercises_cli.command("import")
+@click.argument("csv_path", type=click.Path(exists=True, dir_okay=False))
+@click.option(
+    "--batch-size", type=int, default=None, help="Number of rows per transaction."
+)
+def import_command(csv_path, batch_size):
+    """Import the exercises of a CSV file into the exercises table"""
+    with open(csv_path, newline="", encoding="utf-8-sig") as csv_file:
+        report = import_exercises(csv_file, batch_size)
+
+    for error in report.errors:
+        click.echo(f"Row {error['row']}: {error['error']}", err=True)
+    result = report.to_dict()
+    click.echo(
+        f"{result['inserted']} exercises imported, {result['duplicates']} duplicates"
+        f" and {len(result['errors'])} invalid rows skipped in {result['seconds']}s"
+        f" ({result['rows_per_second']} rows/s)"
+    )
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+    In-process full-text search over the exercises catalog and the custom
+    exercises of a user. Titles and descriptions are tokenized into an
+    inverted index, a query term matches the indexed tokens equal to it,
+    starting with it or close to it by their trigrams
+    """
+
+
+import re
+from bisect import bisect_left
+from collections import defaultdict
+from functools import lru_cache
+
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+# A match in the title ranks above a match in the description
+FIELD_WEIGHTS = {"title": 3.0, "description": 1.0}
+
+EXACT_SCORE = 1.0
+PREFIX_SCORE = 0.8
+FUZZY_SCORE = 0.6
+# Minimum jaccard similarity of the trigrams of a term and a token
+FUZZY_MIN_SIMILARITY = 0.3
+# Number of query terms whose matches are kept by each index
+TERM_CACHE_SIZE = 1024
+
+FILTERS = ("category", "muscle_group", "equipment")
+
+
+def tokenize(text):
+    """Split a text into lowercase words, single characters are ignored"""
+    if not text:
+        return []
+    return [token for token in TOKEN_RE.findall(text.lower()) if len(token) > 1]
+
+
+def trigrams(token):
+    """Return the set of trigrams of a token, padded to weight its start"""
+    padded = f"  {token} "
+    return {padded[i : i + 3] for i in range(len(padded) - 2)}
+
+
+class SearchIndex:
+    """Inverted index of the titles and descriptions of a list of exercises"""
+
+    def __init__(self, documents):
+        """documents is an iterable of (id, exercise dict) pairs"""
+        self.documents = {}
+        # Among equal scores the shortest titles are the closest matches
+        self.title_lengths = {}
+        # token -> {id: weight of the best field containing the token}
+        self.postings = defaultdict(dict)
+        for key, document in documents:
+            self.documents[key] = document
+            self.title_lengths[key] = len(tokenize(document.get("title")))
+            for field, weight in FIELD_WEIGHTS.items():
+                for token in tokenize(document.get(field)):
+                    postings = self.postings[token]
+                    if postings.get(key, 0) < weight:
+                        postings[key] = weight
+
+        self.vocabulary = sorted(self.postings)
+        self.trigram_counts = {}
+        self.tokens_by_trigram = defaultdict(list)
+        for token in self.vocabulary:
+            grams = trigrams(token)
+            self.trigram_counts[token] = len(grams)
+            for gram in grams:
+                self.tokens_by_trigram[gram].append(token)
+
+        # The index never changes, the matches of the frequent terms are
+        # computed once
+        self.term_scores = lru_cache(maxsize=TERM_CACHE_SIZE)(self._term_scores)
+
+    def expand(self, term):
+        """Return the indexed tokens matching a query term and their score"""
+        matches = {}
+        if term in self.postings:
+            matches[term] = EXACT_SCORE
+
+        start = bisect_left(self.vocabulary, term)
+        for token in self.vocabulary[start:]:
+            if not token.startswith(term):
+                break
+            matches.setdefault(token, PREFIX_SCORE)
+
+        grams = trigrams(term)
+        shared = defaultdict(int)
+        for gram in grams:
+            for token in self.tokens_by_trigram.get(gram, ()):
+                shared[token] += 1
+        for token, count in shared.items():
+            similarity = count / (len(grams) + self.trigram_counts[token] - count)
+            if similarity >= FUZZY_MIN_SIMILARITY:
+                matches.setdefault(token, FUZZY_SCORE * similarity)
+
+        return matches
+
+    def _term_scores(self, term):
+        """
+        Return the best score of every document matching a term, the
+        returned dict is cached and must not be modified
+        """
+        best = {}
+        for token, score in self.expand(term).items():
+            for key, weight in self.postings[token].items():
+                if best.get(key, 0) < score * weight:
+                    best[key] = score * weight
+        return best
+
+    def search(self, terms):
+        """
+        Return the score of every document matching at least one term,
+        the documents matching more terms rank higher
+        """
+        if not terms:
+            return dict.fromkeys(self.documents, 0.0)
+        if len(terms) == 1:
+            return self.term_scores(terms[0])
+
+        scores = defaultdict(float)
+        for term in terms:
+            for key, score in self.term_scores(term).items():
+                scores[key] += score
+        return scores
+
+
+def matches_filters(document, filters):
+    """Check the case-insensitive equality of the filtered fields"""
+    for field, value in filters.items():
+        if (document.get(field) or "").lower() != value:
+            return False
+    return True
+
+
+def search_exercises(indexes, query, filters):
+    """
+    Search several indexes with the same query, indexes is a list of
+    (source, SearchIndex) pairs in their order of precedence. Return the
+    ranked list of the (source, exercise dict, score) of the matches
+    """
+    terms = tokenize(query)
+    filters = {field: value.lower() for field, value in filters.items() if value}
+
+    ranked = []
+    for order, (source, index) in enumerate(indexes):
+        documents = index.documents
+        title_lengths = index.title_lengths
+        for key, score in index.search(terms).items():
+            document = documents[key]
+            if not filters or matches_filters(document, filters):
+                rank = (-score, title_lengths[key], order, key)
+                ranked.append((rank, source, document))
+    ranked.sort(key=lambda result: result[0])
+
+    return [(source, document, -rank[0]) for rank, source, document in ranked]
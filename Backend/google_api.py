@@ -1,22 +1,139 @@
 #!/usr/bin/env python3
 """ Access Google Drive API """
 from google.oauth2 import service_account
+from google_auth_httplib2 import AuthorizedHttp
 from googleapiclient.discovery import build, MediaFileUpload
 from googleapiclient.errors import HttpError, UnknownFileType
+from googleapiclient.http import HttpRequest
+import httplib2
+import itertools
 import os
 import urllib.parse
+from threading import Lock, local
+from time import time
+from config import setting
+from local_db import create_database, connect
 
 
 # Path to the service account Json key file
 SERVICE_ACCOUNT_FILE = "credentials.json"
 
-# Create a service account credentials object
-credentials = service_account.Credentials.from_service_account_file(
-    SERVICE_ACCOUNT_FILE, scopes=["https://www.googleapis.com/auth/drive"]
-)
+_credentials = None
+_service = None
+_service_lock = Lock()
+# The HTTP client of each thread, httplib2 is not thread-safe
+_local = local()
 
-# Build the service object
-service = build("drive", "v3", credentials=credentials)
+
+def get_credentials():
+    """Return the service account credentials, loaded on the first call"""
+    global _credentials
+    with _service_lock:
+        if _credentials is None:
+            _credentials = service_account.Credentials.from_service_account_file(
+                SERVICE_ACCOUNT_FILE, scopes=["https://www.googleapis.com/auth/drive"]
+            )
+    return _credentials
+
+
+def thread_http():
+    """Return the authorized HTTP client of the current thread"""
+    http = getattr(_local, "http", None)
+    if http is None:
+        http = _local.http = AuthorizedHttp(get_credentials(), http=httplib2.Http())
+    return http
+
+
+def build_request(http, *args, **kwargs):
+    """
+    Build the requests of the service with the HTTP client of the calling
+    thread instead of the one shared by the service. The requests are
+    built and executed by the same thread
+    """
+    return HttpRequest(thread_http(), *args, **kwargs)
+
+
+def get_service():
+    """
+    Return the Drive API service object, it is built on the first call only
+    and shared by the threads, its requests are not
+    """
+    global _service
+    credentials = get_credentials()
+    with _service_lock:
+        if _service is None:
+            # Build the service object
+            _service = build(
+                "drive", "v3", credentials=credentials, requestBuilder=build_request
+            )
+    return _service
+
+
+class DriveIdCache:
+    """
+    Persistent cache of the ids of the Drive folders and files by their name
+    and parent folder, shared by the processes of the server. The ids do not
+    change, the names found missing are only remembered for a short time
+    """
+
+    def __init__(self, path=None, negative_ttl=None):
+        # DRIVE_ID_CACHE and DRIVE_NEGATIVE_CACHE_TTL by default
+        self.path = path or setting("DRIVE_ID_CACHE")
+        self.negative_ttl = (
+            setting("DRIVE_NEGATIVE_CACHE_TTL")
+            if negative_ttl is None
+            else negative_ttl
+        )
+        create_database(
+            self.path,
+            "CREATE TABLE IF NOT EXISTS drive_ids ("
+            "kind TEXT NOT NULL, parent_id TEXT NOT NULL, name TEXT NOT NULL,"
+            " drive_id TEXT, link TEXT, cached_at REAL NOT NULL,"
+            " PRIMARY KEY (kind, parent_id, name));"
+            "CREATE INDEX IF NOT EXISTS ix_drive_ids_drive_id ON drive_ids (drive_id);"
+            "CREATE INDEX IF NOT EXISTS ix_drive_ids_parent_id ON drive_ids (parent_id);",
+        )
+
+    def get(self, kind, name, parent_id):
+        """Return (found, drive_id, link), found is False when not cached"""
+        with connect(self.path) as connection:
+            row = connection.execute(
+                "SELECT drive_id, link, cached_at FROM drive_ids"
+                " WHERE kind = ? AND parent_id = ? AND name = ?",
+                (kind, parent_id or "", name),
+            ).fetchone()
+        if row is None:
+            return False, None, None
+        if row["drive_id"] is None and time() - row["cached_at"] > self.negative_ttl:
+            return False, None, None
+        return True, row["drive_id"], row["link"]
+
+    def set(self, kind, name, parent_id, drive_id, link=None):
+        """Cache the id of a folder or a file, None if it doesn't exist"""
+        with connect(self.path) as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO drive_ids"
+                " (kind, parent_id, name, drive_id, link, cached_at)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (kind, parent_id or "", name, drive_id, link, time()),
+            )
+
+    def forget(self, drive_id):
+        """Forget a deleted folder or file and everything cached inside it"""
+        drive_ids = [drive_id]
+        with connect(self.path) as connection:
+            while drive_ids:
+                current = drive_ids.pop()
+                children = connection.execute(
+                    "SELECT drive_id FROM drive_ids"
+                    " WHERE parent_id = ? AND drive_id IS NOT NULL",
+                    (current,),
+                ).fetchall()
+                drive_ids.extend(row["drive_id"] for row in children)
+                connection.execute(
+                    "DELETE FROM drive_ids WHERE drive_id = ? OR parent_id = ?",
+                    (current, current),
+                )
 
 
 # Test connection to the Google Drive API
@@ -40,19 +157,55 @@ def list_drive_files(service):
 # list_drive_files(service)
 
 
-class ManageDrive:
+def file_id_from_link(webContentLink):
+    """Extract the file id from a webContentLink, None if it has none"""
+    url_parsed = urllib.parse.urlparse(webContentLink)
+    ids = urllib.parse.parse_qs(url_parsed.query).get("id", None)
+    return ids[0] if ids else None
+
+
+class BaseDrive:
+    """The folders of the app shared by the Drive backends"""
+
+    @property
+    def root_folder_id(self):
+        return self.find_folder_id("FitJourney")
+
+    @property
+    def users_folder_id(self):
+        return self.find_folder_id("Users", self.root_folder_id)
+
+    @property
+    def default_exercises_folder(self):
+        return self.find_folder_id("default_exercises", self.root_folder_id)
+
+    def ensure_folder(self, folder_name, parent_id=None):
+        """Return the id of a folder, create the folder if it doesn't exist"""
+        folder_id = self.find_folder_id(folder_name, parent_id)
+        if not folder_id:
+            folder_id = self.create_folder(folder_name, parent_id)
+        return folder_id
+
+
+class ManageDrive(BaseDrive):
     """Manage Google Drive"""
 
-    def __init__(self):
-        self.service = service
-        self.root_folder_id = self.find_folder_id("FitJourney")
-        self.users_folder_id = self.find_folder_id("Users", self.root_folder_id)
-        self.default_exercises_folder = self.find_folder_id(
-            "default_exercises", self.root_folder_id
-        )
+    def __init__(self, service=None, cache=None):
+        self._service = service
+        self.cache = cache or DriveIdCache()
+
+    @property
+    def service(self):
+        """The Drive API service, built on the first call to the API"""
+        if self._service is None:
+            self._service = get_service()
+        return self._service
 
     def find_folder_id(self, folder_name, parent_id=None):
         """Find a folder by name and return the folder id"""
+        found, folder_id, _ = self.cache.get("folder", folder_name, parent_id)
+        if found:
+            return folder_id
         try:
             if parent_id:
                 query = f"name='{folder_name}' and '{parent_id}' in parents and mimeType='application/vnd.google-apps.folder'"
@@ -67,7 +220,9 @@ class ManageDrive:
             items = results.get("files", [])
             if not items:
                 # print(f"Folder '{folder_name}' not found.")
+                self.cache.set("folder", folder_name, parent_id, None)
                 return None
+            self.cache.set("folder", folder_name, parent_id, items[0]["id"])
             return items[0]["id"]
         except HttpError as e:
             print(f"An error occurred while finding folder '{folder_name}': {e}")
@@ -86,6 +241,7 @@ class ManageDrive:
             folder = (
                 self.service.files().create(body=file_metadata, fields="id").execute()
             )
+            self.cache.set("folder", folder_name, parent_id, folder.get("id"))
             return folder.get("id")
         except HttpError as e:
             # print(f"An error occurred while creating folder '{folder_name}': {e}")
@@ -93,6 +249,9 @@ class ManageDrive:
 
     def find_file_id(self, file_name, parent_id=None):
         """Find a file by name and return the file id"""
+        found, file_id, web_content_link = self.cache.get("file", file_name, parent_id)
+        if found:
+            return file_id, web_content_link
         try:
             if parent_id:
                 query = f"name='{file_name}' and '{parent_id}' in parents"
@@ -107,7 +266,15 @@ class ManageDrive:
             items = results.get("files", [])
             if not items:
                 # print(f"File '{file_name}' not found.")
+                self.cache.set("file", file_name, parent_id, None)
                 return None, None
+            self.cache.set(
+                "file",
+                file_name,
+                parent_id,
+                items[0]["id"],
+                items[0]["webContentLink"],
+            )
             return items[0]["id"], items[0]["webContentLink"]
 
         except HttpError as e:
@@ -121,12 +288,15 @@ class ManageDrive:
                 "name": os.path.basename(file_name),
                 "parents": [folder_id],
             }
-            media = MediaFileUpload(file_name, resumable=True)
+            # Sent in chunks, the file is never read whole into memory
+            media = MediaFileUpload(
+                file_name, resumable=True, chunksize=setting("DRIVE_UPLOAD_CHUNK_SIZE")
+            )
             file = (
-                service.files()
+                self.service.files()
                 .create(
                     body=file_metadata,
-                    media_body=file_name,
+                    media_body=media,
                     fields="id, webViewLink, webContentLink",
                 )
                 .execute()
@@ -139,6 +309,13 @@ class ManageDrive:
                 fileId=file.get("id"), body=permission
             ).execute()
             # print(f"Permissions set for file ID: {file.get('id')}")
+            self.cache.set(
+                "file",
+                file_metadata["name"],
+                folder_id,
+                file.get("id"),
+                file.get("webContentLink"),
+            )
 
             return file.get("id"), True, file.get("webContentLink")
         except (HttpError, UnknownFileType) as e:
@@ -180,13 +357,13 @@ class ManageDrive:
             if not id:
                 if webContentLink:
                     # extract the file id from the webContentLink
-                    url_parsed = urllib.parse.urlparse(webContentLink)
-                    id = urllib.parse.parse_qs(url_parsed.query).get("id", None)
+                    id = file_id_from_link(webContentLink)
                     if not id:
                         return False, "Invalid webContentLink provided"
                 else:
                     return False, "No file id or webContentLink provided"
-            self.service.files().delete(fileId=id[0]).execute()
+            self.cache.forget(id)
+            self.service.files().delete(fileId=id).execute()
             return True, "File deleted successfully"
         except HttpError as e:
             return False, f"An error occurred while deleting file: {e}"
@@ -194,7 +371,120 @@ class ManageDrive:
     def delete_folder(self, folder_id):
         """Delete a folder"""
         try:
+            self.cache.forget(folder_id)
             self.service.files().delete(fileId=folder_id).execute()
             return True, "Folder deleted successfully"
         except HttpError as e:
             return False, f"An error occurred while deleting folder: {e}"
+
+
+class MemoryDrive(BaseDrive):
+    """
+    A Drive backend keeping the folders and files in memory, for the tests
+    and the local development without Google credentials
+    """
+
+    def __init__(self):
+        self.items = {}
+        self.lock = Lock()
+        # The ids of the deleted items are not given again
+        self.ids = itertools.count(1)
+        root_folder_id = self.create_folder("FitJourney")
+        self.create_folder("Users", root_folder_id)
+        self.create_folder("default_exercises", root_folder_id)
+
+    def link(self, file_id):
+        return f"https://drive.google.com/uc?id={file_id}&export=download"
+
+    def find(self, name, parent_id, folder):
+        with self.lock:
+            for item_id, item in self.items.items():
+                if (item["name"], item["parent_id"], item["folder"]) == (
+                    name,
+                    parent_id,
+                    folder,
+                ):
+                    return item_id
+        return None
+
+    def add(self, name, parent_id, folder, data=None):
+        with self.lock:
+            item_id = f"memory{next(self.ids)}"
+            self.items[item_id] = {
+                "name": name,
+                "parent_id": parent_id,
+                "folder": folder,
+                "data": data,
+            }
+        return item_id
+
+    def find_folder_id(self, folder_name, parent_id=None):
+        return self.find(folder_name, parent_id, True)
+
+    def create_folder(self, folder_name, parent_id=None):
+        return self.add(folder_name, parent_id, True)
+
+    def find_file_id(self, file_name, parent_id=None):
+        file_id = self.find(file_name, parent_id, False)
+        if not file_id:
+            return None, None
+        return file_id, self.link(file_id)
+
+    def upload_file(self, file_name, folder_id):
+        with open(file_name, "rb") as f:
+            data = f.read()
+        file_id = self.add(os.path.basename(file_name), folder_id, False, data)
+        return file_id, True, self.link(file_id)
+
+    def list_files(self):
+        with self.lock:
+            files = [
+                f"{item['name']} ({item_id})" for item_id, item in self.items.items()
+            ]
+        return files or "No files found."
+
+    def delete_file(self, file_id=None, webContentLink=None):
+        file_id = file_id or (webContentLink and file_id_from_link(webContentLink))
+        with self.lock:
+            if self.items.pop(file_id, None) is None:
+                return False, "File not found"
+        return True, "File deleted successfully"
+
+    def delete_folder(self, folder_id):
+        with self.lock:
+            folder_ids = [folder_id]
+            while folder_ids:
+                current = folder_ids.pop()
+                if self.items.pop(current, None) is None and current == folder_id:
+                    return False, "Folder not found"
+                folder_ids.extend(
+                    item_id
+                    for item_id, item in self.items.items()
+                    if item["parent_id"] == current
+                )
+        return True, "Folder deleted successfully"
+
+
+# Drive backend name -> factory, selected by the DRIVE_BACKEND setting
+DRIVE_BACKENDS = {"google": ManageDrive, "memory": MemoryDrive}
+
+_drive = None
+_drive_lock = Lock()
+
+
+def register_drive_backend(name, factory):
+    """Make a Drive backend available to the DRIVE_BACKEND setting"""
+    DRIVE_BACKENDS[name] = factory
+
+
+def get_drive():
+    """
+    Return the Drive client shared by the whole process. It is created on
+    the first call, so the app starts without any call to the Drive API
+    """
+    global _drive
+    if _drive is None:
+        with _drive_lock:
+            if _drive is None:
+                _drive = DRIVE_BACKENDS[setting("DRIVE_BACKEND")]()
+    return _drive
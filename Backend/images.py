@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+    Resized variants of the uploaded images. The media jobs create a
+    thumbnail, a medium and a full size copy of every image next to the
+    original, re-encoded without the EXIF metadata, so that the lists and
+    the avatars do not download the original upload
+    """
+
+
+import logging
+import os
+from PIL import Image, ImageOps, UnidentifiedImageError, features
+
+
+logger = logging.getLogger(__name__)
+
+# Variant name -> largest width and height, from the largest to the smallest
+VARIANTS = (("full", 1600), ("medium", 640), ("thumb", 128))
+
+if features.check("webp"):
+    VARIANT_FORMAT, VARIANT_EXTENSION = "WEBP", "webp"
+else:
+    VARIANT_FORMAT, VARIANT_EXTENSION = "JPEG", "jpg"
+VARIANT_QUALITY = 80
+
+
+def is_image(file_name):
+    """Check whether a file is an image Pillow can read, by its extension"""
+    extension = os.path.splitext(file_name)[1].lower()
+    return extension in Image.registered_extensions()
+
+
+def variant_name(file_name, variant):
+    """
+    Return the file name of a variant of an image. The name keeps the
+    extension of the image, squat.png and squat.jpg have their own variants
+    """
+    return f"{os.path.basename(file_name)}_{variant}.{VARIANT_EXTENSION}"
+
+
+def create_variants(file_path, directory):
+    """
+    Write the variants of an image to directory, return the dict of their
+    paths by variant name. An image that cannot be decoded has no variants
+    """
+    try:
+        with Image.open(file_path) as image:
+            # A JPEG is decoded at the smallest scale larger than the variants
+            image.draft("RGB", (VARIANTS[0][1], VARIANTS[0][1]))
+            # Apply the EXIF orientation before the metadata is dropped
+            image = ImageOps.exif_transpose(image)
+            has_alpha = image.mode in ("RGBA", "LA", "PA") or (
+                image.mode == "P" and "transparency" in image.info
+            )
+            if has_alpha and VARIANT_FORMAT == "WEBP":
+                image = image.convert("RGBA")
+            else:
+                image = image.convert("RGB")
+            # Only the color profile of the metadata is kept
+            icc_profile = image.info.get("icc_profile")
+            image.info = {}
+            options = {"quality": VARIANT_QUALITY}
+            if icc_profile:
+                options["icc_profile"] = icc_profile
+
+            paths = {}
+            # Each variant is resized from the previous, larger, one
+            for variant, size in VARIANTS:
+                image.thumbnail((size, size), Image.LANCZOS)
+                path = os.path.join(directory, variant_name(file_path, variant))
+                image.save(path, VARIANT_FORMAT, **options)
+                paths[variant] = path
+            return paths
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError) as e:
+        logger.warning("No variants for %s: %s", file_path, e)
+        return {}
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+    Faster json responses. The JSON provider of the app encodes with orjson
+    when it is installed and falls back to the json module of the standard
+    library, and the large collections are streamed as a json array, the
+    rows being read from the database batch by batch
+    """
+
+
+from flask import Response, current_app, stream_with_context
+from flask.json.provider import DefaultJSONProvider
+from models.base import db
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """
+    The default JSON provider of Flask, encoding and decoding with orjson.
+    The output keeps the behavior of the default provider: sorted keys,
+    dates as HTTP dates, indented in debug mode. Anything orjson cannot
+    handle is given to the json module
+    """
+
+    def options(self, indent=None):
+        """The orjson options matching the attributes of the provider"""
+        # Dates and dataclasses go through default like with the json module
+        option = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return option
+
+    def dumps_bytes(self, obj, indent=None):
+        """Serialize data as JSON to UTF-8 bytes"""
+        if orjson is not None:
+            try:
+                return orjson.dumps(
+                    obj, default=self.default, option=self.options(indent)
+                )
+            except TypeError:
+                # e.g. integers larger than 64 bits or keys that are not strings
+                pass
+        if indent:
+            return super().dumps(obj, indent=indent).encode("utf-8")
+        return super().dumps(obj, separators=(",", ":")).encode("utf-8")
+
+    def dumps(self, obj, **kwargs):
+        # Arguments of json.dumps other than indent and separators, e.g. cls
+        if orjson is None or set(kwargs) - {"indent", "separators"}:
+            return super().dumps(obj, **kwargs)
+        return self.dumps_bytes(obj, kwargs.get("indent")).decode("utf-8")
+
+    def loads(self, s, **kwargs):
+        if orjson is None or kwargs:
+            return super().loads(s, **kwargs)
+        try:
+            return orjson.loads(s)
+        except orjson.JSONDecodeError:
+            # The json module accepts more, e.g. NaN and very large integers
+            return super().loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = (self.compact is None and self._app.debug) or self.compact is False
+        return self._app.response_class(
+            self.dumps_bytes(obj, 2 if indent else None) + b"\n",
+            mimetype=self.mimetype,
+        )
+
+
+def encode_rows(rows):
+    """Encode a list of json serializable rows as the items of a json array"""
+    provider = current_app.json
+    if isinstance(provider, FastJSONProvider):
+        return b",".join(provider.dumps_bytes(row) for row in rows)
+    return ",".join(provider.dumps(row) for row in rows).encode("utf-8")
+
+
+def stream_json_array(query, serialize, batch_size=1000):
+    """
+    Return a response streaming the results of a query as a json array.
+    The rows are fetched batch_size at a time from a server-side cursor,
+    serialized and sent, so the memory does not grow with the number of rows
+    """
+
+    def generate():
+        result = db.session.execute(query.execution_options(yield_per=batch_size))
+        yield b"["
+        first = True
+        for partition in result.scalars().partitions():
+            chunk = encode_rows([serialize(obj) for obj in partition])
+            yield chunk if first else b"," + chunk
+            first = False
+        yield b"]\n"
+
+    return Response(stream_with_context(generate()), mimetype=current_app.json.mimetype)
@@ -0,0 +1,34 @@
+#!/usr/bin/env python3
+"""
+    Small SQLite databases kept on the local disk of the server,
+    e.g. the background jobs or the cache of the Google Drive ids
+    """
+
+
+import os
+import sqlite3
+from contextlib import contextmanager
+
+
+def create_database(path, schema):
+    """Create the directory and the tables of a local database"""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with connect(path) as connection:
+        connection.executescript(schema)
+
+
+@contextmanager
+def connect(path):
+    """
+    Open a connection for one operation and commit it, the databases are
+    used from several threads and processes
+    """
+    connection = sqlite3.connect(path, timeout=30)
+    connection.row_factory = sqlite3.Row
+    try:
+        with connection:
+            yield connection
+    finally:
+        connection.close()
@@ -0,0 +1,341 @@
+#!/usr/bin/env python3
+"""
+    Background uploads of the media files to the media storage. The
+    endpoints save the uploaded file to a staging directory and queue a job,
+    a pool of threads stores the file and updates the media url in the database.
+    The jobs are kept in a local SQLite database so that their status can
+    be polled and the queued jobs survive a restart
+    """
+
+
+import logging
+import os
+import shutil
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from flask import jsonify, url_for
+from werkzeug.utils import secure_filename
+from local_db import create_database, connect
+from models.base import db
+from models.exercise import Exercise
+from models.custom_exercise import CustomExercise
+from models.user import User
+from storage import get_storage, StorageError
+from uploads import StagedUpload
+from exercise_catalog import exercise_catalog, custom_exercise_indexes
+from images import is_image, create_variants
+
+
+logger = logging.getLogger(__name__)
+
+time_format = "%Y-%m-%d %H:%M:%S"
+
+# Job kind -> (model, column holding the media url, column of its variants)
+TARGETS = {
+    "exercise": (Exercise, "media_file_url", "media_variants"),
+    "custom_exercise": (CustomExercise, "media_file_url", "media_variants"),
+    "profile_picture": (User, "profile_picture", "profile_picture_variants"),
+}
+
+COLUMNS = (
+    "id",
+    "kind",
+    "target_id",
+    "user_id",
+    "file_name",
+    "file_path",
+    "replace_media",
+    "digest",
+    "size",
+    "status",
+    "url",
+    "error",
+    "created_at",
+    "updated_at",
+)
+
+
+class MediaJobError(Exception):
+    """An upload that failed for a reason reported to the client"""
+
+    pass
+
+
+class JobStore:
+    """The jobs table of the local SQLite database"""
+
+    def __init__(self, path):
+        self.path = path
+        create_database(
+            path,
+            "CREATE TABLE IF NOT EXISTS media_jobs ("
+            "id TEXT PRIMARY KEY, kind TEXT NOT NULL, target_id INTEGER NOT NULL,"
+            " user_id INTEGER, file_name TEXT NOT NULL, file_path TEXT NOT NULL,"
+            " replace_media INTEGER NOT NULL, digest TEXT, size INTEGER,"
+            " status TEXT NOT NULL, url TEXT, error TEXT,"
+            " created_at TEXT NOT NULL, updated_at TEXT NOT NULL)",
+        )
+        # Add the columns missing from a database created by an older version
+        with self.connect() as connection:
+            columns = {
+                row["name"]
+                for row in connection.execute("PRAGMA table_info(media_jobs)")
+            }
+            for column, definition in (("digest", "TEXT"), ("size", "INTEGER")):
+                if column not in columns:
+                    connection.execute(
+                        f"ALTER TABLE media_jobs ADD COLUMN {column} {definition}"
+                    )
+
+    def connect(self):
+        return connect(self.path)
+
+    def add(self, job):
+        with self.connect() as connection:
+            connection.execute(
+                f"INSERT INTO media_jobs ({', '.join(COLUMNS)})"
+                f" VALUES ({', '.join('?' for _ in COLUMNS)})",
+                [job[column] for column in COLUMNS],
+            )
+        return job
+
+    def get(self, job_id):
+        with self.connect() as connection:
+            row = connection.execute(
+                "SELECT * FROM media_jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+        return dict(row) if row else None
+
+    def update(self, job_id, **values):
+        values["updated_at"] = datetime.utcnow().strftime(time_format)
+        assignments = ", ".join(f"{column} = ?" for column in values)
+        with self.connect() as connection:
+            connection.execute(
+                f"UPDATE media_jobs SET {assignments} WHERE id = ?",
+                [*values.values(), job_id],
+            )
+
+    def claim(self, job_id):
+        """Mark a queued job as running, False if another worker claimed it"""
+        now = datetime.utcnow().strftime(time_format)
+        with self.connect() as connection:
+            cursor = connection.execute(
+                "UPDATE media_jobs SET status = 'running', updated_at = ?"
+                " WHERE id = ? AND status = 'queued'",
+                (now, job_id),
+            )
+        return cursor.rowcount == 1
+
+    def ids_with_status(self, status):
+        with self.connect() as connection:
+            rows = connection.execute(
+                "SELECT id, updated_at FROM media_jobs WHERE status = ?", (status,)
+            ).fetchall()
+        return [(row["id"], row["updated_at"]) for row in rows]
+
+
+class MediaJobs:
+    """The queue of the media uploads and its pool of worker threads"""
+
+    def __init__(self):
+        self.app = None
+        self.store = None
+        self.executor = None
+
+    def init_app(self, app):
+        """Open the job store and resume the jobs queued before a restart"""
+        self.app = app
+        self.store = JobStore(app.config["MEDIA_JOBS_DATABASE"])
+        self.executor = ThreadPoolExecutor(
+            max_workers=app.config.get("MEDIA_UPLOAD_WORKERS", 2),
+            thread_name_prefix="media-upload",
+        )
+
+        # Jobs left running by a stopped worker will never finish
+        stale = timedelta(seconds=app.config.get("MEDIA_JOB_STALE_SECONDS", 3600))
+        for job_id, updated_at in self.store.ids_with_status("running"):
+            if datetime.strptime(updated_at, time_format) < datetime.utcnow() - stale:
+                self.store.update(job_id, status="failed", error="Upload interrupted")
+        for job_id, _ in self.store.ids_with_status("queued"):
+            self.executor.submit(self.run, job_id)
+
+    def staging_path(self, job_id, file_name):
+        """Return the path where the file of a job waits for its upload"""
+        directory = os.path.join(self.app.config["MEDIA_STAGING_DIR"], job_id)
+        os.makedirs(directory, exist_ok=True)
+        return os.path.join(directory, file_name)
+
+    def submit(
+        self, kind, target_id, user_id, media_file, file_name, replace_media=False
+    ):
+        """
+        Save an uploaded file to the staging directory and queue its upload,
+        the file is stored as file_name. Return the job
+        """
+        job_id = uuid.uuid4().hex
+        file_name = secure_filename(file_name) or "file"
+        file_path = self.staging_path(job_id, file_name)
+        upload = media_file.stream
+        if isinstance(upload, StagedUpload):
+            # Hashed while it was received, the file only changes its name
+            upload.move(file_path)
+            digest, size = upload.digest, upload.size
+        else:
+            media_file.save(file_path)
+            digest, size = None, os.path.getsize(file_path)
+
+        now = datetime.utcnow().strftime(time_format)
+        job = self.store.add(
+            {
+                "id": job_id,
+                "kind": kind,
+                "target_id": target_id,
+                "user_id": user_id,
+                "file_name": file_name,
+                "file_path": file_path,
+                "replace_media": int(replace_media),
+                "digest": digest,
+                "size": size,
+                "status": "queued",
+                "url": None,
+                "error": None,
+                "created_at": now,
+                "updated_at": now,
+            }
+        )
+        self.executor.submit(self.run, job_id)
+        return job
+
+    def get(self, job_id):
+        return self.store.get(job_id)
+
+    def run(self, job_id):
+        """Upload the file of a job, executed by the pool of threads"""
+        if not self.store.claim(job_id):
+            return
+        job = self.store.get(job_id)
+        try:
+            with self.app.app_context():
+                url = self.upload(job)
+            self.store.update(job_id, status="done", url=url)
+        except MediaJobError as e:
+            self.store.update(job_id, status="failed", error=str(e))
+        except Exception as e:
+            logger.exception("Media upload %s failed", job_id)
+            self.store.update(
+                job_id, status="failed", error=f"Internal Server Error: {e}"
+            )
+        finally:
+            shutil.rmtree(os.path.dirname(job["file_path"]), ignore_errors=True)
+
+    def key(self, job):
+        """Return the storage key of the file of a job"""
+        if job["kind"] == "exercise":
+            return f"default_exercises/{job['file_name']}"
+        folder = "exercises" if job["kind"] == "custom_exercise" else "profilepic"
+        return f"Users/user_{job['user_id']}/{folder}/{job['file_name']}"
+
+    def upload(self, job):
+        """Store the file of a job and save its url, return the url"""
+        storage = get_storage()
+        key = self.key(job)
+
+        # A new profile picture may keep the name of the one it replaces
+        if not (job["kind"] == "profile_picture" and job["replace_media"]):
+            existing = storage.stat(key)
+            if existing:
+                raise MediaJobError(
+                    f"Bad Request: File already exists {existing['url']}"
+                )
+
+        # The variants are created first, storing the original may move it
+        variant_paths = {}
+        if is_image(job["file_name"]):
+            directory = os.path.dirname(job["file_path"])
+            variant_paths = create_variants(job["file_path"], directory)
+
+        try:
+            media_file_url = storage.put(key, job["file_path"], job["digest"])
+            folder = key.rsplit("/", 1)[0]
+            media_variants = {
+                variant: storage.put(
+                    f"{folder}/variants/{os.path.basename(path)}", path
+                )
+                for variant, path in variant_paths.items()
+            }
+        except StorageError as e:
+            raise MediaJobError(f"Bad Request: {e}")
+
+        model, column, variants_column = TARGETS[job["kind"]]
+        target = db.session.get(model, job["target_id"])
+        try:
+            if target is None:
+                # The exercise or the user was deleted during the upload
+                storage.delete(media_file_url)
+                delete_variants(media_variants)
+                raise MediaJobError(f"{model.__name__} not found")
+
+            # Delete the old media file and its variants
+            old_url = getattr(target, column)
+            if job["replace_media"] and old_url and old_url != media_file_url:
+                result, message = storage.delete(old_url)
+                logger.info("Delete %s: %s %s", old_url, result, message)
+            old_variants = getattr(target, variants_column)
+            if job["replace_media"] and old_variants:
+                delete_variants(
+                    {
+                        variant: url
+                        for variant, url in old_variants.items()
+                        if url not in media_variants.values()
+                    }
+                )
+
+            setattr(target, column, media_file_url)
+            setattr(target, variants_column, media_variants or None)
+            if job["kind"] == "exercise":
+                exercise_catalog.bump()
+            elif job["kind"] == "custom_exercise":
+                custom_exercise_indexes.bump(target.user_id)
+            db.session.commit()
+        finally:
+            db.session.remove()
+        return media_file_url
+
+
+media_jobs = MediaJobs()
+
+
+def delete_variants(variants):
+    """Delete the variants of a media file from the media storage"""
+    storage = get_storage()
+    for url in (variants or {}).values():
+        result, message = storage.delete(url)
+        logger.info("Delete %s: %s %s", url, result, message)
+
+
+def job_to_dict(job):
+    """Return the public fields of a job"""
+    return {
+        key: job[key]
+        for key in (
+            "id",
+            "kind",
+            "target_id",
+            "status",
+            "url",
+            "error",
+            "created_at",
+            "updated_at",
+        )
+    }
+
+
+def job_accepted(job, message):
+    """Return the 202 response of a queued upload with the url of its status"""
+    status_url = url_for("views_bp.get_media_job", job_id=job["id"])
+    response = jsonify(
+        {"message": message, "job_id": job["id"], "status_url": status_url}
+    )
+    response.headers["Location"] = status_url
+    return response, 202
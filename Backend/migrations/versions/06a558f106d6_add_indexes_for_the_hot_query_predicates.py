@@ -0,0 +1,65 @@
+"""add indexes for the hot query predicates of records, custom_exercises and exercises
+
+The foreign key columns workout_sessions.day_id, days.plan_id, plans.user_id
+and records.exercise_id are already indexed by InnoDB, which creates an index
+for every foreign key that is not covered by another one.
+
+Revision ID: 06a558f106d6
+Revises: 0c6101324e5f
+Create Date: 2026-10-18 11:02:17.284615
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '06a558f106d6'
+down_revision = '0c6101324e5f'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('records', schema=None) as batch_op:
+        batch_op.create_index('ix_records_user_id_date', ['user_id', 'date'], unique=False)
+
+    with op.batch_alter_table('custom_exercises', schema=None) as batch_op:
+        batch_op.create_index('ix_custom_exercises_user_id_title', ['user_id', 'title'], unique=False)
+        batch_op.create_index('ix_custom_exercises_user_id_category', ['user_id', 'category'], unique=False)
+        batch_op.create_index('ix_custom_exercises_user_id_muscle_group', ['user_id', 'muscle_group'], unique=False)
+
+    with op.batch_alter_table('exercises', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_exercises_title'), ['title'], unique=False)
+        batch_op.create_index(batch_op.f('ix_exercises_category'), ['category'], unique=False)
+        batch_op.create_index(batch_op.f('ix_exercises_muscle_group'), ['muscle_group'], unique=False)
+
+
+def ensure_foreign_key_index(table, column):
+    """
+    InnoDB may have dropped its own index of a foreign key once the composite
+    index covered it, recreate it before the composite index is dropped
+    """
+    indexes = sa.inspect(op.get_bind()).get_indexes(table)
+    leading = [
+        index['name'] for index in indexes if index['column_names'][:1] == [column]
+    ]
+    if not [name for name in leading if not name.startswith('ix_')]:
+        op.create_index(column, table, [column], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('exercises', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_exercises_muscle_group'))
+        batch_op.drop_index(batch_op.f('ix_exercises_category'))
+        batch_op.drop_index(batch_op.f('ix_exercises_title'))
+
+    ensure_foreign_key_index('custom_exercises', 'user_id')
+    with op.batch_alter_table('custom_exercises', schema=None) as batch_op:
+        batch_op.drop_index('ix_custom_exercises_user_id_muscle_group')
+        batch_op.drop_index('ix_custom_exercises_user_id_category')
+        batch_op.drop_index('ix_custom_exercises_user_id_title')
+
+    ensure_foreign_key_index('records', 'user_id')
+    with op.batch_alter_table('records', schema=None) as batch_op:
+        batch_op.drop_index('ix_records_user_id_date')
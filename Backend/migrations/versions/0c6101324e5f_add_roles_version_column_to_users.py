@@ -0,0 +1,26 @@
+"""add roles_version column to users to invalidate the role claims of issued tokens
+
+Revision ID: 0c6101324e5f
+Revises: 4a037cb10f25
+Create Date: 2026-10-18 10:12:41.503118
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0c6101324e5f'
+down_revision = '4a037cb10f25'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('roles_version', sa.Integer(), server_default='0', nullable=False))
+
+
+def downgrade():
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.drop_column('roles_version')
@@ -0,0 +1,42 @@
+"""add record_aggregates table with the weekly totals of the records
+
+Revision ID: 3f8d6a2c9e17
+Revises: 7c2e91d4a5b3
+Create Date: 2026-10-18 16:02:11.408215
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f8d6a2c9e17'
+down_revision = '7c2e91d4a5b3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Fill the table with `flask records rebuild-aggregates` after the upgrade
+    op.create_table('record_aggregates',
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('exercise_id', sa.Integer(), nullable=False),
+    sa.Column('custom_exercise_id', sa.Integer(), nullable=False),
+    sa.Column('week', sa.Date(), nullable=False),
+    sa.Column('records', sa.Integer(), nullable=False),
+    sa.Column('sets', sa.Integer(), nullable=False),
+    sa.Column('reps', sa.Integer(), nullable=False),
+    sa.Column('volume', sa.Float(), nullable=False),
+    sa.Column('max_weight', sa.Float(), nullable=False),
+    sa.Column('estimated_1rm', sa.Float(), nullable=False),
+    sa.Column('difficulty_sum', sa.Integer(), nullable=False),
+    sa.Column('user_weight_sum', sa.Float(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('user_id', 'exercise_id', 'custom_exercise_id', 'week', name='uq_record_aggregates_user_exercise_week')
+    )
+
+
+def downgrade():
+    op.drop_table('record_aggregates')
@@ -0,0 +1,38 @@
+"""add the columns holding the urls of the resized variants of the media images
+
+Revision ID: 7c2e91d4a5b3
+Revises: bb64e40d442d
+Create Date: 2026-10-18 14:02:31.512077
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7c2e91d4a5b3'
+down_revision = 'bb64e40d442d'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('custom_exercises', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('media_variants', sa.JSON(), nullable=True))
+
+    with op.batch_alter_table('exercises', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('media_variants', sa.JSON(), nullable=True))
+
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('profile_picture_variants', sa.JSON(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.drop_column('profile_picture_variants')
+
+    with op.batch_alter_table('exercises', schema=None) as batch_op:
+        batch_op.drop_column('media_variants')
+
+    with op.batch_alter_table('custom_exercises', schema=None) as batch_op:
+        batch_op.drop_column('media_variants')
@@ -0,0 +1,28 @@
+"""add cache_versions table shared by the workers to invalidate their in-process caches
+
+Revision ID: bb64e40d442d
+Revises: 06a558f106d6
+Create Date: 2026-10-18 12:24:53.917342
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'bb64e40d442d'
+down_revision = '06a558f106d6'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('cache_versions',
+    sa.Column('name', sa.String(length=64), nullable=False),
+    sa.Column('version', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('name')
+    )
+
+
+def downgrade():
+    op.drop_table('cache_versions')
@@ -5,9 +5,11 @@
 
 
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import DateTime
 from sqlalchemy.inspection import inspect
 from sqlalchemy.orm import DeclarativeBase, MappedAsDataclass
 from datetime import datetime
+from operator import attrgetter, itemgetter
 
 
 time_format = "%Y-%m-%d"
@@ -29,26 +31,159 @@ class BaseModel:
     It will have all basic functions that will be used by all the models
     """
 
+    # Column -> key in the json object, e.g. {"_sets": "sets"}
+    json_names = {}
+    # Columns left out of the json object, e.g. the password hash
+    json_exclude = ()
+    # Format of the datetime columns in the json object
+    json_time_format = time_format
+
     # Initialize the object with the given keyword arguments
     def __init__(self, **kwargs):
         for key, value in kwargs.items():
             setattr(self, key, value)
 
+    @classmethod
+    def find_by(cls, **filters):
+        """
+        Find a single object by its column values, e.g. its id and its owner id,
+        without loading the collection the object belongs to
+        """
+        query = db.select(cls).filter_by(**filters)
+        return db.session.execute(query).scalar_one_or_none()
+
     # convert the value based to a datetime object
     def to_datetime(self, value, time_format=time_format):
         return datetime.strptime(value, time_format)
 
     # return a json serializable dictionary
-    def to_dict(self, time_format=time_format):
-        # new_dict = self.__dict__.copy()
-        new_dict = {
-            c.key: getattr(self, c.key) for c in inspect(self).mapper.column_attrs
-        }
-        for key, value in new_dict.items():
-            if isinstance(value, datetime):
-                new_dict[key] = value.strftime(time_format)
-
-        if "_sa_instance_state" in new_dict:
-            del new_dict["_sa_instance_state"]
-
-        return new_dict
+    def to_dict(self, time_format=None, fields=None):
+        return self.serializer(fields, time_format)(self)
+
+    @classmethod
+    def serializer(cls, fields=None, time_format=None):
+        """
+        Return the serializer of the class, compiled on the first use, or of
+        some of its fields
+        """
+        time_format = time_format or cls.json_time_format
+        serializer = _serializers.get((cls, time_format))
+        if serializer is None:
+            serializer = Serializer.compile(cls, time_format)
+            _serializers[(cls, time_format)] = serializer
+        if fields:
+            return serializer.project(fields)
+        return serializer
+
+
+class ExerciseSummaryMixin:
+    """The methods shared by the exercises and the custom exercises"""
+
+    # Columns in the summary of an exercise, and its fields
+    summary_columns = (
+        "id",
+        "title",
+        "category",
+        "muscle_group",
+        "equipment",
+        "media_file_url",
+    )
+    summary_fields = summary_columns + ("thumbnail_url",)
+
+    def to_summary(self):
+        """The fields of the exercise shown in the tree of a plan"""
+        summary = {name: getattr(self, name) for name in self.summary_columns}
+        summary["thumbnail_url"] = (self.media_variants or {}).get("thumb")
+        return summary
+
+
+# Faster equivalents of strftime for the formats of the models
+DATETIME_FORMATTERS = {
+    "%Y-%m-%d": lambda value: value.date().isoformat(),
+    "%Y-%m-%d %H:%M": lambda value: value.isoformat(" ", "minutes"),
+}
+
+
+class Serializer:
+    """
+    Turn the objects of a model into json serializable dictionaries. The
+    columns, their names in the json object and the datetime columns are
+    looked up once per class instead of for every object
+    """
+
+    def __init__(self, names, keys, datetimes, time_format):
+        self.names = names
+        self.keys = keys
+        self.datetimes = datetimes
+        self.time_format = time_format
+        self.format_datetime = DATETIME_FORMATTERS.get(
+            time_format, lambda value: value.strftime(time_format)
+        )
+        # The getters return a single value instead of a tuple for one key
+        if len(keys) > 1:
+            self.get_loaded = itemgetter(*keys)
+            self.get_attributes = attrgetter(*keys)
+        else:
+            self.get_loaded = lambda values: (values[keys[0]],)
+            self.get_attributes = lambda obj: (getattr(obj, keys[0]),)
+
+    @classmethod
+    def compile(cls, model, time_format=time_format):
+        """
+        Compile the serializer of a model from its columns, the renamed
+        columns (json_names) come last, the excluded ones are left out
+        """
+        plain, renamed = [], []
+        for attr in inspect(model).column_attrs:
+            if attr.key in model.json_exclude:
+                continue
+            is_datetime = isinstance(attr.columns[0].type, DateTime)
+            field = (model.json_names.get(attr.key, attr.key), attr.key, is_datetime)
+            (renamed if attr.key in model.json_names else plain).append(field)
+        order = list(model.json_names)
+        renamed.sort(key=lambda field: order.index(field[1]))
+        return cls.from_fields(plain + renamed, time_format)
+
+    @classmethod
+    def from_fields(cls, fields, time_format):
+        names = tuple(name for name, _, _ in fields)
+        keys = tuple(key for _, key, _ in fields)
+        datetimes = tuple(
+            index for index, (_, _, is_datetime) in enumerate(fields) if is_datetime
+        )
+        return cls(names, keys, datetimes, time_format)
+
+    def project(self, fields):
+        """
+        Return a serializer of some of the fields, in the order of the
+        serializer. Raise a ValueError for an unknown field
+        """
+        unknown = [name for name in fields if name not in self.names]
+        if unknown:
+            raise ValueError(f"Invalid field {unknown[0]}")
+        return self.from_fields(
+            [
+                (name, key, index in self.datetimes)
+                for index, (name, key) in enumerate(zip(self.names, self.keys))
+                if name in fields
+            ],
+            self.time_format,
+        )
+
+    def __call__(self, obj):
+        try:
+            # The loaded columns are in the __dict__ of the object
+            values = self.get_loaded(obj.__dict__)
+        except KeyError:
+            # Expired or deferred columns are loaded through the attributes
+            values = self.get_attributes(obj)
+        if self.datetimes:
+            values = list(values)
+            for index in self.datetimes:
+                if values[index] is not None:
+                    values[index] = self.format_datetime(values[index])
+        return dict(zip(self.names, values))
+
+
+# (model, time format) -> compiled serializer
+_serializers = {}
@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+"""
+    Create the table schema for the versions of the in-process caches
+    shared by all the workers using sqlalchemy
+    """
+
+
+from models.base import BaseModel, db
+from sqlalchemy.orm import Mapped
+from sqlalchemy import Integer, String
+
+
+class CacheVersion(BaseModel, db.Model):
+    """
+    the cache version class that maps to the cache_versions table in the MySQL database
+    """
+
+    __tablename__ = "cache_versions"
+    name: Mapped[str] = db.mapped_column(String(64), primary_key=True)
+    version: Mapped[int] = db.mapped_column(Integer, nullable=False, default=0)
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+
+    @classmethod
+    def get_version(cls, name):
+        """Return the current version of a cache, 0 if it was never bumped"""
+        query = db.select(cls.version).where(cls.name == name)
+        return db.session.execute(query).scalar_one_or_none() or 0
+
+    @classmethod
+    def bump(cls, name):
+        """
+        Increment the version of a cache in the current transaction,
+        the workers drop their copy once it is committed
+        """
+        query = db.update(cls).where(cls.name == name).values(version=cls.version + 1)
+        if db.session.execute(query).rowcount == 0:
+            db.session.add(cls(name=name, version=1))
@@ -5,19 +5,25 @@
     """
 
 
-from models.base import BaseModel, db
+from models.base import BaseModel, ExerciseSummaryMixin, db
 from sqlalchemy.orm import Mapped, mapped_column, relationship
-from sqlalchemy import Integer, String, DateTime, ForeignKey, Float, Table
+from sqlalchemy import Integer, String, DateTime, ForeignKey, Float, Table, JSON
 from datetime import datetime
 from typing import Optional, List
 
 
-class CustomExercise(BaseModel, db.Model):
+class CustomExercise(ExerciseSummaryMixin, BaseModel, db.Model):
     """
     the custom exercise class that maps to the custom exercises table in the MySQL database
     """
 
     __tablename__ = "custom_exercises"
+    __table_args__ = (
+        # Serve the duplicate title check and the distinct values of a user's exercises
+        db.Index("ix_custom_exercises_user_id_title", "user_id", "title"),
+        db.Index("ix_custom_exercises_user_id_category", "user_id", "category"),
+        db.Index("ix_custom_exercises_user_id_muscle_group", "user_id", "muscle_group"),
+    )
     id: Mapped[int] = db.mapped_column(Integer, primary_key=True, autoincrement=True)
     title: Mapped[str] = db.mapped_column(String(128), nullable=False)
     description: Mapped[str] = db.mapped_column(String(255), nullable=True)
@@ -37,6 +43,10 @@ class CustomExercise(BaseModel, db.Model):
     records: Mapped[List["Record"]] = relationship(
         "Record", back_populates="custom_exercise"
     )
+    # Variant name (thumb, medium, full) -> url of the resized copy of an image
+    media_variants: Mapped[Optional[dict]] = db.mapped_column(
+        JSON, nullable=True, default=None
+    )
 
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
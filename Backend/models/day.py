@@ -28,6 +28,8 @@ class Day(BaseModel, db.Model):
     )
     plan: Mapped["Plan"] = relationship("Plan", back_populates="days")
 
+    json_names = {"_session_duration": "session_duration"}
+
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
 
@@ -40,10 +42,13 @@ class Day(BaseModel, db.Model):
         """Set the session duration as an int  value"""
         self._session_duration = int(value)
 
-    def to_dict(self):
-        new_dict = super().to_dict()
-        new_dict["session_duration"] = self.session_duration
-
-        del new_dict["_session_duration"]
-
+    def to_tree(self, depth=2):
+        """The day with its workout sessions, and their exercises at depth 2"""
+        new_dict = self.to_dict()
+        if depth > 0:
+            sessions = sorted(self.workout_sessions, key=lambda session: session.id)
+            new_dict["workout_sessions"] = [
+                session.to_tree() if depth > 1 else session.to_dict()
+                for session in sessions
+            ]
         return new_dict
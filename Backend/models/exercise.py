@@ -4,30 +4,36 @@
     """
 
 
-from models.base import BaseModel, db
+from models.base import BaseModel, ExerciseSummaryMixin, db
 from sqlalchemy.orm import Mapped, mapped_column, relationship
-from sqlalchemy import Integer, String, DateTime, ForeignKey, Float, Table
+from sqlalchemy import Integer, String, DateTime, ForeignKey, Float, Table, JSON
 from datetime import datetime
 from typing import Optional, List
 
 
-class Exercise(BaseModel, db.Model):
+class Exercise(ExerciseSummaryMixin, BaseModel, db.Model):
     """
     the exercise class that maps to the exercises table in the MySQL database
     """
 
     __tablename__ = "exercises"
     id: Mapped[int] = db.mapped_column(Integer, primary_key=True, autoincrement=True)
-    title: Mapped[str] = db.mapped_column(String(128), nullable=False)
+    title: Mapped[str] = db.mapped_column(String(128), nullable=False, index=True)
     description: Mapped[str] = db.mapped_column(String(1024), nullable=True)
-    category: Mapped[str] = db.mapped_column(String(128), nullable=False)
-    muscle_group: Mapped[str] = db.mapped_column(String(128), nullable=False)
+    category: Mapped[str] = db.mapped_column(String(128), nullable=False, index=True)
+    muscle_group: Mapped[str] = db.mapped_column(
+        String(128), nullable=False, index=True
+    )
     equipment: Mapped[str] = db.mapped_column(String(128), nullable=True)
     media_file_url: Mapped[Optional[str]] = db.mapped_column(String(255), nullable=True)
     workout_sessions: Mapped[List["WorkoutSession"]] = relationship(
         "WorkoutSession", back_populates="exercise"
     )
     records: Mapped[List["Record"]] = relationship("Record", back_populates="exercise")
+    # Variant name (thumb, medium, full) -> url of the resized copy of an image
+    media_variants: Mapped[Optional[dict]] = db.mapped_column(
+        JSON, nullable=True, default=None
+    )
 
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
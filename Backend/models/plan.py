@@ -5,7 +5,9 @@
 
 
 from models.base import db, BaseModel
-from sqlalchemy.orm import Mapped, mapped_column, relationship
+from models.day import Day
+from models.workout_session import WorkoutSession
+from sqlalchemy.orm import Mapped, mapped_column, relationship, selectinload
 from sqlalchemy import Integer, String, DateTime, ForeignKey, Float
 from datetime import datetime
 from typing import Optional, List
@@ -32,6 +34,14 @@ class Plan(BaseModel, db.Model):
     )
     created_at: Mapped[datetime] = db.mapped_column(DateTime, default=datetime.utcnow)
 
+    # Serialize the private columns under the names of their properties
+    json_names = {
+        "_current_weight": "current_weight",
+        "_target_weight": "target_weight",
+        "_duration": "duration",
+        "_days_in_week": "days_in_week",
+    }
+
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
         self.created_at = datetime.utcnow()
@@ -72,17 +82,32 @@ class Plan(BaseModel, db.Model):
         """Set the days in week as an int  value"""
         self._days_in_week = int(value)
 
-    def to_dict(self):
-        # use the getter properties to access private variables
-        new_dict = super().to_dict()
-        new_dict["current_weight"] = self.current_weight
-        new_dict["target_weight"] = self.target_weight
-        new_dict["duration"] = self.duration
-        new_dict["days_in_week"] = self.days_in_week
-
-        del new_dict["_current_weight"]
-        del new_dict["_target_weight"]
-        del new_dict["_duration"]
-        del new_dict["_days_in_week"]
-
+    def to_tree(self, depth=3):
+        """
+        The plan with its days (depth 1), their workout sessions (depth 2)
+        and the exercises of the sessions (depth 3)
+        """
+        new_dict = self.to_dict()
+        if depth > 0:
+            days = sorted(self.days, key=lambda day: day.id)
+            new_dict["days"] = [day.to_tree(depth - 1) for day in days]
         return new_dict
+
+    @classmethod
+    def find_tree(cls, plan_id, user_id, depth=3):
+        """
+        Find a plan of a user and load its tree down to depth, with one
+        query per level instead of one per day and per workout session
+        """
+        query = db.select(cls).filter_by(id=plan_id, user_id=user_id)
+        if depth > 0:
+            loader = selectinload(cls.days)
+            if depth > 1:
+                loader = loader.selectinload(Day.workout_sessions)
+            if depth > 2:
+                loader = loader.options(
+                    selectinload(WorkoutSession.exercise),
+                    selectinload(WorkoutSession.custom_exercise),
+                )
+            query = query.options(loader)
+        return db.session.execute(query).scalar_one_or_none()
@@ -20,6 +20,10 @@ class Record(BaseModel, db.Model):
     """
 
     __tablename__ = "records"
+    __table_args__ = (
+        # Serves the records of a user ordered or filtered by date
+        db.Index("ix_records_user_id_date", "user_id", "date"),
+    )
     id: Mapped[int] = db.mapped_column(Integer, primary_key=True, autoincrement=True)
     _difficulty: Mapped[int] = db.mapped_column(Integer, nullable=False)
     _sets: Mapped[int] = db.mapped_column(Integer, nullable=False)
@@ -45,6 +49,16 @@ class Record(BaseModel, db.Model):
     )
     date: Mapped[datetime] = db.mapped_column(DateTime, default=datetime.utcnow)
 
+    json_time_format = time_format
+    json_names = {
+        "_difficulty": "difficulty",
+        "_sets": "sets",
+        "_reps": "reps",
+        "_rest": "rest",
+        "_weight_lifted": "weight_lifted",
+        "_user_weight": "user_weight",
+    }
+
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
         self.date = datetime.utcnow()
@@ -96,22 +110,3 @@ class Record(BaseModel, db.Model):
     @user_weight.setter
     def user_weight(self, value):
         self._user_weight = float(value)
-
-    def to_dict(self, time_format=time_format):
-        new_dict = super().to_dict(time_format)
-        new_dict["difficulty"] = self.difficulty
-        new_dict["date"] = self.date.strftime(time_format)
-        new_dict["sets"] = self._sets
-        new_dict["reps"] = self._reps
-        new_dict["rest"] = self._rest
-        new_dict["weight_lifted"] = self._weight_lifted
-        new_dict["user_weight"] = self._user_weight
-
-        del new_dict["_difficulty"]
-        del new_dict["_sets"]
-        del new_dict["_reps"]
-        del new_dict["_rest"]
-        del new_dict["_weight_lifted"]
-        del new_dict["_user_weight"]
-
-        return new_dict
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""
+    Create the table schema for the weekly totals of the records of a user
+    for each exercise using sqlalchemy
+    """
+
+
+from models.base import BaseModel, db
+from sqlalchemy.orm import Mapped
+from sqlalchemy import Integer, Float, Date, ForeignKey
+from datetime import date
+
+
+class RecordAggregate(BaseModel, db.Model):
+    """
+    the record aggregate class that maps to the record_aggregates table in the MySQL database,
+    the totals of the records of a user for an exercise during a week starting on monday
+    """
+
+    __tablename__ = "record_aggregates"
+    __table_args__ = (
+        # 0 stands for no exercise, unique keys ignore the NULLs in MySQL
+        db.UniqueConstraint(
+            "user_id",
+            "exercise_id",
+            "custom_exercise_id",
+            "week",
+            name="uq_record_aggregates_user_exercise_week",
+        ),
+    )
+    id: Mapped[int] = db.mapped_column(Integer, primary_key=True, autoincrement=True)
+    user_id: Mapped[int] = db.mapped_column(
+        Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False
+    )
+    exercise_id: Mapped[int] = db.mapped_column(Integer, nullable=False)
+    custom_exercise_id: Mapped[int] = db.mapped_column(Integer, nullable=False)
+    week: Mapped[date] = db.mapped_column(Date, nullable=False)
+    records: Mapped[int] = db.mapped_column(Integer, nullable=False)
+    sets: Mapped[int] = db.mapped_column(Integer, nullable=False)
+    reps: Mapped[int] = db.mapped_column(Integer, nullable=False)
+    # sets x reps x weight lifted
+    volume: Mapped[float] = db.mapped_column(Float, nullable=False)
+    max_weight: Mapped[float] = db.mapped_column(Float, nullable=False)
+    estimated_1rm: Mapped[float] = db.mapped_column(Float, nullable=False)
+    # Sums of the difficulty and of the user weight of the records, for the averages
+    difficulty_sum: Mapped[int] = db.mapped_column(Integer, nullable=False)
+    user_weight_sum: Mapped[float] = db.mapped_column(Float, nullable=False)
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
@@ -25,9 +25,6 @@ class Role(BaseModel, db.Model):
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
 
-    def to_dict(self):
-        return super().to_dict()
-
     @classmethod
     def find_role_by_name(cls, name):
         query = db.select(cls).where(cls.name == name)
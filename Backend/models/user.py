@@ -5,11 +5,11 @@
 
 
 from models.base import db, BaseModel
-from sqlalchemy.orm import Mapped, mapped_column, relationship
-from sqlalchemy import Integer, String, DateTime, Table, Column, ForeignKey
+from sqlalchemy.orm import Mapped, mapped_column, relationship, joinedload
+from sqlalchemy import Integer, String, DateTime, Table, Column, ForeignKey, JSON
 from datetime import datetime
 from typing import Optional, List
-import bcrypt
+from passwords import hash_password, verify_password, needs_rehash
 
 user_roles = Table(
     "user_roles",
@@ -50,6 +50,17 @@ class User(BaseModel, db.Model):
         "Role", secondary=user_roles, back_populates="users"
     )
     created_at: Mapped[datetime] = db.mapped_column(DateTime, default=datetime.utcnow)
+    # Incremented on every role change to invalidate the role claims of issued tokens
+    roles_version: Mapped[int] = db.mapped_column(
+        Integer, nullable=False, default=0, server_default="0"
+    )
+    # Variant name (thumb, medium, full) -> url of the resized profile picture
+    profile_picture_variants: Mapped[Optional[dict]] = db.mapped_column(
+        JSON, nullable=True, default=None
+    )
+
+    # Never return the password hash and the roles version
+    json_exclude = ("password_hashed", "roles_version")
 
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
@@ -62,31 +73,60 @@ class User(BaseModel, db.Model):
 
     @password.setter
     def password(self, password):
-        self.password_hashed = bcrypt.hashpw(
-            password.encode("utf-8"), bcrypt.gensalt()
-        ).decode("utf-8")
+        self.password_hashed = hash_password(password)
 
     def check_password(self, password):
         # Check if the password passed by the user, matches the password in the database
-        return bcrypt.checkpw(
-            password.encode("utf-8"), self.password_hashed.encode("utf-8")
-        )
+        return verify_password(password, self.password_hashed)
 
-    def to_dict(self):
-        # Delete the password_hashed from the dictionary before returning it
-        new_dict = super().to_dict()
-        del new_dict["password_hashed"]
-        return new_dict
+    def rehash_password(self, password):
+        """
+        Hash again a checked password when the cost of its hash is not
+        BCRYPT_ROUNDS anymore, return True when the hash was replaced
+        """
+        if not needs_rehash(self.password_hashed):
+            return False
+        self.password = password
+        return True
 
     def is_admin(self):
         # Check if the user is an admin
-        return any([role.name == "Admin" for role in self.roles])
+        return self.has_role("Admin")
+
+    def has_role(self, *names):
+        # Check if the user has at least one of the given roles
+        return any(role.name in names for role in self.roles)
+
+    def bump_roles_version(self):
+        # Invalidate the role claims of the tokens issued before a role change
+        self.roles_version = (self.roles_version or 0) + 1
+
+    def token_claims(self):
+        """
+        Return the additional JWT claims used to authorize the user
+        without querying the database
+        """
+        return {
+            "uid": self.id,
+            "roles": [role.name for role in self.roles],
+            "rv": self.roles_version or 0,
+        }
+
+    @classmethod
+    def get_roles_version(cls, user_id):
+        """
+        Return the roles version of a user, or None if the user does not exist
+        """
+        query = db.select(cls.roles_version).where(cls.id == user_id)
+        return db.session.execute(query).scalar_one_or_none()
 
     @classmethod
-    def find_user_by_email(cls, email):
+    def find_user_by_email(cls, email, with_roles=False):
         """
-        Find a user by email
+        Find a user by email, optionally loading its roles in the same query
         """
         query = db.select(cls).where(cls.email == email)
-        user = db.session.execute(query).scalar_one_or_none()
+        if with_roles:
+            query = query.options(joinedload(cls.roles))
+        user = db.session.execute(query).unique().scalar_one_or_none()
         return user
@@ -58,6 +58,13 @@ class WorkoutSession(BaseModel, db.Model):
         "CustomExercise", back_populates="workout_sessions"
     )
 
+    json_names = {
+        "_sets": "sets",
+        "_reps": "reps",
+        "_rest": "rest",
+        "_weight_lifted": "weight_lifted",
+    }
+
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
 
@@ -93,16 +100,11 @@ class WorkoutSession(BaseModel, db.Model):
     def weight_lifted(self, value):
         self._weight_lifted = float(value)
 
-    def to_dict(self):
-        new_dict = super().to_dict()
-        new_dict["sets"] = self.sets
-        new_dict["reps"] = self.reps
-        new_dict["rest"] = self.rest
-        new_dict["weight_lifted"] = self.weight_lifted
-
-        del new_dict["_sets"]
-        del new_dict["_reps"]
-        del new_dict["_rest"]
-        del new_dict["_weight_lifted"]
-
+    def to_tree(self):
+        """The workout session with a summary of its exercise"""
+        new_dict = self.to_dict()
+        new_dict["exercise"] = self.exercise.to_summary() if self.exercise else None
+        new_dict["custom_exercise"] = (
+            self.custom_exercise.to_summary() if self.custom_exercise else None
+        )
         return new_dict
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""
+    Cursor (keyset) pagination shared by the list endpoints
+    """
+
+
+import base64
+import binascii
+import json
+from bisect import bisect_right
+from collections import OrderedDict
+from threading import Lock
+from time import monotonic
+from urllib.parse import urlencode
+from flask import request, abort, jsonify, current_app
+from sqlalchemy import func
+from models.base import db
+
+
+# Cache of the totals: count query -> (total, computed_at), the least
+# recently used queries are dropped beyond PAGINATION_COUNT_CACHE_SIZE
+_totals = OrderedDict()
+_totals_lock = Lock()
+
+
+class Page:
+    """One page of items and the cursor to the next one"""
+
+    def __init__(self, items, limit, next_cursor=None, total=None):
+        self.items = items
+        self.limit = limit
+        self.next_cursor = next_cursor
+        self.total = total
+
+
+def encode_cursor(value):
+    """Encode the key of the last item of a page as an opaque cursor"""
+    raw = json.dumps({"k": value}, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor, key_type=int):
+    """Decode a cursor created by encode_cursor, its key must be a key_type"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        value = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))["k"]
+    except (binascii.Error, ValueError, TypeError, KeyError, UnicodeError):
+        return abort(400, description="Bad Request: Invalid cursor")
+    # bool is a subclass of int
+    if not isinstance(value, key_type) or isinstance(value, bool):
+        return abort(400, description="Bad Request: Invalid cursor")
+    return value
+
+
+def column_key_type(key_column):
+    """The type of the cursors of a key column, int or str"""
+    try:
+        python_type = key_column.type.python_type
+    except NotImplementedError:
+        python_type = None
+    return python_type if python_type in (int, str) else (int, str)
+
+
+def get_limit():
+    """Read the page size from the query parameters, bounded by the config"""
+    default = current_app.config.get("PAGINATION_DEFAULT_LIMIT", 20)
+    maximum = current_app.config.get("PAGINATION_MAX_LIMIT", 100)
+    limit = request.args.get("limit", None, type=int)
+    if limit is None:
+        # per_page is kept for the clients of the former page based pagination
+        limit = request.args.get("per_page", default, type=int)
+    if limit < 1:
+        return abort(400, description="Bad Request: limit must be a positive integer")
+    return min(limit, maximum)
+
+
+def count_total(query):
+    """
+    Count the rows matched by a query. The result is cached for
+    PAGINATION_COUNT_TTL seconds so that the count does not run on every page
+    """
+    count_query = db.select(func.count()).select_from(query.order_by(None).subquery())
+    compiled = count_query.compile()
+    key = (str(compiled), tuple(sorted(compiled.params.items(), key=str)))
+    ttl = current_app.config.get("PAGINATION_COUNT_TTL", 60)
+    size = current_app.config.get("PAGINATION_COUNT_CACHE_SIZE", 1000)
+    now = monotonic()
+
+    with _totals_lock:
+        cached = _totals.get(key)
+        if cached and now - cached[1] < ttl:
+            _totals.move_to_end(key)
+            return cached[0]
+
+    total = db.session.execute(count_query).scalar()
+    with _totals_lock:
+        _totals[key] = (total, now)
+        _totals.move_to_end(key)
+        while len(_totals) > size:
+            _totals.popitem(last=False)
+    return total
+
+
+def paginate(query, key_column):
+    """
+    Return a Page of the results of a select query, using the value of
+    key_column of the last item as the cursor instead of an OFFSET
+    """
+    limit = get_limit()
+
+    total = None
+    if request.args.get("include_total", "false").lower() == "true":
+        total = count_total(query)
+
+    cursor = request.args.get("cursor", None)
+    if cursor:
+        query = query.where(
+            key_column > decode_cursor(cursor, column_key_type(key_column))
+        )
+
+    query = query.order_by(key_column).limit(limit + 1)
+    items = db.session.execute(query).scalars().all()
+
+    next_cursor = None
+    if len(items) > limit:
+        items = items[:limit]
+        next_cursor = encode_cursor(getattr(items[-1], key_column.key))
+
+    return Page(items, limit, next_cursor, total)
+
+
+def paginate_keys(keys):
+    """
+    Return a Page of an ascending list of keys held in memory, using the
+    same cursors as paginate
+    """
+    limit = get_limit()
+
+    total = None
+    if request.args.get("include_total", "false").lower() == "true":
+        total = len(keys)
+
+    start = 0
+    cursor = request.args.get("cursor", None)
+    if cursor:
+        start = bisect_right(keys, decode_cursor(cursor))
+
+    items = keys[start : start + limit]
+    next_cursor = None
+    if start + limit < len(keys):
+        next_cursor = encode_cursor(items[-1])
+
+    return Page(items, limit, next_cursor, total)
+
+
+def paginate_list(items):
+    """
+    Return a Page of a list held in memory that is not ordered by a key,
+    such as ranked results, the cursor is the offset of the next item
+    """
+    limit = get_limit()
+
+    total = None
+    if request.args.get("include_total", "false").lower() == "true":
+        total = len(items)
+
+    start = 0
+    cursor = request.args.get("cursor", None)
+    if cursor:
+        start = decode_cursor(cursor)
+        if start < 0:
+            return abort(400, description="Bad Request: Invalid cursor")
+
+    next_cursor = None
+    if start + limit < len(items):
+        next_cursor = encode_cursor(start + limit)
+
+    return Page(items[start : start + limit], limit, next_cursor, total)
+
+
+def add_page_headers(response, page):
+    """Expose the next cursor and the total of a page as response headers"""
+    if page.next_cursor:
+        args = request.args.to_dict()
+        args["cursor"] = page.next_cursor
+        next_url = f"{request.base_url}?{urlencode(args)}"
+        response.headers["X-Next-Cursor"] = page.next_cursor
+        response.headers["Link"] = f'<{next_url}>; rel="next"'
+    if page.total is not None:
+        response.headers["X-Total-Count"] = str(page.total)
+    return response
+
+
+def get_fields():
+    """Read the comma separated fields to return from the query parameters"""
+    fields = request.args.get("fields", "")
+    return [name.strip() for name in fields.split(",") if name.strip()] or None
+
+
+def paginated_response(query, key_column):
+    """
+    Paginate a query and return its items as a json list, the cursor to the
+    next page is sent in the X-Next-Cursor and Link headers. The fields
+    query parameter keeps only some fields of the items
+    """
+    try:
+        serialize = key_column.class_.serializer(get_fields())
+    except ValueError as e:
+        return abort(400, description=f"Bad Request: {e}")
+    page = paginate(query, key_column)
+    response = jsonify([serialize(item) for item in page.items])
+    return add_page_headers(response, page)
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+    Hashing and verification of the passwords with bcrypt. The work is done
+    by a small pool of threads shared by the requests of a server process.
+    bcrypt releases the GIL while it hashes, so threads are enough to use
+    several cores, but the request thread still waits for the result: the
+    pool does not free the workers of the server, it bounds the cores used
+    by a burst of logins to PASSWORD_HASH_WORKERS and refuses the requests
+    beyond PASSWORD_HASH_MAX_PENDING instead of letting them pile up. The
+    cost of the hashes is BCRYPT_ROUNDS, the hashes made with another cost
+    are replaced when their user logs in
+    """
+
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+from threading import BoundedSemaphore, Lock
+import bcrypt
+from werkzeug.exceptions import ServiceUnavailable
+from config import setting
+
+
+class PasswordPool:
+    """
+    A pool of threads for the bcrypt calls, with a bounded number of calls
+    running or waiting. With no workers the calls run in the calling thread
+    """
+
+    def __init__(self, workers, max_pending, timeout):
+        self.workers = workers
+        # Seconds a call waits for a place in the pool
+        self.timeout = timeout
+        self.pending = BoundedSemaphore(max(max_pending, 1))
+        self.executor = None
+        if workers > 0:
+            self.executor = ThreadPoolExecutor(workers, thread_name_prefix="bcrypt")
+
+    def run(self, function, *args):
+        """Run a bcrypt call, raise a 503 error when the pool is saturated"""
+        if self.executor is None:
+            return function(*args)
+        if not self.pending.acquire(timeout=self.timeout):
+            raise ServiceUnavailable(
+                "Service Unavailable: Too many password checks, retry later"
+            )
+        try:
+            return self.executor.submit(function, *args).result()
+        finally:
+            self.pending.release()
+
+
+_pool = None
+_pool_pid = None
+_pool_lock = Lock()
+
+
+def get_pool():
+    """
+    Return the password pool of the process. It is created on the first
+    call, and again in a process forked after it was created since the
+    threads of the pool are not copied by fork
+    """
+    global _pool, _pool_pid
+    if _pool is None or _pool_pid != os.getpid():
+        with _pool_lock:
+            if _pool is None or _pool_pid != os.getpid():
+                _pool = PasswordPool(
+                    setting("PASSWORD_HASH_WORKERS"),
+                    setting("PASSWORD_HASH_MAX_PENDING"),
+                    setting("PASSWORD_HASH_TIMEOUT"),
+                )
+                _pool_pid = os.getpid()
+    return _pool
+
+
+def hash_password(password):
+    """Hash a password with the configured cost"""
+    salt = bcrypt.gensalt(setting("BCRYPT_ROUNDS"))
+    password_hashed = get_pool().run(bcrypt.hashpw, password.encode("utf-8"), salt)
+    return password_hashed.decode("utf-8")
+
+
+def verify_password(password, password_hashed):
+    """Check a password against its hash"""
+    return get_pool().run(
+        bcrypt.checkpw, password.encode("utf-8"), password_hashed.encode("utf-8")
+    )
+
+
+def hash_rounds(password_hashed):
+    """The cost of a bcrypt hash, e.g. 12 for $2b$12$..."""
+    try:
+        return int(password_hashed.split("$")[2])
+    except (IndexError, ValueError):
+        return None
+
+
+def needs_rehash(password_hashed):
+    """Check whether a hash was made with another cost than the configured one"""
+    return hash_rounds(password_hashed) != setting("BCRYPT_ROUNDS")
@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+"""
+    Progress analytics over the records of a user. The database groups the
+    records by day, or reads the weekly aggregates, NumPy rolls the rows up
+    into weeks or months and computes the volume, the estimated one
+    repetition max, the personal records, the rolling averages and the body
+    weight trend
+    """
+
+
+import numpy as np
+from flask import current_app
+from sqlalchemy import func
+from json_provider import encode_rows
+from models.base import db
+from models.record import Record
+from models.record_aggregate import RecordAggregate
+from record_aggregates import MAXIMA, TOTALS, totals_columns
+
+
+BUCKETS = ("day", "week", "month")
+
+
+def to_arrays(partitions):
+    """
+    Return the dates and the totals of the rows as NumPy arrays, the rows
+    are converted one partition at a time
+    """
+    days = [np.empty(0, dtype="datetime64[D]")]
+    values = [np.empty((0, len(TOTALS)))]
+    for rows in partitions:
+        # MySQL returns dates, SQLite returns strings
+        days.append(np.array([str(row[0]) for row in rows], dtype="datetime64[D]"))
+        values.append(
+            np.array([row[1:] for row in rows], dtype=float).reshape(
+                len(rows), len(TOTALS)
+            )
+        )
+    values = np.nan_to_num(np.concatenate(values), nan=0.0)
+    return np.concatenate(days), dict(zip(TOTALS, values.T))
+
+
+def fetch_arrays(query):
+    """
+    Run a query of the totals and return its rows as NumPy arrays, the
+    rows are fetched EXPORT_BATCH_SIZE at a time from a server-side cursor
+    """
+    batch_size = current_app.config.get("EXPORT_BATCH_SIZE", 1000)
+    result = db.session.execute(query.execution_options(yield_per=batch_size))
+    return to_arrays(result.partitions())
+
+
+def daily_rows(user_id, start, end, exercise_id=None, custom_exercise_id=None):
+    """
+    Return the dates and the totals of the days with records, as NumPy
+    arrays, between start included and end excluded
+    """
+    day = func.date(Record.date)
+    query = (
+        db.select(day, *totals_columns())
+        .where(Record.user_id == user_id)
+        .group_by(day)
+        .order_by(day)
+    )
+    if start:
+        query = query.where(Record.date >= start)
+    if end:
+        query = query.where(Record.date < end)
+    if exercise_id:
+        query = query.where(Record.exercise_id == exercise_id)
+    if custom_exercise_id:
+        query = query.where(Record.custom_exercise_id == custom_exercise_id)
+    return fetch_arrays(query)
+
+
+def weekly_rows(user_id, start, end, exercise_id=None, custom_exercise_id=None):
+    """
+    Return the mondays and the totals of the weeks with records from the
+    aggregates table, start and end must be mondays
+    """
+    week = RecordAggregate.week
+    query = (
+        db.select(
+            week,
+            *(
+                (func.max if column in MAXIMA else func.sum)(
+                    getattr(RecordAggregate, column)
+                )
+                for column in TOTALS
+            ),
+        )
+        .where(RecordAggregate.user_id == user_id)
+        .group_by(week)
+        .order_by(week)
+    )
+    if start:
+        query = query.where(week >= start.date())
+    if end:
+        query = query.where(week < end.date())
+    if exercise_id:
+        query = query.where(RecordAggregate.exercise_id == exercise_id)
+    if custom_exercise_id:
+        query = query.where(RecordAggregate.custom_exercise_id == custom_exercise_id)
+    return fetch_arrays(query)
+
+
+def bucket_starts(days, bucket):
+    """Return the first day of the week (monday) or the month of each day"""
+    if bucket == "month":
+        return days.astype("datetime64[M]").astype("datetime64[D]")
+    if bucket == "week":
+        # 1970-01-01 is a thursday
+        weekdays = (days.astype(np.int64) + 3) % 7
+        return days - weekdays
+    return days
+
+
+def rolling_mean(values, window):
+    """The mean of each value and the window - 1 values before it"""
+    if not len(values):
+        return values
+    sums = np.cumsum(np.insert(values, 0, 0.0))
+    counts = np.minimum(np.arange(1, len(values) + 1), window)
+    ends = np.arange(1, len(values) + 1)
+    return (sums[ends] - sums[ends - counts]) / counts
+
+
+def personal_record(values, starts):
+    """Return the highest value and the bucket it was reached in"""
+    if not len(values) or values.max() <= 0:
+        return None
+    index = int(values.argmax())
+    return {"value": round(float(values[index]), 2), "date": str(starts[index])}
+
+
+def progress(days, columns, bucket="week", window=4):
+    """Compute the progress of the buckets of the daily rows"""
+    starts, inverse = np.unique(bucket_starts(days, bucket), return_inverse=True)
+    size = len(starts)
+
+    totals = {}
+    for column in (
+        "records",
+        "sets",
+        "reps",
+        "volume",
+        "difficulty_sum",
+        "user_weight_sum",
+    ):
+        totals[column] = np.zeros(size)
+        np.add.at(totals[column], inverse, columns[column])
+    maxima = {}
+    for column in MAXIMA:
+        maxima[column] = np.zeros(size)
+        np.maximum.at(maxima[column], inverse, columns[column])
+
+    records = np.maximum(totals["records"], 1)
+    buckets = {
+        "start": starts.astype(str),
+        "records": totals["records"].astype(int),
+        "sets": totals["sets"].astype(int),
+        "reps": totals["reps"].astype(int),
+        "volume": np.round(totals["volume"], 2),
+        "max_weight": np.round(maxima["max_weight"], 2),
+        "estimated_1rm": np.round(maxima["estimated_1rm"], 2),
+        "difficulty": np.round(totals["difficulty_sum"] / records, 2),
+        "user_weight": np.round(totals["user_weight_sum"] / records, 2),
+        "volume_rolling_avg": np.round(rolling_mean(totals["volume"], window), 2),
+        "estimated_1rm_rolling_avg": np.round(
+            rolling_mean(maxima["estimated_1rm"], window), 2
+        ),
+    }
+
+    summary = {
+        "personal_records": {
+            "max_weight": personal_record(maxima["max_weight"], starts),
+            "estimated_1rm": personal_record(maxima["estimated_1rm"], starts),
+            "volume": personal_record(totals["volume"], starts),
+        },
+        "body_weight": body_weight_trend(days, columns),
+    }
+    return buckets, summary
+
+
+def body_weight_trend(days, columns):
+    """The first and last body weight and the least squares change per week"""
+    if not len(days):
+        return None
+    weights = columns["user_weight_sum"] / np.maximum(columns["records"], 1)
+    trend = {
+        "start": round(float(weights[0]), 2),
+        "end": round(float(weights[-1]), 2),
+        "change": round(float(weights[-1] - weights[0]), 2),
+        "change_per_week": None,
+    }
+    if len(days) > 1:
+        x = (days - days[0]).astype(float)
+        slope = np.polyfit(x, weights, 1)[0]
+        trend["change_per_week"] = round(float(slope * 7), 3)
+    return trend
+
+
+def stream_json(header, buckets, summary, batch_size=1000):
+    """
+    Yield the json object of the progress piece by piece, with the JSON
+    provider of the app, the buckets are serialized batch_size at a time
+    instead of into one large string
+    """
+    provider = current_app.json
+    yield provider.dumps(header)[:-1].encode("utf-8") + b',"buckets":['
+    keys = list(buckets)
+    columns = [buckets[key].tolist() for key in keys]
+    size = len(columns[0]) if columns else 0
+    for start in range(0, size, batch_size):
+        rows = [
+            dict(zip(keys, row))
+            for row in zip(*(column[start : start + batch_size] for column in columns))
+        ]
+        yield (b"," if start else b"") + encode_rows(rows)
+    yield b"]," + provider.dumps(summary)[1:].encode("utf-8") + b"\n"
@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""
+    Rate limiting of the expensive endpoints, e.g. the logins. Every caller
+    has a state per limit, updated by one of two algorithms:
+    - a token bucket holds up to `limit` tokens, is refilled continuously
+      over `period` seconds, and a request takes one token. It lets a
+      caller spend a burst, then paces it
+    - a sliding window counts the requests of the current fixed window of
+      `period` seconds plus the share of the previous window still inside
+      the last `period` seconds, and a request is counted while that
+      estimate is below `limit`. It caps the requests of any period
+    A request over a limit is refused with a 429 error. The states are kept
+    in a store, in the memory of the process or in a local SQLite database
+    shared by the workers of the server
+    """
+
+
+import json
+import math
+import os
+from functools import wraps
+from threading import Lock
+from time import time
+from flask import current_app, has_app_context, request
+from werkzeug.exceptions import TooManyRequests
+from local_db import connect, create_database
+
+
+def refill(tokens, updated_at, limit, period, now):
+    """The tokens of a bucket at now, at most limit"""
+    return min(float(limit), tokens + (now - updated_at) * limit / period)
+
+
+def take(tokens, limit, period):
+    """
+    Take a token out of a bucket, return its tokens left and the seconds
+    to wait before the next token, 0 when the token was taken
+    """
+    if tokens >= 1:
+        return tokens - 1, 0.0
+    return tokens, (1 - tokens) * period / limit
+
+
+def token_bucket(state, limit, period, now):
+    """
+    Take a token of the bucket (tokens, updated_at), return the new state
+    and the seconds to wait, 0 when the request is allowed
+    """
+    tokens, updated_at = state or (limit, now)
+    tokens, wait = take(refill(tokens, updated_at, limit, period, now), limit, period)
+    return (tokens, now), wait
+
+
+def sliding_window(state, limit, period, now):
+    """
+    Count a request in the window (window number, count, previous count),
+    return the new state and the seconds to wait, 0 when the request is
+    allowed
+    """
+    number = int(now // period)
+    window, count, previous = state or (number, 0, 0)
+    if window != number:
+        # The previous window is the last one only when they follow
+        previous = count if number - window == 1 else 0
+        count = 0
+    elapsed = now - number * period
+    if previous * (1 - elapsed / period) + count + 1 <= limit:
+        return (number, count + 1, previous), 0.0
+    if count + 1 <= limit:
+        # Wait for the share of the previous window to fall enough
+        wait = period * (1 - (limit - count - 1) / previous) - elapsed
+    else:
+        # Wait for the next window, the current one becomes the previous
+        wait = period - elapsed + period * max(0.0, 1 - (limit - 1) / count)
+    return (number, count, previous), max(wait, 0.001)
+
+
+# Algorithm name -> function, the algorithm of a limit
+RATE_LIMIT_ALGORITHMS = {
+    "token_bucket": token_bucket,
+    "sliding_window": sliding_window,
+}
+
+
+class MemoryStore:
+    """The states of the process, lost on restart and not shared"""
+
+    # Number of states above which the expired states are dropped
+    max_states = 10000
+
+    def __init__(self):
+        # key -> (state, updated_at)
+        self.states = {}
+        self.lock = Lock()
+
+    def consume(self, key, limit, period, algorithm=token_bucket):
+        now = time()
+        with self.lock:
+            if len(self.states) > self.max_states:
+                self.prune(now, period)
+            state, _ = self.states.get(key, (None, now))
+            state, wait = algorithm(state, limit, period, now)
+            self.states[key] = (state, now)
+        return wait
+
+    def prune(self, now, period):
+        """
+        Drop the states untouched for two periods, their bucket is full and
+        their windows are over
+        """
+        self.states = {
+            key: value
+            for key, value in self.states.items()
+            if now - value[1] < 2 * period
+        }
+
+
+class SQLiteStore:
+    """The states in a SQLite database shared by the processes of a host"""
+
+    def __init__(self, path):
+        self.path = path
+        self.pruned_at = 0.0
+        create_database(
+            path,
+            "CREATE TABLE IF NOT EXISTS rate_limit_states ("
+            "key TEXT PRIMARY KEY, state TEXT NOT NULL, updated_at REAL NOT NULL)",
+        )
+
+    def consume(self, key, limit, period, algorithm=token_bucket):
+        now = time()
+        with connect(self.path) as connection:
+            # Lock the database for writing before reading the state, two
+            # workers must not take the same token
+            connection.execute("BEGIN IMMEDIATE")
+            if now - self.pruned_at > period:
+                connection.execute(
+                    "DELETE FROM rate_limit_states WHERE updated_at < ?",
+                    (now - 2 * period,),
+                )
+                self.pruned_at = now
+            row = connection.execute(
+                "SELECT state FROM rate_limit_states WHERE key = ?", (key,)
+            ).fetchone()
+            state, wait = algorithm(
+                json.loads(row[0]) if row else None, limit, period, now
+            )
+            connection.execute(
+                "INSERT OR REPLACE INTO rate_limit_states (key, state, updated_at)"
+                " VALUES (?, ?, ?)",
+                (key, json.dumps(state), now),
+            )
+        return wait
+
+
+def sqlite_store():
+    config = current_app.config if has_app_context() else {}
+    return SQLiteStore(
+        config.get("RATE_LIMIT_DATABASE", "tmp/fitjourney/rate_limits.sqlite3")
+    )
+
+
+# Store name -> factory, selected by the RATE_LIMIT_STORAGE setting
+RATE_LIMIT_STORES = {"memory": MemoryStore, "sqlite": sqlite_store}
+
+_store = None
+_store_lock = Lock()
+
+
+def register_rate_limit_store(name, factory):
+    """Make a store available to the RATE_LIMIT_STORAGE setting"""
+    RATE_LIMIT_STORES[name] = factory
+
+
+def get_store():
+    """Return the store of the limits shared by the whole process"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                if has_app_context():
+                    backend = current_app.config.get("RATE_LIMIT_STORAGE", "memory")
+                else:
+                    backend = os.getenv("RATE_LIMIT_STORAGE", "memory")
+                _store = RATE_LIMIT_STORES[backend]()
+    return _store
+
+
+def client_ip():
+    """The address of the client, behind a proxy see werkzeug's ProxyFix"""
+    return request.remote_addr or "unknown"
+
+
+def login_email():
+    """The email of a login request, None when it has none"""
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict) or not isinstance(data.get("email"), str):
+        return None
+    return data["email"].strip().lower() or None
+
+
+def rate_limit(scope, limits):
+    """
+    Limit the requests of a view. limits is a list of (name, key, limit
+    setting, algorithm), key returning the caller of a request, e.g. its
+    ip, or None to skip the limit, and algorithm a name of
+    RATE_LIMIT_ALGORITHMS. The period of the limits is RATE_LIMIT_PERIOD
+    """
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            config = current_app.config
+            if config.get("RATE_LIMIT_ENABLED", True):
+                period = config.get("RATE_LIMIT_PERIOD", 60)
+                waits = []
+                for name, key, setting, algorithm in limits:
+                    caller = key()
+                    limit = config.get(setting)
+                    if caller is None or not limit:
+                        continue
+                    waits.append(
+                        get_store().consume(
+                            f"{scope}:{name}:{caller}",
+                            limit,
+                            period,
+                            RATE_LIMIT_ALGORITHMS[algorithm],
+                        )
+                    )
+                wait = max(waits, default=0)
+                if wait:
+                    raise TooManyRequests(
+                        "Too Many Requests: Too many attempts, retry later",
+                        retry_after=math.ceil(wait),
+                    )
+            return view(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+# The two login endpoints share their limits. The callers behind the ip of
+# a proxy may log in at once, the attempts on an account are capped
+login_rate_limit = rate_limit(
+    "login",
+    [
+        ("ip", client_ip, "LOGIN_RATE_LIMIT_PER_IP", "token_bucket"),
+        ("email", login_email, "LOGIN_RATE_LIMIT_PER_EMAIL", "sliding_window"),
+    ],
+)
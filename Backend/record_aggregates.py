@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+"""
+    Maintenance of the weekly totals of the records in the
+    record_aggregates table. The endpoints update the weeks of the records
+    they write in the same transaction, the `flask records
+    rebuild-aggregates` command recomputes the whole table
+    """
+
+
+from datetime import date, datetime, time, timedelta
+from time import perf_counter
+import click
+from flask.cli import AppGroup
+from sqlalchemy import case, func
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+from models.base import db
+from models.record import Record
+from models.record_aggregate import RecordAggregate
+
+
+KEY = ("user_id", "exercise_id", "custom_exercise_id", "week")
+TOTALS = (
+    "records",
+    "sets",
+    "reps",
+    "volume",
+    "max_weight",
+    "estimated_1rm",
+    "difficulty_sum",
+    "user_weight_sum",
+)
+MAXIMA = ("max_weight", "estimated_1rm")
+
+
+def estimated_1rm():
+    """The Epley estimation of the one repetition max of a record"""
+    weight = func.coalesce(Record._weight_lifted, 0)
+    return case(
+        (Record._reps > 1, weight * (1 + Record._reps / 30.0)),
+        else_=weight,
+    )
+
+
+def totals_columns():
+    """The SQL aggregates of a group of records, in the order of TOTALS"""
+    weight = func.coalesce(Record._weight_lifted, 0)
+    return (
+        func.count(Record.id),
+        func.sum(Record._sets),
+        func.sum(Record._sets * Record._reps),
+        func.sum(Record._sets * Record._reps * weight),
+        func.max(weight),
+        func.max(estimated_1rm()),
+        func.sum(Record._difficulty),
+        func.sum(Record._user_weight),
+    )
+
+
+def week_of(day):
+    """Return the monday of the week of a date"""
+    if isinstance(day, datetime):
+        day = day.date()
+    return day - timedelta(days=day.weekday())
+
+
+def record_key(record):
+    """Return the key of the aggregate of a record"""
+    return (
+        record.user_id,
+        record.exercise_id or 0,
+        record.custom_exercise_id or 0,
+        week_of(record.date),
+    )
+
+
+def unlinked_keys(records, column):
+    """
+    Return the keys of the aggregates of the records of a deleted exercise
+    or custom exercise, column, before and after the column is unset
+    """
+    position = KEY.index(column)
+    keys = set()
+    for record in records:
+        key = record_key(record)
+        keys.update([key, key[:position] + (0,) + key[position + 1 :]])
+    return keys
+
+
+def record_totals(record):
+    """Return the totals of a single record"""
+    weight = record.weight_lifted or 0
+    reps = record.reps
+    return {
+        "records": 1,
+        "sets": record.sets,
+        "reps": record.sets * reps,
+        "volume": record.sets * reps * weight,
+        "max_weight": weight,
+        "estimated_1rm": weight * (1 + reps / 30.0) if reps > 1 else weight,
+        "difficulty_sum": record.difficulty,
+        "user_weight_sum": record.user_weight,
+    }
+
+
+def merge(totals, other):
+    """Combine the totals of two groups of records"""
+    return {
+        column: (
+            max(totals[column], other[column])
+            if column in MAXIMA
+            else totals[column] + other[column]
+        )
+        for column in TOTALS
+    }
+
+
+def add_records(records):
+    """
+    Add new records to the aggregates of their weeks in the current
+    transaction, the records must have their date
+    """
+    grouped = {}
+    for record in records:
+        key = record_key(record)
+        totals = record_totals(record)
+        grouped[key] = merge(grouped[key], totals) if key in grouped else totals
+
+    rows = [{**dict(zip(KEY, key)), **totals} for key, totals in grouped.items()]
+    if rows:
+        upsert(rows)
+
+
+def upsert(rows):
+    """
+    Insert the aggregates of rows, or add their totals to the aggregates of
+    the same weeks. A single statement where the database has an upsert,
+    so two requests adding records to the same week do not overwrite each
+    other
+    """
+    table = RecordAggregate.__table__
+    dialect = db.session.get_bind().dialect.name
+    if dialect == "mysql":
+        # col = col + VALUES(col), GREATEST for the maxima
+        statement = mysql.insert(table).values(rows)
+        statement = statement.on_duplicate_key_update(
+            added_totals(table, statement.inserted, func.greatest)
+        )
+    elif dialect in ("postgresql", "sqlite"):
+        insert = postgresql.insert if dialect == "postgresql" else sqlite.insert
+        # The max function of SQLite takes several arguments like GREATEST
+        greatest = func.greatest if dialect == "postgresql" else func.max
+        statement = insert(table).values(rows)
+        statement = statement.on_conflict_do_update(
+            index_elements=list(KEY),
+            set_=added_totals(table, statement.excluded, greatest),
+        )
+    else:
+        replace_totals(rows)
+        return
+    db.session.execute(statement)
+
+
+def replace_totals(rows):
+    """
+    Add the totals of rows to the aggregates of the same weeks by deleting
+    and inserting them again, for the databases without an upsert. The
+    aggregates are locked while they are read, the other writers of the
+    week wait for the transaction
+    """
+    table = RecordAggregate.__table__
+    merged = []
+    for row in rows:
+        week = [table.c[column] == row[column] for column in KEY]
+        query = db.select(*(table.c[column] for column in TOTALS)).where(*week)
+        old = db.session.execute(query.with_for_update()).first()
+        if old is not None:
+            db.session.execute(db.delete(table).where(*week))
+            row = {**row, **merge(dict(zip(TOTALS, old)), row)}
+        merged.append(row)
+    db.session.execute(db.insert(table), merged)
+
+
+def added_totals(table, new, greatest):
+    """The SQL totals of an aggregate once the totals of a new row are added"""
+    return {
+        column: (
+            greatest(table.c[column], new[column])
+            if column in MAXIMA
+            else table.c[column] + new[column]
+        )
+        for column in TOTALS
+    }
+
+
+def refresh_weeks(keys):
+    """
+    Recompute the aggregates of some weeks from their records in the
+    current transaction, after records were updated or deleted
+    """
+    db.session.flush()
+    for key in set(keys):
+        user_id, exercise_id, custom_exercise_id, week = key
+        start = datetime.combine(week, time())
+        query = db.select(*totals_columns()).where(
+            Record.user_id == user_id,
+            Record.date >= start,
+            Record.date < start + timedelta(days=7),
+            (
+                Record.exercise_id == exercise_id
+                if exercise_id
+                else Record.exercise_id.is_(None)
+            ),
+            (
+                Record.custom_exercise_id == custom_exercise_id
+                if custom_exercise_id
+                else Record.custom_exercise_id.is_(None)
+            ),
+        )
+        row = db.session.execute(query).one()
+        aggregate = RecordAggregate.find_by(**dict(zip(KEY, key)))
+
+        if not row[0]:
+            if aggregate is not None:
+                db.session.delete(aggregate)
+            continue
+        totals = dict(zip(TOTALS, (value or 0 for value in row)))
+        if aggregate is None:
+            db.session.add(RecordAggregate(**dict(zip(KEY, key)), **totals))
+            continue
+        for column, value in totals.items():
+            setattr(aggregate, column, value)
+
+
+def rebuild_aggregates(user_id=None, batch_size=1000):
+    """
+    Recompute all the aggregates, or the aggregates of one user, from the
+    records. Return the number of aggregates written
+    """
+    query = db.delete(RecordAggregate)
+    if user_id:
+        query = query.where(RecordAggregate.user_id == user_id)
+    db.session.execute(query)
+
+    # The database groups by day, the days are added up into weeks here
+    day = func.date(Record.date)
+    exercise_id = func.coalesce(Record.exercise_id, 0)
+    custom_exercise_id = func.coalesce(Record.custom_exercise_id, 0)
+    query = db.select(
+        Record.user_id, exercise_id, custom_exercise_id, day, *totals_columns()
+    ).group_by(Record.user_id, exercise_id, custom_exercise_id, day)
+    if user_id:
+        query = query.where(Record.user_id == user_id)
+
+    grouped = {}
+    for row in db.session.execute(query):
+        # MySQL returns dates, SQLite returns strings
+        week = week_of(date.fromisoformat(str(row[3])))
+        key = (row[0], row[1], row[2], week)
+        totals = dict(zip(TOTALS, (value or 0 for value in row[4:])))
+        grouped[key] = merge(grouped[key], totals) if key in grouped else totals
+
+    rows = [{**dict(zip(KEY, key)), **totals} for key, totals in grouped.items()]
+    for start in range(0, len(rows), batch_size):
+        db.session.execute(db.insert(RecordAggregate), rows[start : start + batch_size])
+    return len(rows)
+
+
+records_cli = AppGroup("records", help="Manage the records.")
+
+
+@records_cli.command("rebuild-aggregates")
+@click.option("--user-id", type=int, default=None, help="Only rebuild this user.")
+def rebuild_aggregates_command(user_id):
+    """Recompute the weekly aggregates of the records"""
+    started_at = perf_counter()
+    count = rebuild_aggregates(user_id)
+    db.session.commit()
+    click.echo(
+        f"{count} weekly aggregates rebuilt in {perf_counter() - started_at:.3f}s"
+    )
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+    Operations on the models shared by the blueprints, called in the process
+    instead of through the HTTP API. A service changes the session of the
+    request without committing it, the caller commits once so that a whole
+    flow runs in a single transaction, e.g. with unit_of_work. A service
+    refuses an operation with a ServiceError, turned into the HTTP error
+    of its status by the handlers of errors.py
+    """
+
+
+from contextlib import contextmanager
+from models.base import db
+
+
+class ServiceError(Exception):
+    """An operation refused by a service, with the reason given to the client"""
+
+    status = 500
+    description = "Internal Server Error"
+
+    def __init__(self, description=None):
+        if description:
+            self.description = description
+        super().__init__(self.description)
+
+
+class ValidationError(ServiceError):
+    status = 400
+    description = "Bad Request"
+
+
+class ForbiddenError(ServiceError):
+    status = 403
+    description = "Forbidden: User does not have access to this resource"
+
+
+class NotFoundError(ServiceError):
+    status = 404
+    description = "Resource not found"
+
+
+class ConflictError(ServiceError):
+    status = 409
+    description = "Conflict"
+
+
+@contextmanager
+def unit_of_work():
+    """
+    Commit the changes made in the block at once, or roll them all back
+    when the block raises, e.g. a ServiceError
+    """
+    try:
+        yield db.session
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+
+def require_fields(data, fields):
+    """Raise a ValidationError when one of the fields is missing"""
+    for field in fields:
+        if field not in data:
+            raise ValidationError(f"Bad Request: Missing {field}")
+
+
+def update_fields(obj, data, allowed_keys):
+    """Set the fields of the data on an object, only the allowed ones"""
+    for key in data:
+        if key not in allowed_keys:
+            raise ValidationError(f"Bad Request: Invalid key {key}")
+    for key, value in data.items():
+        setattr(obj, key, value)
+    return obj
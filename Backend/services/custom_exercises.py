@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+    The custom exercises service, every change bumps the version of the
+    search index of the custom exercises of the user
+    """
+
+
+import logging
+from models.base import db
+from models.custom_exercise import CustomExercise
+from decorators import has_access
+from storage import get_storage
+from media_jobs import delete_variants
+from record_aggregates import refresh_weeks, unlinked_keys
+from exercise_catalog import custom_exercise_indexes
+from services import (
+    ConflictError,
+    ForbiddenError,
+    NotFoundError,
+    ServiceError,
+    require_fields,
+    update_fields,
+)
+from services.users import get_accessible_user
+
+
+logger = logging.getLogger(__name__)
+
+REQUIRED_FIELDS = ("title", "category", "muscle_group")
+UPDATABLE_FIELDS = (
+    "title",
+    "description",
+    "category",
+    "muscle_group",
+    "equipment",
+    "media_file_url",
+)
+
+
+def get_custom_exercise_by_title(title):
+    """Return a custom exercise of a title the logged-in user has access to"""
+    query = db.select(CustomExercise).filter_by(title=title)
+    custom_exercise = db.session.execute(query).scalars().first()
+    if custom_exercise is None:
+        raise NotFoundError("Custom Exercise not found")
+    if not has_access(custom_exercise.user_id):
+        raise ForbiddenError()
+    return custom_exercise
+
+
+def get_user_custom_exercise(user_id, custom_exercise_id):
+    """Return a custom exercise of a user the logged-in user has access to"""
+    get_accessible_user(user_id)
+    custom_exercise = CustomExercise.find_by(id=custom_exercise_id, user_id=user_id)
+    if custom_exercise is None:
+        raise NotFoundError("Custom Exercise not found")
+    return custom_exercise
+
+
+def create_custom_exercise(user_id, data):
+    """Create a custom exercise, its title must be free among the user's"""
+    require_fields(data, REQUIRED_FIELDS)
+    query = db.select(CustomExercise.id).where(
+        CustomExercise.title == data["title"], CustomExercise.user_id == user_id
+    )
+    if db.session.execute(query).first():
+        raise ConflictError("Conflict: Custom Exercise already exists")
+
+    custom_exercise = CustomExercise(**data, user_id=user_id)
+    db.session.add(custom_exercise)
+    custom_exercise_indexes.bump(user_id)
+    db.session.flush()
+    return custom_exercise
+
+
+def update_custom_exercise(custom_exercise, data):
+    update_fields(custom_exercise, data, UPDATABLE_FIELDS)
+    custom_exercise_indexes.bump(custom_exercise.user_id)
+    return custom_exercise
+
+
+def delete_media_file(custom_exercise):
+    """
+    Delete the media file of a custom exercise and its variants from the
+    media storage, return the result and the message of the storage
+    """
+    try:
+        result, message = get_storage().delete(custom_exercise.media_file_url)
+        logger.info("Delete %s: %s %s", custom_exercise.media_file_url, result, message)
+        delete_variants(custom_exercise.media_variants)
+    except Exception as e:
+        raise ServiceError(f"Internal Server Error: {e}")
+    custom_exercise.media_file_url = None
+    custom_exercise.media_variants = None
+    custom_exercise_indexes.bump(custom_exercise.user_id)
+    return result, message
+
+
+def set_media_file_url(custom_exercise, media_file_url, replace=False):
+    """
+    Save the url of a media file stored outside of the media storage, the
+    variants of the former file are deleted, and the file itself when it
+    is replaced
+    """
+    if replace and custom_exercise.media_file_url:
+        delete_media_file(custom_exercise)
+    else:
+        delete_variants(custom_exercise.media_variants)
+        custom_exercise.media_variants = None
+        custom_exercise_indexes.bump(custom_exercise.user_id)
+    custom_exercise.media_file_url = media_file_url
+    return custom_exercise
+
+
+def delete_custom_exercise(custom_exercise):
+    """Delete a custom exercise and its media file"""
+    if custom_exercise.media_file_url:
+        delete_media_file(custom_exercise)
+    # The records of the exercise lose it, their weeks move to the aggregates
+    # without an exercise
+    keys = unlinked_keys(custom_exercise.records, "custom_exercise_id")
+    db.session.delete(custom_exercise)
+    refresh_weeks(keys)
+    custom_exercise_indexes.bump(custom_exercise.user_id)
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""
+    The days service
+    """
+
+
+from models.base import db
+from models.day import Day
+from models.plan import Plan
+from decorators import has_access
+from services import ForbiddenError, NotFoundError, require_fields, update_fields
+
+
+REQUIRED_FIELDS = ("title",)
+UPDATABLE_FIELDS = ("title", "session_duration")
+
+
+def get_accessible_plan(plan_id):
+    """Return a plan the logged-in user has access to"""
+    plan = db.session.get(Plan, plan_id)
+    if not plan:
+        raise NotFoundError("Plan not found")
+    if not has_access(plan.user_id):
+        raise ForbiddenError()
+    return plan
+
+
+def get_plan_day(plan_id, day_id):
+    """Return a day of a plan the logged-in user has access to"""
+    get_accessible_plan(plan_id)
+    day = Day.find_by(id=day_id, plan_id=plan_id)
+    if not day:
+        raise NotFoundError("Day not found")
+    return day
+
+
+def create_day(plan_id, data):
+    require_fields(data, REQUIRED_FIELDS)
+    day = Day(**data, plan_id=plan_id)
+    db.session.add(day)
+    db.session.flush()
+    return day
+
+
+def update_day(day, data):
+    return update_fields(day, data, UPDATABLE_FIELDS)
+
+
+def delete_day(day):
+    db.session.delete(day)
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+    The exercises service, every change bumps the version of the exercise
+    catalog in the same transaction
+    """
+
+
+import logging
+from models.base import db
+from models.exercise import Exercise
+from storage import get_storage
+from media_jobs import delete_variants
+from record_aggregates import refresh_weeks, unlinked_keys
+from exercise_catalog import exercise_catalog
+from services import (
+    ConflictError,
+    NotFoundError,
+    ServiceError,
+    require_fields,
+    update_fields,
+)
+
+
+logger = logging.getLogger(__name__)
+
+REQUIRED_FIELDS = ("title", "category", "muscle_group")
+UPDATABLE_FIELDS = (
+    "title",
+    "description",
+    "category",
+    "muscle_group",
+    "equipment",
+    "media_file_url",
+)
+
+
+def get_exercise(exercise_id):
+    exercise = db.session.get(Exercise, exercise_id)
+    if exercise is None:
+        raise NotFoundError("Exercise not found")
+    return exercise
+
+
+def create_exercise(data):
+    """Create an exercise, its title must be free"""
+    require_fields(data, REQUIRED_FIELDS)
+    query = db.select(Exercise.id).where(Exercise.title == data["title"])
+    if db.session.execute(query).first():
+        raise ConflictError("Conflict: Exercise already exists")
+
+    exercise = Exercise(**data)
+    db.session.add(exercise)
+    exercise_catalog.bump()
+    db.session.flush()
+    return exercise
+
+
+def update_exercise(exercise, data):
+    update_fields(exercise, data, UPDATABLE_FIELDS)
+    exercise_catalog.bump()
+    return exercise
+
+
+def delete_media_file(exercise):
+    """
+    Delete the media file of an exercise and its variants from the media
+    storage, return the result and the message of the storage
+    """
+    try:
+        result, message = get_storage().delete(exercise.media_file_url)
+        logger.info("Delete %s: %s %s", exercise.media_file_url, result, message)
+        delete_variants(exercise.media_variants)
+    except Exception as e:
+        raise ServiceError(f"Internal Server Error: {e}")
+    exercise.media_file_url = None
+    exercise.media_variants = None
+    exercise_catalog.bump()
+    return result, message
+
+
+def set_media_file_url(exercise, media_file_url, replace=False):
+    """
+    Save the url of a media file stored outside of the media storage, the
+    variants of the former file are deleted, and the file itself when it
+    is replaced
+    """
+    if replace and exercise.media_file_url:
+        delete_media_file(exercise)
+    else:
+        delete_variants(exercise.media_variants)
+        exercise.media_variants = None
+        exercise_catalog.bump()
+    exercise.media_file_url = media_file_url
+    return exercise
+
+
+def delete_exercise(exercise):
+    # The records of the exercise lose it, their weeks move to the aggregates
+    # without an exercise
+    keys = unlinked_keys(exercise.records, "exercise_id")
+    db.session.delete(exercise)
+    refresh_weeks(keys)
+    exercise_catalog.bump()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+    The plans service
+    """
+
+
+from sqlalchemy.inspection import inspect
+from models.base import db
+from models.plan import Plan
+from services import NotFoundError, require_fields, update_fields
+from services.users import get_accessible_user
+
+
+REQUIRED_FIELDS = (
+    "goal",
+    "current_weight",
+    "target_weight",
+    "duration",
+    "days_in_week",
+)
+UPDATABLE_FIELDS = ("goal", "current_weight", "target_weight", "duration")
+
+
+def get_user_plan(user_id, plan_id, depth=0):
+    """
+    Return a plan of a user the logged-in user has access to, with its
+    tree loaded down to depth
+    """
+    get_accessible_user(user_id)
+    if depth:
+        plan = Plan.find_tree(plan_id, user_id, depth)
+    else:
+        plan = Plan.find_by(id=plan_id, user_id=user_id)
+    if not plan:
+        raise NotFoundError("Plan not found")
+    return plan
+
+
+def create_plan(user_id, data):
+    require_fields(data, REQUIRED_FIELDS)
+    plan = Plan(**data, user_id=user_id)
+    db.session.add(plan)
+    db.session.flush()
+    return plan
+
+
+def update_plan(plan, data):
+    return update_fields(plan, data, UPDATABLE_FIELDS)
+
+
+def delete_plan(plan):
+    db.session.delete(plan)
+
+
+def copy_columns(obj, exclude=()):
+    """A new object of the model of obj with the same columns but its keys"""
+    mapper = inspect(type(obj))
+    keys = {column.key for column in mapper.primary_key} | set(exclude)
+    return type(obj)(
+        **{
+            attr.key: getattr(obj, attr.key)
+            for attr in mapper.column_attrs
+            if attr.key not in keys
+        }
+    )
+
+
+def clone_plan(plan, user_id=None, goal=None):
+    """
+    Copy a plan loaded with its days and workout sessions, e.g. by
+    get_user_plan with depth 2, for a user, by default its owner
+    """
+    new_plan = copy_columns(plan, exclude=("user_id", "created_at"))
+    new_plan.user_id = user_id or plan.user_id
+    if goal:
+        new_plan.goal = goal
+    for day in sorted(plan.days, key=lambda day: day.id):
+        new_day = copy_columns(day, exclude=("plan_id",))
+        for session in sorted(day.workout_sessions, key=lambda session: session.id):
+            new_day.workout_sessions.append(copy_columns(session, exclude=("day_id",)))
+        new_plan.days.append(new_day)
+    db.session.add(new_plan)
+    db.session.flush()
+    return new_plan
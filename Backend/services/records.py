@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+    The records service, the weekly totals of the records are kept up to
+    date in the same transaction
+    """
+
+
+from models.base import db
+from models.record import Record
+from models.exercise import Exercise
+from models.custom_exercise import CustomExercise
+from record_aggregates import add_records, record_key, refresh_weeks
+from services import NotFoundError, require_fields, update_fields
+from services.users import get_accessible_user
+from services.workout_sessions import check_exercises
+
+
+REQUIRED_FIELDS = (
+    "difficulty",
+    "sets",
+    "reps",
+    "rest",
+    "user_weight",
+    "location",
+)
+UPDATABLE_FIELDS = REQUIRED_FIELDS + (
+    "exercise_id",
+    "custom_exercise_id",
+    "weight_lifted",
+    "notes",
+)
+
+
+def get_user_record(user_id, record_id):
+    """Return a record of a user the logged-in user has access to"""
+    get_accessible_user(user_id)
+    record = Record.find_by(id=record_id, user_id=user_id)
+    if record is None:
+        raise NotFoundError("Record not found")
+    return record
+
+
+def create_record(user_id, data):
+    require_fields(data, REQUIRED_FIELDS)
+    check_exercises(data)
+    record = Record(**data, user_id=user_id)
+    db.session.add(record)
+    add_records([record])
+    db.session.flush()
+    return record
+
+
+def check_batch_item(data, exercise_ids, custom_exercise_ids):
+    """
+    Validate one record of a batch, return the status code and the error
+    of the record, the error is None for a valid record
+    """
+    if not isinstance(data, dict):
+        return 400, "Bad Request: Not a JSON object"
+    for field in REQUIRED_FIELDS:
+        if field not in data:
+            return 400, f"Bad Request: Missing {field}"
+    for key in data:
+        if key not in UPDATABLE_FIELDS:
+            return 400, f"Bad Request: Invalid key {key}"
+
+    for key, ids, name in [
+        ("exercise_id", exercise_ids, "Exercise"),
+        ("custom_exercise_id", custom_exercise_ids, "Custom exercise"),
+    ]:
+        value = data.get(key, None)
+        if value is None:
+            continue
+        if not isinstance(value, int):
+            return 400, f"Bad Request: Invalid {key}"
+        if value not in ids:
+            return 404, f"{name} not found"
+    return 201, None
+
+
+def create_records(user_id, items):
+    """
+    Create the valid records of a batch, every record is validated on its
+    own. Return the result of each record in the order of the items and
+    the number of records created
+    """
+    # Resolve all the referenced exercises with one query each
+    dicts = [item for item in items if isinstance(item, dict)]
+    exercise_ids = {
+        item["exercise_id"]
+        for item in dicts
+        if isinstance(item.get("exercise_id"), int)
+    }
+    custom_exercise_ids = {
+        item["custom_exercise_id"]
+        for item in dicts
+        if isinstance(item.get("custom_exercise_id"), int)
+    }
+    if exercise_ids:
+        query = db.select(Exercise.id).where(Exercise.id.in_(exercise_ids))
+        exercise_ids = set(db.session.execute(query).scalars())
+    if custom_exercise_ids:
+        query = db.select(CustomExercise.id).where(
+            CustomExercise.id.in_(custom_exercise_ids),
+            CustomExercise.user_id == user_id,
+        )
+        custom_exercise_ids = set(db.session.execute(query).scalars())
+
+    results = []
+    records = []
+    for index, item in enumerate(items):
+        status, error = check_batch_item(item, exercise_ids, custom_exercise_ids)
+        if error is None:
+            try:
+                records.append((index, Record(**item, user_id=user_id)))
+            except (TypeError, ValueError):
+                status, error = 400, "Bad Request: Invalid value"
+        results.append({"index": index, "status": status, "error": error})
+
+    db.session.add_all([record for _, record in records])
+    db.session.flush()
+    for index, record in records:
+        results[index] = {"index": index, "status": 201, "record": record.to_dict()}
+    add_records([record for _, record in records])
+    return results, len(records)
+
+
+def update_record(record, data):
+    """Update a record, it may move to the totals of another week or exercise"""
+    old_key = record_key(record)
+    check_exercises(data)
+    update_fields(record, data, UPDATABLE_FIELDS)
+    refresh_weeks([old_key, record_key(record)])
+    return record
+
+
+def delete_record(record):
+    """Delete a record and remove it from the totals of its week"""
+    key = record_key(record)
+    db.session.delete(record)
+    refresh_weeks([key])
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+    The roles service
+    """
+
+
+from sqlalchemy.exc import IntegrityError
+from models.base import db
+from models.role import Role
+from services import ConflictError
+
+
+def get_or_create_role(name):
+    """
+    Return the role of a name, created when it does not exist, and whether
+    it was created
+    """
+    role = Role.find_role_by_name(name)
+    if role:
+        return role, False
+    try:
+        # A savepoint, the role may be created by another request meanwhile
+        with db.session.begin_nested():
+            role = Role(name=name)
+            db.session.add(role)
+    except IntegrityError:
+        return Role.find_role_by_name(name), False
+    return role, True
+
+
+def bump_users_roles_version(role):
+    """
+    The role name is part of the token claims of its users, invalidate
+    them and return the users to forget once committed
+    """
+    users = list(role.users)
+    for user in users:
+        user.bump_roles_version()
+    return users
+
+
+def rename_role(role, name):
+    if Role.find_role_by_name(name):
+        raise ConflictError("Role already exists")
+    role.name = name
+    return bump_users_roles_version(role)
+
+
+def delete_role(role):
+    users = bump_users_roles_version(role)
+    db.session.delete(role)
+    return users
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+    The users service
+    """
+
+
+from models.base import db
+from models.user import User
+from models.role import Role
+from decorators import has_access
+from storage import get_storage
+from media_jobs import delete_variants
+from services import (
+    ConflictError,
+    ForbiddenError,
+    NotFoundError,
+    ServiceError,
+    ValidationError,
+    require_fields,
+)
+
+
+REQUIRED_FIELDS = ("first_name", "last_name", "email", "password")
+UPDATABLE_FIELDS = ("first_name", "last_name", "old_password", "new_password")
+
+
+def get_accessible_user(user_id, description=None):
+    """Return a user the logged-in user has access to"""
+    user = db.session.get(User, user_id)
+    if not user:
+        raise NotFoundError("User not found")
+    if not has_access(user.id):
+        raise ForbiddenError(description)
+    return user
+
+
+def get_user(user_id):
+    """Return a user, whatever the logged-in user"""
+    user = db.session.get(User, user_id)
+    if not user:
+        raise NotFoundError("User not found")
+    return user
+
+
+def get_role(role_name):
+    role = Role.find_role_by_name(role_name)
+    if not role:
+        raise NotFoundError("Role not found")
+    return role
+
+
+def create_user(data):
+    """Create a user from the fields of a request, the email must be free"""
+    require_fields(data, REQUIRED_FIELDS)
+
+    if User.find_user_by_email(data["email"]):
+        raise ConflictError("Conflict: Email already in use")
+
+    user = User(**data)
+    db.session.add(user)
+    db.session.flush()
+    return user
+
+
+def assign_role(user, role):
+    """
+    Give a role to a user, return False when the user already has it.
+    Forget the cached roles version of the user once committed
+    """
+    if role in user.roles:
+        return False
+    user.roles.append(role)
+    user.bump_roles_version()
+    return True
+
+
+def remove_role(user, role):
+    """Take a role from a user, return False when the user does not have it"""
+    if role not in user.roles:
+        return False
+    user.roles.remove(role)
+    user.bump_roles_version()
+    return True
+
+
+def update_user(user, data):
+    """Update the names of a user, the password only with the old one"""
+    for key, value in data.items():
+        if key not in UPDATABLE_FIELDS:
+            raise ValidationError(f"Bad Request: Invalid key {key}")
+        # Verify old password when changing password
+        if key == "new_password":
+            old_password = data.get("old_password")
+            if not old_password:
+                raise ValidationError("Bad Request: Missing old password")
+            if not user.check_password(old_password):
+                raise ValidationError("Bad Request: Incorrect old password")
+            key = "password"
+        setattr(user, key, value)
+    return user
+
+
+def delete_user(user):
+    """Delete a user and the folder of the user in the media storage"""
+    try:
+        result, message = get_storage().delete_prefix(f"Users/user_{user.id}")
+    except Exception as e:
+        raise ServiceError(f"Internal Server Error: {e}")
+    if not result:
+        raise ServiceError(f"Internal Server Error: {message}")
+    db.session.delete(user)
+
+
+def delete_profile_picture(user):
+    """
+    Delete the profile picture of a user and its variants from the media
+    storage, return the message of the storage
+    """
+    if not user.profile_picture:
+        raise NotFoundError("Profile picture not found")
+    try:
+        result, message = get_storage().delete(user.profile_picture)
+        if result is True:
+            delete_variants(user.profile_picture_variants)
+    except Exception as e:
+        raise ServiceError(f"Internal Server Error: {e}")
+    if result is not True:
+        raise ServiceError(f"Internal Server Error: {message}")
+    user.profile_picture = None
+    user.profile_picture_variants = None
+    return message
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+    The workout sessions service
+    """
+
+
+from sqlalchemy.orm import joinedload
+from models.base import db
+from models.day import Day
+from models.workout_session import WorkoutSession
+from models.exercise import Exercise
+from models.custom_exercise import CustomExercise
+from decorators import has_access
+from services import ForbiddenError, NotFoundError, require_fields, update_fields
+
+
+REQUIRED_FIELDS = ("sets", "reps", "rest")
+UPDATABLE_FIELDS = (
+    "sets",
+    "reps",
+    "rest",
+    "weight_lifted",
+    "exercise_id",
+    "custom_exercise_id",
+)
+
+
+def get_accessible_day(day_id):
+    """
+    Return a day the logged-in user has access to, its plan is loaded in
+    the same query to check the owner
+    """
+    query = db.select(Day).options(joinedload(Day.plan)).filter_by(id=day_id)
+    day = db.session.execute(query).scalar_one_or_none()
+    if day is None:
+        raise NotFoundError("Day not found")
+    if not has_access(day.plan.user_id):
+        raise ForbiddenError()
+    return day
+
+
+def get_day_workout_session(day_id, workout_session_id):
+    """Return a workout session of a day the logged-in user has access to"""
+    get_accessible_day(day_id)
+    workout_session = WorkoutSession.find_by(id=workout_session_id, day_id=day_id)
+    if workout_session is None:
+        raise NotFoundError("Workout Session not found")
+    return workout_session
+
+
+def check_exercises(data):
+    """Raise a NotFoundError when an exercise of the data does not exist"""
+    if data.get("exercise_id") is not None:
+        if db.session.get(Exercise, data["exercise_id"]) is None:
+            raise NotFoundError("Exercise not found")
+    if data.get("custom_exercise_id") is not None:
+        if db.session.get(CustomExercise, data["custom_exercise_id"]) is None:
+            raise NotFoundError("Custom exercise not found")
+
+
+def create_workout_session(day_id, data):
+    require_fields(data, REQUIRED_FIELDS)
+    check_exercises(data)
+    workout_session = WorkoutSession(**data, day_id=day_id)
+    db.session.add(workout_session)
+    db.session.flush()
+    return workout_session
+
+
+def update_workout_session(workout_session, data):
+    check_exercises(data)
+    return update_fields(workout_session, data, UPDATABLE_FIELDS)
+
+
+def delete_workout_session(workout_session):
+    db.session.delete(workout_session)
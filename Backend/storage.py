@@ -0,0 +1,348 @@
+#!/usr/bin/env python3
+"""
+    Storage of the media files behind one interface, used by the exercise,
+    custom exercise and profile picture endpoints. A file is stored under a
+    key such as "Users/user_5/exercises/file_1_squat.png" and is identified
+    by the url saved in the database. The backend is selected by the
+    MEDIA_STORAGE setting: "drive" keeps the files in Google Drive, "local"
+    keeps them on the disk of the server, named by the sha256 of their content
+    """
+
+
+import hashlib
+import mimetypes
+import os
+import re
+import shutil
+import tempfile
+from datetime import datetime
+from threading import Lock
+from urllib.parse import quote, unquote, urlparse
+from config import setting
+from local_db import create_database, connect
+from google_api import get_drive
+
+
+time_format = "%Y-%m-%d %H:%M:%S"
+
+DIGEST_RE = re.compile(r"^[0-9a-f]{64}$")
+
+
+class StorageError(Exception):
+    """A file that cannot be stored, the message is reported to the client"""
+
+    pass
+
+
+def split_key(key):
+    """Return the folders and the file name of a key"""
+    parts = [part for part in key.split("/") if part]
+    return parts[:-1], parts[-1]
+
+
+def content_type(key):
+    """Guess the content type of a file from its name, None if unknown"""
+    return mimetypes.guess_type(split_key(key)[1])[0]
+
+
+class Storage:
+    """The interface of the storage backends"""
+
+    def put(self, key, file_path, digest=None):
+        """
+        Store the file at file_path under key, return its url. digest is the
+        sha256 of the file when it is already known, the file may be moved
+        """
+        raise NotImplementedError
+
+    def get(self, key):
+        """Open the file stored under key for reading, None if there is none"""
+        raise NotImplementedError
+
+    def delete(self, url):
+        """Delete the file of a url, return (result, message)"""
+        raise NotImplementedError
+
+    def delete_prefix(self, prefix):
+        """Delete all the files under a folder, return (result, message)"""
+        raise NotImplementedError
+
+    def url(self, key):
+        """Return the url of the file stored under key, None if there is none"""
+        stat = self.stat(key)
+        return stat["url"] if stat else None
+
+    def stat(self, key):
+        """Return the url and what is known of the file under key, or None"""
+        raise NotImplementedError
+
+
+class DriveStorage(Storage):
+    """The files in Google Drive, the folders of a key start at the app folder"""
+
+    @property
+    def drive(self):
+        return get_drive()
+
+    def folder_id(self, folders, create=False):
+        """Return the Drive id of a list of folders, None if one is missing"""
+        drive = self.drive
+        folder_id = drive.root_folder_id
+        for folder in folders:
+            if folder_id is None:
+                return None
+            if create:
+                folder_id = drive.ensure_folder(folder, folder_id)
+            else:
+                folder_id = drive.find_folder_id(folder, folder_id)
+        return folder_id
+
+    def put(self, key, file_path, digest=None):
+        folders, file_name = split_key(key)
+        folder_id = self.folder_id(folders, create=True)
+        if os.path.basename(file_path) != file_name:
+            # Drive names the file after its path
+            directory = tempfile.mkdtemp()
+            renamed = os.path.join(directory, file_name)
+            shutil.copyfile(file_path, renamed)
+            try:
+                return self.put_file(renamed, folder_id)
+            finally:
+                shutil.rmtree(directory, ignore_errors=True)
+        return self.put_file(file_path, folder_id)
+
+    def put_file(self, file_path, folder_id):
+        _, supported_file_type, web_content_link = self.drive.upload_file(
+            file_path, folder_id
+        )
+        if not supported_file_type:
+            raise StorageError("Unsupported file type")
+        if not web_content_link:
+            raise RuntimeError("An error occurred while uploading the file")
+        return web_content_link.split("&")[0]
+
+    def get(self, key):
+        # Drive serves its files from their url
+        return None
+
+    def delete(self, url):
+        return self.drive.delete_file(webContentLink=url)
+
+    def delete_prefix(self, prefix):
+        folder_id = self.folder_id([part for part in prefix.split("/") if part])
+        if not folder_id:
+            return True, "No files to delete"
+        return self.drive.delete_folder(folder_id=folder_id)
+
+    def stat(self, key):
+        folders, file_name = split_key(key)
+        folder_id = self.folder_id(folders)
+        if not folder_id:
+            return None
+        file_id, web_content_link = self.drive.find_file_id(file_name, folder_id)
+        if not file_id:
+            return None
+        return {
+            "key": key,
+            "url": web_content_link.split("&")[0],
+            "content_type": content_type(key),
+        }
+
+
+class LocalStorage(Storage):
+    """
+    The files on the local disk, content-addressed: each distinct content is
+    written once as a blob named by its sha256, and an index maps the keys to
+    the blobs. The url of a file contains its digest, so it never changes
+    while the file exists and can be cached forever by the clients
+    """
+
+    def __init__(self, root, base_url=""):
+        self.root = os.path.abspath(root)
+        self.base_url = base_url.rstrip("/")
+        self.index_path = os.path.join(root, "index.sqlite3")
+        create_database(
+            self.index_path,
+            "CREATE TABLE IF NOT EXISTS media_files ("
+            "key TEXT PRIMARY KEY, digest TEXT NOT NULL, size INTEGER NOT NULL,"
+            " content_type TEXT NOT NULL, created_at TEXT NOT NULL);"
+            "CREATE INDEX IF NOT EXISTS media_files_digest"
+            " ON media_files (digest);",
+        )
+
+    def blob_path(self, digest):
+        """Return the path of a blob, None for an invalid digest"""
+        if not DIGEST_RE.match(digest):
+            return None
+        return os.path.join(self.root, "blobs", digest[:2], digest)
+
+    def url_of(self, digest, key):
+        return f"{self.base_url}/api/v1/media/{digest}/{quote(key)}"
+
+    def parse_url(self, url):
+        """Return the (digest, key) of a url of this storage, or (None, None)"""
+        match = re.search(r"/api/v1/media/([0-9a-f]{64})/(.+)$", urlparse(url).path)
+        if not match:
+            return None, None
+        return match.group(1), unquote(match.group(2))
+
+    def put(self, key, file_path, digest=None):
+        media_type = content_type(key)
+        if not media_type:
+            raise StorageError("Unsupported file type")
+
+        if not digest:
+            sha256 = hashlib.sha256()
+            with open(file_path, "rb") as f:
+                for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                    sha256.update(chunk)
+            digest = sha256.hexdigest()
+
+        path = self.blob_path(digest)
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        temporary = None
+        if os.stat(file_path).st_dev != os.stat(directory).st_dev:
+            # The staging directory is on another file system, the file is
+            # copied next to the blobs first so that it is only renamed below
+            fd, temporary = tempfile.mkstemp(dir=directory)
+            os.close(fd)
+            shutil.copyfile(file_path, temporary)
+
+        try:
+            with connect(self.index_path) as connection:
+                # Lock the index until the blob is in place: a concurrent
+                # collect of the digest either removed the blob before, and it
+                # is written again, or finds the key and keeps the blob
+                connection.execute("BEGIN IMMEDIATE")
+                previous = connection.execute(
+                    "SELECT digest FROM media_files WHERE key = ?", (key,)
+                ).fetchone()
+                connection.execute(
+                    "INSERT OR REPLACE INTO media_files"
+                    " (key, digest, size, content_type, created_at)"
+                    " VALUES (?, ?, ?, ?, ?)",
+                    (
+                        key,
+                        digest,
+                        os.path.getsize(file_path),
+                        media_type,
+                        datetime.utcnow().strftime(time_format),
+                    ),
+                )
+                # An identical content is stored once
+                if not os.path.exists(path):
+                    os.replace(temporary or file_path, path)
+        finally:
+            if temporary and os.path.exists(temporary):
+                os.remove(temporary)
+
+        if previous and previous["digest"] != digest:
+            self.collect(previous["digest"])
+        return self.url_of(digest, key)
+
+    def get(self, key):
+        stat = self.stat(key)
+        if not stat:
+            return None
+        return open(self.blob_path(stat["digest"]), "rb")
+
+    def delete(self, url):
+        digest, key = self.parse_url(url)
+        if not digest:
+            return False, "File not found"
+        with connect(self.index_path) as connection:
+            cursor = connection.execute(
+                "DELETE FROM media_files WHERE key = ? AND digest = ?", (key, digest)
+            )
+        self.collect(digest)
+        if cursor.rowcount == 0:
+            return False, "File not found"
+        return True, "File deleted successfully"
+
+    def delete_prefix(self, prefix):
+        pattern = prefix.rstrip("/").replace("%", r"\%").replace("_", r"\_") + "/%"
+        with connect(self.index_path) as connection:
+            digests = [
+                row["digest"]
+                for row in connection.execute(
+                    "SELECT DISTINCT digest FROM media_files"
+                    " WHERE key LIKE ? ESCAPE '\\'",
+                    (pattern,),
+                )
+            ]
+            connection.execute(
+                "DELETE FROM media_files WHERE key LIKE ? ESCAPE '\\'", (pattern,)
+            )
+        for digest in digests:
+            self.collect(digest)
+        return True, "Folder deleted successfully"
+
+    def collect(self, digest):
+        """Remove a blob that no key refers to anymore"""
+        with connect(self.index_path) as connection:
+            # Lock the index until the blob is removed, a put of the digest
+            # must not add its key and find the blob about to be removed
+            connection.execute("BEGIN IMMEDIATE")
+            used = connection.execute(
+                "SELECT 1 FROM media_files WHERE digest = ? LIMIT 1", (digest,)
+            ).fetchone()
+            if not used:
+                try:
+                    os.remove(self.blob_path(digest))
+                except FileNotFoundError:
+                    pass
+
+    def stat(self, key):
+        with connect(self.index_path) as connection:
+            row = connection.execute(
+                "SELECT * FROM media_files WHERE key = ?", (key,)
+            ).fetchone()
+        if not row:
+            return None
+        return {
+            "key": key,
+            "url": self.url_of(row["digest"], key),
+            "digest": row["digest"],
+            "size": row["size"],
+            "content_type": row["content_type"],
+            "created_at": row["created_at"],
+        }
+
+    def lookup(self, digest, key):
+        """Return the path and content type of a stored file, or (None, None)"""
+        with connect(self.index_path) as connection:
+            row = connection.execute(
+                "SELECT content_type FROM media_files WHERE key = ? AND digest = ?",
+                (key, digest),
+            ).fetchone()
+        path = self.blob_path(digest)
+        if not row or not os.path.exists(path):
+            return None, None
+        return path, row["content_type"]
+
+
+def local_storage():
+    return LocalStorage(setting("MEDIA_STORAGE_DIR"), setting("MEDIA_BASE_URL"))
+
+
+# Storage backend name -> factory, selected by the MEDIA_STORAGE setting
+STORAGE_BACKENDS = {"drive": DriveStorage, "local": local_storage}
+
+_storage = None
+_storage_lock = Lock()
+
+
+def register_storage_backend(name, factory):
+    """Make a storage backend available to the MEDIA_STORAGE setting"""
+    STORAGE_BACKENDS[name] = factory
+
+
+def get_storage():
+    """Return the media storage shared by the whole process"""
+    global _storage
+    if _storage is None:
+        with _storage_lock:
+            if _storage is None:
+                _storage = STORAGE_BACKENDS[setting("MEDIA_STORAGE")]()
+    return _storage
@@ -0,0 +1,144 @@
+"""
+    Tests of the exercises search, its latency is measured on the exercises
+    dataset of the repository. Run them from the Backend directory:
+    python -m pytest -q tests
+    """
+
+import csv
+import gc
+import os
+import time
+import pytest
+from flask import Flask
+from exercise_catalog import custom_exercise_indexes
+from exercise_import import parse_row
+from exercise_search import SearchIndex, search_exercises
+from models.base import db
+from models.user import User  # noqa: F401, the custom exercises reference the users
+from models.role import Role  # noqa: F401
+from models.plan import Plan  # noqa: F401
+from models.custom_exercise import CustomExercise
+from models.cache_version import CacheVersion
+from services import custom_exercises as custom_exercises_service
+
+
+DATASET = os.path.join(
+    os.path.dirname(__file__), "..", "..", "exercises_data", "newExercisesDataset.csv"
+)
+
+# p99 of a search of the whole catalog, in milliseconds
+SEARCH_P99_MS = 10
+
+QUERIES = [
+    ("press", {}),
+    ("bench press", {}),
+    ("bnch prss", {}),
+    ("dumbbell curl", {}),
+    ("the exercise muscle", {}),
+    ("pull up", {}),
+    ("abdominal crunch hold", {}),
+    ("kettlebell swing", {}),
+    ("hamstring stretch", {}),
+    ("plank", {"equipment": "body only"}),
+    ("", {"category": "strength"}),
+    ("", {"muscle_group": "chest", "equipment": "dumbbell"}),
+]
+
+
+@pytest.fixture(scope="module")
+def catalog_index():
+    with open(DATASET, encoding="utf-8-sig", newline="") as lines:
+        rows = [parse_row(row)[0] for row in csv.DictReader(lines)]
+    return SearchIndex(
+        (key, dict(values, id=key)) for key, values in enumerate(rows, 1) if values
+    )
+
+
+def test_search_p99(catalog_index):
+    custom_index = SearchIndex(
+        (key, {"title": f"Cable curl {key}", "category": "Strength"})
+        for key in range(50)
+    )
+    indexes = [("custom_exercise", custom_index), ("exercise", catalog_index)]
+
+    timings = []
+    gc.collect()
+    for _ in range(20):
+        for query, filters in QUERIES:
+            start = time.perf_counter()
+            results = search_exercises(indexes, query, filters)
+            timings.append((time.perf_counter() - start) * 1000)
+            assert results
+    timings.sort()
+    p99 = timings[int(len(timings) * 0.99)]
+    assert p99 < SEARCH_P99_MS, f"p99 {p99:.2f} ms"
+
+
+def test_search_ranks_the_closest_titles_first(catalog_index):
+    results = search_exercises([("exercise", catalog_index)], "bench press", {})
+
+    assert "bench press" in results[0][1]["title"].lower()
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = Flask(__name__)
+    app.config.update(
+        SQLALCHEMY_DATABASE_URI=f"sqlite:///{tmp_path / 'fitjourney.sqlite3'}",
+        EXERCISE_CATALOG_CHECK_INTERVAL=60,
+    )
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        db.session.execute(
+            db.insert(User),
+            {
+                "first_name": "A",
+                "last_name": "B",
+                "email": "a@b.c",
+                "password_hashed": "x",
+            },
+        )
+        db.session.commit()
+    # The indexes are cached by the process, whatever the database
+    custom_exercise_indexes.invalidate(1)
+    yield app
+    with app.app_context():
+        db.engine.dispose()
+
+
+def test_custom_index_is_cached_until_a_change(app):
+    with app.app_context():
+        first = custom_exercise_indexes.get(1)
+        assert first.documents == {}
+        assert custom_exercise_indexes.get(1) is first
+
+        custom_exercises_service.create_custom_exercise(
+            1, {"title": "Cable curl", "category": "Strength", "muscle_group": "Arms"}
+        )
+        db.session.commit()
+
+        index = custom_exercise_indexes.get(1)
+        assert index is not first
+        assert [document["title"] for document in index.documents.values()] == [
+            "Cable curl"
+        ]
+        assert custom_exercise_indexes.get(1) is index
+
+
+def test_custom_index_is_reloaded_when_the_version_changed(app):
+    with app.app_context():
+        app.config["EXERCISE_CATALOG_CHECK_INTERVAL"] = 0
+        first = custom_exercise_indexes.get(1)
+        # Another worker changes the custom exercises of the user
+        db.session.add(
+            CustomExercise(
+                title="Cable curl", category="Strength", muscle_group="Arms", user_id=1
+            )
+        )
+        CacheVersion.bump(custom_exercise_indexes.name(1))
+        db.session.commit()
+
+        index = custom_exercise_indexes.get(1)
+        assert index is not first
+        assert len(index.documents) == 1
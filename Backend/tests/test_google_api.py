@@ -0,0 +1,72 @@
+"""
+    Tests of the Drive API client shared by the threads, against a fake
+    HTTP transport. Run them from the Backend directory:
+    python -m pytest -q tests
+    """
+
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import httplib2
+import pytest
+from google.oauth2.credentials import Credentials
+import google_api
+
+
+class FakeHttp:
+    """
+    An httplib2.Http answering every request, it fails when two threads
+    use it at the same time
+    """
+
+    instances = []
+
+    def __init__(self, *args, **kwargs):
+        self.threads = set()
+        self.busy = threading.Lock()
+        FakeHttp.instances.append(self)
+
+    def request(self, uri, method="GET", body=None, headers=None, *args, **kwargs):
+        self.threads.add(threading.get_ident())
+        if not self.busy.acquire(blocking=False):
+            raise RuntimeError("httplib2.Http used by two threads at once")
+        try:
+            # Give the other threads the time to collide
+            threading.Event().wait(0.01)
+            content = json.dumps({"files": [{"id": "1", "name": "FitJourney"}]})
+            return httplib2.Response({"status": "200"}), content.encode()
+        finally:
+            self.busy.release()
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def service(monkeypatch):
+    FakeHttp.instances = []
+    monkeypatch.setattr(google_api.httplib2, "Http", FakeHttp)
+    monkeypatch.setattr(google_api, "_credentials", Credentials(token="token"))
+    monkeypatch.setattr(google_api, "_service", None)
+    monkeypatch.setattr(google_api, "_local", threading.local())
+    return google_api.get_service()
+
+
+def test_every_thread_has_its_own_http_client(service):
+    def list_files(_):
+        return service.files().list(q="name='FitJourney'").execute()
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        results = list(executor.map(list_files, range(64)))
+
+    assert all(result["files"][0]["id"] == "1" for result in results)
+    used = [http for http in FakeHttp.instances if http.threads]
+    assert 1 < len(used) <= 8
+    assert all(len(http.threads) == 1 for http in used)
+
+
+def test_the_service_is_built_once(service):
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        services = list(executor.map(lambda _: google_api.get_service(), range(16)))
+
+    assert all(other is service for other in services)
@@ -0,0 +1,24 @@
+"""
+    Tests of the resized variants of the uploaded images. Run them from the
+    Backend directory:
+    python -m pytest -q tests
+    """
+
+import os
+from PIL import Image
+from images import VARIANTS, create_variants
+
+
+def test_images_of_the_same_name_have_their_own_variants(tmp_path):
+    paths = {}
+    for name, color in [("squat.png", "orange"), ("squat.jpg", "blue")]:
+        image_path = tmp_path / name
+        Image.new("RGB", (800, 600), color).save(image_path)
+        paths[name] = create_variants(str(image_path), str(tmp_path))
+
+    for variant, _ in VARIANTS:
+        png, jpg = paths["squat.png"][variant], paths["squat.jpg"][variant]
+        assert png != jpg
+        assert os.path.exists(png) and os.path.exists(jpg)
+    with Image.open(paths["squat.png"]["thumb"]) as thumb:
+        assert thumb.convert("RGB").getpixel((0, 0))[2] < 128
@@ -0,0 +1,249 @@
+"""
+    Check that the queries of the endpoints are served by the indexes of the
+    models: every endpoint is called, the SELECT statements it sends to a
+    table are recorded and EXPLAINed. The database is a temporary SQLite
+    database, or the empty database of TEST_DATABASE_URL, e.g. a scratch
+    MySQL database. Run them from the Backend directory:
+    python -m pytest -q tests
+    """
+
+import os
+import re
+from datetime import datetime
+import pytest
+from flask import Flask
+from flask_jwt_extended import JWTManager, create_access_token
+from sqlalchemy import event
+from api.v1.views import views_bp
+from config import Config
+from decorators import is_token_revoked
+from errors import errors_bp
+from json_provider import FastJSONProvider
+from models.base import db
+from models.user import User, user_roles
+from models.role import Role
+from models.plan import Plan
+from models.day import Day
+from models.workout_session import WorkoutSession
+from models.exercise import Exercise
+from models.custom_exercise import CustomExercise
+from models.record import Record
+from models.cache_version import CacheVersion  # noqa: F401
+from models.record_aggregate import RecordAggregate  # noqa: F401
+
+
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+
+# InnoDB indexes every foreign key, SQLite does not
+mysql_only = pytest.mark.skipif(
+    not (TEST_DATABASE_URL or "").startswith("mysql"),
+    reason="the foreign keys are only indexed by MySQL",
+)
+
+# (method, url, json body, table, index expected, None for any index)
+ENDPOINTS = [
+    pytest.param(
+        "GET", "/api/v1/users/1/records", None, "records", "ix_records_user_id_date"
+    ),
+    pytest.param(
+        "GET",
+        "/api/v1/users/1/progress?bucket=day&from=2024-01-01&to=2024-01-31",
+        None,
+        "records",
+        "ix_records_user_id_date",
+    ),
+    pytest.param(
+        "POST",
+        "/api/v1/users/1/custom_exercises",
+        {"title": "Cable curl", "category": "Strength", "muscle_group": "Arms"},
+        "custom_exercises",
+        "ix_custom_exercises_user_id_title",
+    ),
+    pytest.param(
+        "GET",
+        "/api/v1/custom_exercises/categories?user_id=1",
+        None,
+        "custom_exercises",
+        "ix_custom_exercises_user_id_category",
+    ),
+    pytest.param(
+        "GET",
+        "/api/v1/custom_exercises/muscle_groups?user_id=1",
+        None,
+        "custom_exercises",
+        "ix_custom_exercises_user_id_muscle_group",
+    ),
+    pytest.param(
+        "GET",
+        "/api/v1/custom_exercises/muscle_groups/Arms?user_id=1",
+        None,
+        "custom_exercises",
+        "ix_custom_exercises_user_id_muscle_group",
+    ),
+    pytest.param(
+        "POST",
+        "/api/v1/exercises",
+        {"title": "Bench press", "category": "Strength", "muscle_group": "Chest"},
+        "exercises",
+        "ix_exercises_title",
+    ),
+    pytest.param("GET", "/api/v1/users/1/plans", None, "plans", None, marks=mysql_only),
+    pytest.param("GET", "/api/v1/plans/1/days", None, "days", None, marks=mysql_only),
+    pytest.param(
+        "GET",
+        "/api/v1/days/1/workout_sessions",
+        None,
+        "workout_sessions",
+        None,
+        marks=mysql_only,
+    ),
+    pytest.param(
+        "DELETE", "/api/v1/exercises/1", None, "records", None, marks=mysql_only
+    ),
+    pytest.param(
+        "GET", "/api/v1/roles/1/users", None, "user_roles", None, marks=mysql_only
+    ),
+]
+
+
+# The other required columns of the rows of the tests
+DEFAULTS = {
+    User: {"password_hashed": "x"},
+    CustomExercise: {"user_id": 1},
+    Plan: {
+        "user_id": 1,
+        "_current_weight": 80.0,
+        "_target_weight": 75.0,
+        "_duration": 12,
+        "_days_in_week": 3,
+    },
+    WorkoutSession: {"_sets": 3, "_reps": 5, "_rest": 60.0},
+    Record: {
+        "user_id": 1,
+        "_difficulty": 3,
+        "_sets": 3,
+        "_reps": 5,
+        "_rest": 60.0,
+        "_user_weight": 70.0,
+        "location": "gym",
+    },
+}
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = Flask(__name__)
+    app.json = FastJSONProvider(app)
+    app.config.from_object(Config)
+    app.config.update(
+        SQLALCHEMY_DATABASE_URI=TEST_DATABASE_URL
+        or f"sqlite:///{tmp_path / 'fitjourney.sqlite3'}",
+        JWT_SECRET_KEY="secret" * 6,
+        MEDIA_STORAGE="local",
+        MEDIA_STORAGE_DIR=str(tmp_path / "media"),
+    )
+    db.init_app(app)
+    JWTManager(app).token_in_blocklist_loader(is_token_revoked)
+    app.register_blueprint(views_bp)
+    app.register_blueprint(errors_bp)
+    with app.app_context():
+        db.create_all()
+        for model, row in [
+            (Role, {"name": "Admin"}),
+            (User, {"first_name": "A", "last_name": "B", "email": "a@b.c"}),
+            (user_roles, {"user_id": 1, "role_id": 1}),
+            (Exercise, {"title": "Bench press", "category": "S", "muscle_group": "C"}),
+            (
+                CustomExercise,
+                {"title": "Curl", "category": "S", "muscle_group": "Arms"},
+            ),
+            (Plan, {"goal": "Strength"}),
+            (Day, {"plan_id": 1, "title": "Monday"}),
+            (WorkoutSession, {"day_id": 1, "exercise_id": 1}),
+            (Record, {"exercise_id": 1, "date": datetime(2024, 1, 2)}),
+        ]:
+            db.session.execute(db.insert(model), dict(DEFAULTS.get(model, {}), **row))
+        db.session.commit()
+        user = db.session.get(User, 1)
+        app.config["token"] = create_access_token(
+            identity=user.email, additional_claims=user.token_claims()
+        )
+    yield app
+    with app.app_context():
+        db.session.remove()
+        db.drop_all()
+        db.engine.dispose()
+
+
+def explain(connection, statement, parameters):
+    """Return the indexes used by a statement for each table it reads"""
+    if connection.dialect.name == "sqlite":
+        # e.g. SEARCH records USING INDEX ix_records_user_id_date (user_id=?)
+        plan = connection.exec_driver_sql(
+            f"EXPLAIN QUERY PLAN {statement}", parameters
+        ).all()
+        tables = {}
+        for row in plan:
+            words = row.detail.split()
+            if words[0] not in ("SEARCH", "SCAN"):
+                continue
+            indexes = tables.setdefault(words[1], set())
+            if " INDEX " in row.detail:
+                indexes.add(row.detail.split(" INDEX ")[1].split(" ")[0])
+            elif "PRIMARY KEY" in row.detail and words[0] == "SEARCH":
+                indexes.add("PRIMARY")
+        return tables
+    # The key column of the MySQL plan, NULL for a full scan
+    plan = connection.exec_driver_sql(f"EXPLAIN {statement}", parameters).mappings()
+    tables = {}
+    for row in plan:
+        indexes = tables.setdefault(row["table"], set())
+        if row["key"]:
+            indexes.add(row["key"])
+    return tables
+
+
+def record_selects(app, method, url, body):
+    """Call an endpoint, return the SELECT statements it sent"""
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            statements.append((statement, parameters))
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        response = app.test_client().open(
+            url,
+            method=method,
+            json=body,
+            headers={"Authorization": f"Bearer {app.config['token']}"},
+        )
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+    assert response.status_code < 500, response.get_data(as_text=True)
+    return statements
+
+
+@pytest.mark.parametrize("method, url, body, table, expected", ENDPOINTS)
+def test_endpoint_queries_use_an_index(app, method, url, body, table, expected):
+    statements = record_selects(app, method, url, body)
+
+    plans = []
+    with app.app_context(), db.engine.connect() as connection:
+        for statement, parameters in statements:
+            # The lookups by primary key are always served by it
+            if not re.search(rf"\b{table}\b", statement) or re.search(
+                rf"WHERE {table}\.id = \S+\s*$", statement
+            ):
+                continue
+            indexes = explain(connection, statement, parameters).get(table)
+            if indexes is not None:
+                plans.append((statement, indexes))
+
+    assert plans, f"{method} {url} does not read {table}"
+    for statement, indexes in plans:
+        used = expected in indexes if expected else bool(indexes)
+        assert used, f"{table} scanned by {statement} ({indexes or 'no index'})"
@@ -0,0 +1,143 @@
+"""
+    Regression check of the lookups of a single child of a user, a plan or
+    a day: they query the row by its id and its owner, so their cost does
+    not grow with the number of children. Run them from the Backend directory:
+    python -m pytest -q tests
+    """
+
+from datetime import datetime
+from timeit import repeat
+import pytest
+from flask import Flask
+from models.base import db
+from models.user import User
+from models.role import Role
+from models.plan import Plan
+from models.day import Day
+from models.workout_session import WorkoutSession
+from models.exercise import Exercise
+from models.custom_exercise import CustomExercise
+from models.record import Record
+
+
+# The models of the tests, the relationships of the users need the roles
+MODELS = (Role, User, Exercise, Plan, Day, WorkoutSession, CustomExercise, Record)
+
+# Children of the small and of the large owners
+SMALL = 10
+LARGE = 20000
+# A lookup among the LARGE children may be at most this much slower
+MAX_SLOWDOWN = 3
+
+# model, owner column, model of the owner, child row
+LOOKUPS = [
+    (
+        Record,
+        "user_id",
+        User,
+        {
+            "exercise_id": 1,
+            "_difficulty": 3,
+            "_sets": 4,
+            "_reps": 8,
+            "_rest": 90.0,
+            "_user_weight": 80.0,
+            "location": "gym",
+            "date": datetime(2024, 1, 1, 8, 30),
+        },
+    ),
+    (
+        CustomExercise,
+        "user_id",
+        User,
+        {"title": "Curl", "category": "Strength", "muscle_group": "Arms"},
+    ),
+    (Day, "plan_id", Plan, {"title": "Monday"}),
+    (WorkoutSession, "day_id", Day, {"_sets": 3, "_reps": 5, "_rest": 60.0}),
+]
+
+OWNERS = {
+    User: {"first_name": "A", "last_name": "B", "password_hashed": "x"},
+    Plan: {
+        "user_id": 1,
+        "goal": "Strength",
+        "_current_weight": 80.0,
+        "_target_weight": 75.0,
+        "_duration": 12,
+        "_days_in_week": 3,
+    },
+    Day: {"plan_id": 1, "title": "Monday"},
+}
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = Flask(__name__)
+    app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{tmp_path / 'lookups.sqlite3'}"
+    db.init_app(app)
+    with app.app_context():
+        db.metadata.create_all(db.engine, tables=[model.__table__ for model in MODELS])
+        db.session.execute(
+            db.insert(User), dict(OWNERS[User], email="owner@example.com")
+        )
+        db.session.execute(db.insert(Plan), OWNERS[Plan])
+        db.session.execute(
+            db.insert(Exercise),
+            {"title": "Bench press", "category": "Strength", "muscle_group": "Chest"},
+        )
+        db.session.commit()
+    yield app
+    with app.app_context():
+        db.engine.dispose()
+
+
+def add_owner(model, column, owner_model, row, count):
+    """Add an owner with count children, return its id and its last child id"""
+    owner = dict(OWNERS[owner_model])
+    if owner_model is User:
+        owner["email"] = f"user{count}@example.com"
+    owner_id = db.session.execute(
+        db.insert(owner_model).returning(owner_model.id), owner
+    ).scalar_one()
+    db.session.execute(db.insert(model), [dict(row, **{column: owner_id})] * count)
+    db.session.commit()
+    child_id = db.session.execute(
+        db.select(db.func.max(model.id)).filter_by(**{column: owner_id})
+    ).scalar_one()
+    return owner_id, child_id
+
+
+def best(function, number=20):
+    """The best time of a function in seconds, from a cold session"""
+
+    def cold():
+        # Every request starts with an empty identity map
+        db.session.expunge_all()
+        function()
+
+    return min(repeat(cold, number=number, repeat=5)) / number
+
+
+@pytest.mark.parametrize(
+    "model, column, owner_model, row",
+    LOOKUPS,
+    ids=[lookup[0].__tablename__ for lookup in LOOKUPS],
+)
+def test_lookup_cost_does_not_grow_with_the_children(
+    app, model, column, owner_model, row
+):
+    with app.app_context():
+        timings = []
+        for count in (SMALL, LARGE):
+            owner_id, child_id = add_owner(model, column, owner_model, row, count)
+            lookup = {"id": child_id, column: owner_id}
+            assert model.find_by(**lookup).id == child_id
+            # The child of another owner is not found
+            assert model.find_by(**dict(lookup, **{column: owner_id + 1000})) is None
+            timings.append(best(lambda: model.find_by(**lookup)))
+
+        small, large = timings
+        assert large < small * MAX_SLOWDOWN, (
+            f"{large * 1000:.3f} ms with {LARGE} children,"
+            f" {small * 1000:.3f} ms with {SMALL}"
+        )
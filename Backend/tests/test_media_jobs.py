@@ -0,0 +1,113 @@
+"""
+    Tests of the background media uploads, against the in-memory Drive
+    backend and a SQLite database. Run them from the Backend directory:
+    python -m pytest -q tests
+    """
+
+import io
+import os
+import time
+import pytest
+from flask import Flask
+from PIL import Image
+from werkzeug.datastructures import FileStorage
+import google_api
+import storage
+from media_jobs import MediaJobs
+from models.base import db
+from models.user import User  # noqa: F401, the records reference the users
+from models.role import Role  # noqa: F401
+from models.plan import Plan  # noqa: F401
+from models.day import Day  # noqa: F401
+from models.workout_session import WorkoutSession  # noqa: F401
+from models.exercise import Exercise
+from models.custom_exercise import CustomExercise  # noqa: F401
+from models.record import Record  # noqa: F401
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    # The Drive client and the media storage are shared by the process
+    monkeypatch.setattr(google_api, "_drive", None)
+    monkeypatch.setattr(storage, "_storage", None)
+    app = Flask(__name__)
+    app.config.update(
+        SQLALCHEMY_DATABASE_URI=f"sqlite:///{tmp_path / 'fitjourney.sqlite3'}",
+        MEDIA_JOBS_DATABASE=str(tmp_path / "media_jobs.sqlite3"),
+        MEDIA_STAGING_DIR=str(tmp_path / "staging"),
+        MEDIA_STORAGE="drive",
+        DRIVE_BACKEND="memory",
+    )
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        db.session.execute(
+            db.insert(Exercise),
+            {"title": "Bench press", "category": "Strength", "muscle_group": "Chest"},
+        )
+        db.session.commit()
+    yield app
+    with app.app_context():
+        db.engine.dispose()
+
+
+@pytest.fixture
+def jobs(app):
+    jobs = MediaJobs()
+    jobs.init_app(app)
+    yield jobs
+    jobs.executor.shutdown(wait=True)
+
+
+def png():
+    """An uploaded image, large enough to have all its variants"""
+    data = io.BytesIO()
+    Image.new("RGB", (1600, 1200), "orange").save(data, "PNG")
+    data.seek(0)
+    return FileStorage(data, filename="bench.png", content_type="image/png")
+
+
+def wait(jobs, job, timeout=10):
+    """Wait for a job to finish, return its last state"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = jobs.get(job["id"])
+        if job["status"] not in ("queued", "running"):
+            return job
+        time.sleep(0.05)
+    pytest.fail(f"job {job['id']} is still {job['status']}")
+
+
+def test_upload_saves_the_url_and_the_variants(app, jobs):
+    job = wait(jobs, jobs.submit("exercise", 1, None, png(), "bench.png"))
+
+    assert job["status"] == "done", job["error"]
+    assert job["url"].startswith("https://drive.google.com/uc?id=")
+    with app.app_context():
+        exercise = db.session.get(Exercise, 1)
+        assert exercise.media_file_url == job["url"]
+        assert exercise.media_variants
+        assert job["url"] not in exercise.media_variants.values()
+    # The staged file is deleted once uploaded
+    assert not os.path.exists(os.path.join(app.config["MEDIA_STAGING_DIR"], job["id"]))
+
+
+def test_upload_of_an_existing_file_fails(app, jobs):
+    first = wait(jobs, jobs.submit("exercise", 1, None, png(), "bench.png"))
+    second = wait(jobs, jobs.submit("exercise", 1, None, png(), "bench.png"))
+
+    assert first["status"] == "done"
+    assert second["status"] == "failed"
+    assert second["error"] == f"Bad Request: File already exists {first['url']}"
+    with app.app_context():
+        assert db.session.get(Exercise, 1).media_file_url == first["url"]
+
+
+def test_upload_for_a_deleted_target_fails(app, jobs):
+    job = wait(jobs, jobs.submit("exercise", 2, None, png(), "bench.png"))
+
+    assert job["status"] == "failed"
+    assert job["error"] == "Exercise not found"
+    # The uploaded file is not left behind in the storage
+    with app.app_context():
+        assert storage.get_storage().stat("default_exercises/bench.png") is None
@@ -0,0 +1,62 @@
+"""
+    Tests of the rate limiting algorithms and of their stores. Run them from
+    the Backend directory:
+    python -m pytest -q tests
+    """
+
+import pytest
+import rate_limit
+from rate_limit import MemoryStore, SQLiteStore, sliding_window, token_bucket
+
+
+def run(algorithm, times, limit=5, period=60):
+    """The waits of requests sent at times"""
+    state, waits = None, []
+    for now in times:
+        state, wait = algorithm(state, limit, period, now)
+        waits.append(wait)
+    return waits
+
+
+def test_token_bucket_allows_a_burst_then_paces():
+    waits = run(token_bucket, [0, 0, 0, 0, 0, 0, 12])
+
+    assert waits[:5] == [0] * 5
+    assert waits[5] == pytest.approx(12)
+    assert waits[6] == 0
+
+
+def test_sliding_window_caps_the_requests_of_any_period():
+    # 5 requests at the end of a window, then a burst in the next one
+    waits = run(sliding_window, [55, 56, 57, 58, 59, 61, 90, 111])
+
+    assert waits[:5] == [0] * 5
+    # The previous window still weighs 5 * 59 / 60 at 61
+    assert waits[5] == pytest.approx(11)
+    # Half of the previous window is left at 90, 2.5 + 0 + 1 <= 5
+    assert waits[6] == 0
+    # 5 * 9 / 60 + 1 + 1 <= 5
+    assert waits[7] == 0
+
+
+def test_sliding_window_refuses_until_the_next_windows():
+    waits = run(sliding_window, [0, 1, 2, 3, 4, 5], limit=5, period=60)
+
+    assert waits[:5] == [0] * 5
+    # 55 seconds to the next window, then 12 seconds of its share to fall
+    assert waits[5] == pytest.approx(67)
+    assert run(sliding_window, [0, 1, 2, 3, 4, 121]) == [0] * 6
+
+
+@pytest.mark.parametrize("store", ["memory", "sqlite"])
+def test_stores_keep_the_states_of_the_callers(store, tmp_path, monkeypatch):
+    if store == "memory":
+        store = MemoryStore()
+    else:
+        store = SQLiteStore(str(tmp_path / "rate_limits.sqlite3"))
+    monkeypatch.setattr(rate_limit, "time", lambda: 1000.0)
+
+    for algorithm in (token_bucket, sliding_window):
+        waits = [store.consume(algorithm.__name__, 2, 60, algorithm) for _ in range(3)]
+        assert waits[:2] == [0, 0] and waits[2] > 0
+    assert store.consume("other", 2, 60, sliding_window) == 0
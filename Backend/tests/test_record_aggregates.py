@@ -0,0 +1,131 @@
+"""
+    Tests of the weekly aggregates of the records, they must match the
+    aggregates rebuilt from the records after every change. Run them from
+    the Backend directory:
+    python -m pytest -q tests
+    """
+
+from datetime import datetime
+import pytest
+from flask import Flask
+from models.base import db
+from models.user import User
+from models.role import Role  # noqa: F401, the users reference the roles
+from models.plan import Plan  # noqa: F401, and their plans
+from models.exercise import Exercise
+from models.custom_exercise import CustomExercise
+from models.record import Record
+from models.record_aggregate import RecordAggregate
+from models.cache_version import CacheVersion  # noqa: F401
+from record_aggregates import (
+    KEY,
+    TOTALS,
+    add_records,
+    rebuild_aggregates,
+    record_key,
+    record_totals,
+    replace_totals,
+)
+from services import custom_exercises as custom_exercises_service
+from services import exercises as exercises_service
+
+
+RECORD = {
+    "user_id": 1,
+    "_difficulty": 3,
+    "_sets": 3,
+    "_reps": 5,
+    "_rest": 60.0,
+    "_weight_lifted": 50.0,
+    "_user_weight": 70.0,
+    "location": "gym",
+    "date": datetime(2024, 1, 3, 10),
+}
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = Flask(__name__)
+    app.config.update(
+        SQLALCHEMY_DATABASE_URI=f"sqlite:///{tmp_path / 'fitjourney.sqlite3'}",
+        EXERCISE_CATALOG_CHECK_INTERVAL=60,
+    )
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        for model, row in [
+            (
+                User,
+                {
+                    "first_name": "A",
+                    "last_name": "B",
+                    "email": "a@b.c",
+                    "password_hashed": "x",
+                },
+            ),
+            (Exercise, {"title": "Bench press", "category": "S", "muscle_group": "C"}),
+            (
+                CustomExercise,
+                {"user_id": 1, "title": "Curl", "category": "S", "muscle_group": "A"},
+            ),
+        ]:
+            db.session.execute(db.insert(model), row)
+        records = [
+            Record(**RECORD, **exercise)
+            for exercise in ({"exercise_id": 1}, {"custom_exercise_id": 1}, {})
+            for _ in range(2)
+        ]
+        db.session.add_all(records)
+        add_records(records)
+        db.session.commit()
+    yield app
+    with app.app_context():
+        db.engine.dispose()
+
+
+def aggregates():
+    """The aggregates of the records, by key"""
+    return {
+        tuple(getattr(aggregate, column) for column in KEY): tuple(
+            getattr(aggregate, column) for column in TOTALS
+        )
+        for aggregate in db.session.scalars(db.select(RecordAggregate))
+    }
+
+
+def rebuilt():
+    """The aggregates rebuilt from the records, without keeping them"""
+    with db.session.begin_nested() as savepoint:
+        rebuild_aggregates()
+        result = aggregates()
+        savepoint.rollback()
+    return result
+
+
+@pytest.mark.parametrize("model", [Exercise, CustomExercise])
+def test_deleting_an_exercise_refreshes_the_weeks_of_its_records(app, model):
+    with app.app_context():
+        assert len(aggregates()) == 3
+
+        exercise = db.session.get(model, 1)
+        if model is Exercise:
+            exercises_service.delete_exercise(exercise)
+        else:
+            custom_exercises_service.delete_custom_exercise(exercise)
+        db.session.commit()
+
+        assert len(aggregates()) == 2
+        assert aggregates() == rebuilt()
+
+
+def test_replace_totals_adds_to_the_existing_weeks(app):
+    with app.app_context():
+        expected = aggregates()
+        db.session.execute(db.delete(RecordAggregate))
+
+        for record in db.session.scalars(db.select(Record)):
+            row = {**dict(zip(KEY, record_key(record))), **record_totals(record)}
+            replace_totals([row])
+        db.session.commit()
+
+        assert aggregates() == expected
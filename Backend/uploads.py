@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+    Streaming of the uploaded files. The multipart parser writes each file
+    of a request chunk by chunk into the staging directory of the media
+    jobs, computing its sha256 and checking its size on the way, so that a
+    media file is written to the disk once and then moved, not copied
+    """
+
+
+import hashlib
+import os
+import tempfile
+from flask import Request, current_app
+from werkzeug.exceptions import RequestEntityTooLarge
+
+
+class StagedUpload:
+    """An uploaded file written to the staging directory as it is received"""
+
+    def __init__(self, directory, max_size=None):
+        os.makedirs(directory, exist_ok=True)
+        fd, self.path = tempfile.mkstemp(dir=directory, prefix="upload-")
+        self.file = os.fdopen(fd, "w+b")
+        self.sha256 = hashlib.sha256()
+        self.size = 0
+        self.max_size = max_size
+        self.moved = False
+
+    def write(self, data):
+        self.size += len(data)
+        if self.max_size and self.size > self.max_size:
+            raise RequestEntityTooLarge(
+                "Request Entity Too Large: The file is larger than"
+                f" {self.max_size} bytes"
+            )
+        self.sha256.update(data)
+        return self.file.write(data)
+
+    @property
+    def digest(self):
+        return self.sha256.hexdigest()
+
+    def move(self, path):
+        """Close the file and move it to path"""
+        self.file.close()
+        os.replace(self.path, path)
+        self.path = path
+        self.moved = True
+
+    def __getattr__(self, name):
+        # read, seek, close... e.g. for reading an uploaded CSV
+        return getattr(self.file, name)
+
+    def __iter__(self):
+        return iter(self.file)
+
+
+class UploadRequest(Request):
+    """A request streaming its uploaded files into the staging directory"""
+
+    def _get_file_stream(
+        self, total_content_length, content_type, filename=None, content_length=None
+    ):
+        upload = StagedUpload(
+            current_app.config["MEDIA_STAGING_DIR"],
+            current_app.config.get("MEDIA_MAX_SIZE"),
+        )
+        self.__dict__.setdefault("staged_uploads", []).append(upload)
+        return upload
+
+    def close(self):
+        """Remove the uploaded files that were not moved to a media job"""
+        super().close()
+        for upload in self.__dict__.get("staged_uploads", ()):
+            upload.file.close()
+            if not upload.moved:
+                try:
+                    os.remove(upload.path)
+                except FileNotFoundError:
+                    pass